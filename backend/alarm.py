@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+class Alarm:
+    """
+    Compact alarm value built from alarm device. Weekdays are stored as 7 bits mask
+    (bit 0 is monday)
+    """
+
+    __slots__ = (
+        "uuid",
+        "hour",
+        "minute",
+        "days",
+        "non_working_days",
+        "enabled",
+        "timeout",
+        "volume",
+        "repeat",
+        "shuffle",
+    )
+
+    WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+    WEEKDAY_BITS = {weekday: 1 << index for index, weekday in enumerate(WEEKDAYS)}
+
+    def __init__(
+        self,
+        uuid,
+        hour=12,
+        minute=0,
+        days=0,
+        non_working_days=False,
+        enabled=True,
+        timeout=500,
+        volume=50,
+        repeat=False,
+        shuffle=False,
+    ):
+        """
+        Constructor
+
+        Args:
+            uuid (string): alarm identifier
+            hour (int): alarm hour
+            minute (int): alarm minute
+            days (int): weekdays mask
+            non_working_days (bool): True if alarm fires on non working days
+            enabled (bool): True if alarm is enabled
+            timeout (int): alarm timeout (in minutes)
+            volume (int): volume percentage
+            repeat (bool): repeat playlist
+            shuffle (bool): shuffle playlist
+        """
+        self.uuid = uuid
+        self.hour = hour
+        self.minute = minute
+        self.days = days
+        self.non_working_days = non_working_days
+        self.enabled = enabled
+        self.timeout = timeout
+        self.volume = volume
+        self.repeat = repeat
+        self.shuffle = shuffle
+
+    def __repr__(self):
+        """
+        Return alarm representation
+        """
+        return "Alarm(%s %02d:%02d days=%s enabled=%s)" % (
+            self.uuid,
+            self.hour,
+            self.minute,
+            format(self.days, "07b"),
+            self.enabled,
+        )
+
+    @staticmethod
+    def days_to_mask(days):
+        """
+        Convert days dict to weekdays mask
+
+        Args:
+            days (dict): days dict ({mon: bool, tue: bool, ...})
+
+        Returns:
+            int: weekdays mask
+        """
+        mask = 0
+        for weekday, enabled in days.items():
+            if enabled:
+                mask |= Alarm.WEEKDAY_BITS.get(weekday, 0)
+        return mask
+
+    @staticmethod
+    def mask_to_days(mask):
+        """
+        Convert weekdays mask to days dict
+
+        Args:
+            mask (int): weekdays mask
+
+        Returns:
+            dict: days dict ({mon: bool, tue: bool, ...})
+        """
+        return {
+            weekday: bool(mask & bit) for weekday, bit in Alarm.WEEKDAY_BITS.items()
+        }
+
+    @classmethod
+    def from_device(cls, device, uuid=None):
+        """
+        Build alarm from alarm device
+
+        Args:
+            device (dict): alarm device
+            uuid (string): alarm identifier. Device uuid is used if not specified
+
+        Returns:
+            Alarm: alarm instance
+        """
+        alarm_time = device.get("time", {})
+        return cls(
+            uuid or device.get("uuid"),
+            hour=alarm_time.get("hour", 12),
+            minute=alarm_time.get("minute", 0),
+            days=cls.days_to_mask(device.get("days", {})),
+            non_working_days=device.get("nonWorkingDays", False),
+            enabled=device.get("enabled", False),
+            timeout=device.get("timeout", 500),
+            volume=device.get("volume", 50),
+            repeat=device.get("repeat", False),
+            shuffle=device.get("shuffle", False),
+        )
+
+    def to_device(self):
+        """
+        Convert alarm to alarm device, as stored in module config
+
+        Returns:
+            dict: alarm device
+        """
+        return {
+            "uuid": self.uuid,
+            "type": "alarmclock",
+            "name": "Alarm",
+            "time": {"hour": self.hour, "minute": self.minute},
+            "days": self.mask_to_days(self.days),
+            "nonWorkingDays": self.non_working_days,
+            "enabled": self.enabled,
+            "timeout": self.timeout,
+            "volume": self.volume,
+            "repeat": self.repeat,
+            "shuffle": self.shuffle,
+        }
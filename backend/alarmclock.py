@@ -1,11 +1,29 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import copy
+import os
+import time
+from uuid import uuid4
 from datetime import date, timedelta, datetime
-from threading import Timer
+from threading import RLock
 from cleep.exception import CommandError
 from cleep.common import CATEGORIES
 from cleep.core import CleepModule
+from cleep.libs.internals.task import Task
+from .alarmtriggerindex import AlarmTriggerIndex
+from .alarmscheduler import AlarmScheduler
+from .timerwheel import TimerWheel
+from .nonworkingdayscache import NonWorkingDaysCache
+from .alarmpayloads import AlarmPayloads
+from .alarm import Alarm
+from .latencyhistogram import LatencyHistogram
+from .schedulewindow import ScheduleWindow
+from .mediareadahead import MediaReadAhead
+from .alarmjournal import AlarmJournal
+from .coalescingwriter import CoalescingWriter
+from .schedulesnapshot import ScheduleSnapshot
+from .clock import Clock
 
 
 class Alarmclock(CleepModule):
@@ -27,7 +45,15 @@ class Alarmclock(CleepModule):
     MODULE_URLBUGS = "https://github.com/CleepDevice/cleepapp-alarmclock/issues"
 
     MODULE_CONFIG_FILE = "alarmclock.conf"
-    DEFAULT_CONFIG = {}
+    DEFAULT_CONFIG = {
+        "non_working_days_horizon": 30,
+        "deadline_mode": False,
+        "missed_alarms_grace": 5,
+        "audio_prewarm_delay": 30,
+        "media_files": [],
+        "media_read_ahead_delay": 180,
+        "media_read_ahead_budget": 32,
+    }
 
     STORAGE_PATH = "/opt/cleep/modules/Alarmclock"
     WEEKDAYS_MAPPING = {
@@ -39,6 +65,24 @@ class Alarmclock(CleepModule):
         5: "sat",
         6: "sun",
     }
+    NON_WORKING_DAYS_TTL = 43200
+    NON_WORKING_DAYS_CACHE_FILE = "nonworkingdays.json"
+    NON_WORKING_DAYS_CHECK_INTERVAL = 900
+    NON_WORKING_DAYS_MAX_DAY_REQUESTS = 7
+    IDLE_WAKEUP_DELAY = 120
+    SCHEDULE_WINDOW_DAYS = 2
+    AUDIOPLAYER_PREPARE_COMMAND = "prepare_playback"
+    JOURNAL_FILE = "alarms.journal"
+    JOURNAL_COMPACT_SIZE = 65536
+    JOURNAL_FLUSH_DELAY = 0.5
+    JOURNAL_FLUSH_MAX_DELAY = 5.0
+    SCHEDULE_SNAPSHOT_FILE = "schedule.snapshot"
+    SCHEDULE_SNAPSHOT_DELAY = 2.0
+    SCHEDULE_SNAPSHOT_MAX_DELAY = 10.0
+    CLOCK_JUMP_TOLERANCE = 5.0
+    # max minutes walked in trigger index after wall clock went back (one week)
+    CLOCK_JUMP_MAX_MINUTES = 10080
+    METRICS = ("tick_delay", "trigger_delay", "schedule_duration", "rpc_duration")
 
     def __init__(self, bootstrap, debug_enabled):
         """
@@ -58,12 +102,65 @@ class Alarmclock(CleepModule):
         self.has_audioplayer = False
         self.audioplayer_uuid = None
         self.stop_timers = {}
-        self.__scheduled_alarm_uuids = set()
+        self.timer_wheel = TimerWheel(logger=self.logger)
+        self.__schedule_window = ScheduleWindow(days=self.SCHEDULE_WINDOW_DAYS)
+        self.__alarms = {}
+        self.__trigger_index = AlarmTriggerIndex()
+        self.__scheduler = AlarmScheduler()
+        self.__payloads = AlarmPayloads()
+        self.non_working_days = NonWorkingDaysCache(ttl=self.NON_WORKING_DAYS_TTL)
+        self.__non_working_days_task = None
+        self.__next_day_status = None
+        self.__metrics = {name: LatencyHistogram() for name in self.METRICS}
+        self.deadline_mode = False
+        self.__deadline = None
+        self.__fired_minutes = {}
+        # protects scheduler state shared by module, timer wheel and tasks threads
+        self.__trigger_lock = RLock()
+        self.__next_due = None
+        self.__last_tick_minute = None
+        self.missed_alarms_grace = 5
+        self.audio_prewarm_delay = 30
+        self.__prewarm = None
+        self.media_files = []
+        self.media_read_ahead_delay = 180
+        self.__media_read_ahead = MediaReadAhead(logger=self.logger)
+        self.__read_ahead = None
+        self.__journal = AlarmJournal(
+            os.path.join(self.STORAGE_PATH, self.JOURNAL_FILE),
+            self.cleep_filesystem,
+            self.logger,
+        )
+        self.__journal_writer = CoalescingWriter(
+            self._write_journal,
+            delay=self.JOURNAL_FLUSH_DELAY,
+            max_delay=self.JOURNAL_FLUSH_MAX_DELAY,
+            logger=self.logger,
+        )
+        self.__devices = None
+        self.__devices_lock = RLock()
+        self.__compacting = False
+        self.__snapshot = ScheduleSnapshot(
+            os.path.join(self.STORAGE_PATH, self.SCHEDULE_SNAPSHOT_FILE),
+            self.cleep_filesystem,
+            self.logger,
+        )
+        self.__snapshot_writer = CoalescingWriter(
+            self._write_schedule_snapshot,
+            delay=self.SCHEDULE_SNAPSHOT_DELAY,
+            max_delay=self.SCHEDULE_SNAPSHOT_MAX_DELAY,
+            logger=self.logger,
+        )
+        self.__stop_deadlines = {}
+        self.__clock = Clock(tolerance=self.CLOCK_JUMP_TOLERANCE)
 
         self.alarm_triggered_event = self._get_event("alarmclock.alarm.triggered")
         self.alarm_scheduled_event = self._get_event("alarmclock.alarm.scheduled")
         self.alarm_unscheduled_event = self._get_event("alarmclock.alarm.unscheduled")
         self.alarm_stopped_event = self._get_event("alarmclock.alarm.stopped")
+        self.alarm_created_event = self._get_event("alarmclock.alarm.created")
+        self.alarm_updated_event = self._get_event("alarmclock.alarm.updated")
+        self.alarm_deleted_event = self._get_event("alarmclock.alarm.deleted")
 
     def _on_start(self):
         """
@@ -71,13 +168,56 @@ class Alarmclock(CleepModule):
         Use this function to start your tasks.
         At this time all applications are started and should respond to your command requests.
         """
+        self.non_working_days.horizon = self._get_config_field(
+            "non_working_days_horizon"
+        )
+        # start from non working days snapshot (or only today and tomorrow statuses if
+        # there is no snapshot) and fill horizon later in background
+        self._load_non_working_days()
         self._set_today_is_non_working_day()
         self._set_tomorrow_is_non_working_day()
+        self.__non_working_days_task = Task(
+            self.NON_WORKING_DAYS_CHECK_INTERVAL,
+            self._update_non_working_days,
+            self.logger,
+        )
+        self.__non_working_days_task.start()
 
-        self._schedule_alarm()
-
+        self.__alarms = {
+            device_uuid: Alarm.from_device(device, device_uuid)
+            for device_uuid, device in self.get_module_devices().items()
+        }
+        self.__compact_journal_if_needed()
+        self.__trigger_index.build(self.__alarms)
+        self.deadline_mode = self._get_config_field("deadline_mode")
+        self.missed_alarms_grace = self._get_config_field("missed_alarms_grace")
+        self.audio_prewarm_delay = self._get_config_field("audio_prewarm_delay")
+        self.media_files = self._get_config_field("media_files")
+        self.media_read_ahead_delay = self._get_config_field("media_read_ahead_delay")
+        self.__media_read_ahead.budget = (
+            self._get_config_field("media_read_ahead_budget") * 1048576
+        )
         self.has_audioplayer = self.is_module_loaded("audioplayer")
         self.logger.info("Audioplayer app installed: %s", self.has_audioplayer)
+        self._restore_schedule()
+
+        Task(None, self._revalidate_non_working_days, self.logger).start()
+
+    def _on_stop(self):
+        """
+        Stop module
+        """
+        self.timer_wheel.stop()
+        self.stop_timers.clear()
+        self.__snapshot_writer.touch()
+        self.__snapshot_writer.stop()
+        self.__deadline = None
+        self.__prewarm = None
+        self.__read_ahead = None
+        self.__media_read_ahead.evict()
+        self.__journal_writer.stop()
+        if self.__non_working_days_task:
+            self.__non_working_days_task.stop()
 
     def on_event(self, event):
         """
@@ -87,15 +227,278 @@ class Alarmclock(CleepModule):
             event (MessageRequest): event data
         """
         if event["event"] == "parameters.time.now":
-            # at midnight check if today is a non working day
-            if event["params"]["hour"] == 0 and event["params"]["minute"] == 0:
-                self._set_today_is_non_working_day()
-                self._set_tomorrow_is_non_working_day()
+            jump = self.__clock.check_jump()
+            if jump:
+                self._on_clock_jump(jump)
 
+            received_at = time.time()
+            minute_start = self._get_tick_minute_start(event["params"], received_at)
+            self.__metrics["tick_delay"].record((received_at - minute_start) * 1000)
+
+            self.__process_tick(event["params"], minute_start, received_at)
+
+    def __process_tick(self, current_time, minute_start, received_at):
+        """
+        Process time tick: late ticks are coalesced, minutes missed since last tick
+        are evaluated within grace window and duplicate ticks are ignored
+
+        Args:
+            current_time (dict): received time.now event parameters
+            minute_start (float): timestamp of the start of the tick minute
+            received_at (float): tick receipt timestamp
+        """
+        last_minute = self.__last_tick_minute
+        if last_minute is not None and minute_start <= last_minute:
+            self.logger.debug("Duplicate time tick ignored")
+            return
+        self.__last_tick_minute = minute_start
+
+        if last_minute is None:
+            first_minute = minute_start
+            day_changed = current_time["hour"] == 0 and current_time["minute"] == 0
+        else:
+            first_minute = max(
+                last_minute + 60, minute_start - self.missed_alarms_grace * 60
+            )
+            day_changed = (
+                time.localtime(last_minute).tm_yday
+                != time.localtime(minute_start).tm_yday
+            )
+            if minute_start - last_minute > 60:
+                self.logger.warning(
+                    "Missed %d time ticks", (minute_start - last_minute) // 60 - 1
+                )
+
+        # at day change swap non working day statuses prefetched in background
+        if day_changed:
+            with self.__trigger_lock:
+                self._swap_day_status()
+                self._schedule_alarm()
+
+        # nothing to evaluate until next alarm is about to fire
+        if self.__is_idle(received_at):
+            return
+
+        for minute in range(int(first_minute), int(minute_start) + 1, 60):
+            local = time.localtime(minute)
             self._trigger_alarm(
-                event["params"], self.WEEKDAYS_MAPPING[event["params"]["weekday"]]
+                {"hour": local.tm_hour, "minute": local.tm_min},
+                self.WEEKDAYS_MAPPING[local.tm_wday],
             )
 
+        # alarms due until tick minute were evaluated (or skipped out of grace window)
+        evaluated_until = datetime.now() - timedelta(seconds=received_at - minute_start)
+        with self.__trigger_lock:
+            self.__reschedule_due(evaluated_until)
+
+    def __is_idle(self, now):
+        """
+        Return True if no alarm is due soon
+
+        Args:
+            now (float): current timestamp
+
+        Returns:
+            bool: True if no alarm fires before IDLE_WAKEUP_DELAY
+        """
+        return self.__next_due is None or now < self.__next_due - self.IDLE_WAKEUP_DELAY
+
+    def set_deadline_mode(self, enabled):
+        """
+        Enable or disable deadline mode: alarms are fired by a monotonic timer armed on
+        next alarm fire datetime, time.now event is only used as cross-check
+
+        Args:
+            enabled (bool): True to enable deadline mode
+
+        Raises:
+            CommandError: if config update failed
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter has invalid value
+        """
+        self._check_parameters([{"name": "enabled", "type": bool, "value": enabled}])
+
+        if not self._update_config({"deadline_mode": enabled}):
+            raise CommandError("Unable to save configuration")
+
+        with self.__trigger_lock:
+            self.deadline_mode = enabled
+            self._arm_deadline()
+
+    def set_missed_alarms_grace(self, grace):
+        """
+        Set grace window of alarms missed because time ticks were late or skipped
+
+        Args:
+            grace (int): grace window (in minutes). 0 disables missed alarms catch-up
+
+        Raises:
+            CommandError: if config update failed
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter has invalid value
+        """
+        self._check_parameters(
+            [
+                {
+                    "name": "grace",
+                    "type": int,
+                    "value": grace,
+                    "validator": lambda v: 0 <= v <= 60,
+                    "message": "Grace must be between 0 and 60 minutes",
+                }
+            ]
+        )
+
+        if not self._update_config({"missed_alarms_grace": grace}):
+            raise CommandError("Unable to save configuration")
+
+        self.missed_alarms_grace = grace
+
+    def set_audio_prewarm_delay(self, delay):
+        """
+        Set delay audioplayer is prepared before alarm fires
+
+        Args:
+            delay (int): delay (in seconds). 0 disables audio prewarm
+
+        Raises:
+            CommandError: if config update failed
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter has invalid value
+        """
+        self._check_parameters(
+            [
+                {
+                    "name": "delay",
+                    "type": int,
+                    "value": delay,
+                    "validator": lambda v: 0 <= v <= 600,
+                    "message": "Delay must be between 0 and 600 seconds",
+                }
+            ]
+        )
+
+        if not self._update_config({"audio_prewarm_delay": delay}):
+            raise CommandError("Unable to save configuration")
+
+        with self.__trigger_lock:
+            self.audio_prewarm_delay = delay
+            # force timer rearm with new delay
+            self.__prewarm = self.__arm_timer(self.__prewarm, None, 0, None)
+            self._arm_prewarm()
+
+    def set_media_read_ahead(self, media_files, delay, budget):
+        """
+        Configure alarm media files read ahead
+
+        Args:
+            media_files (list): list of alarm media file paths. Empty list disables read ahead
+            delay (int): delay files are read before alarm fires (in seconds)
+            budget (int): max size of files read ahead (in MB)
+
+        Raises:
+            CommandError: if config update failed
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter has invalid value
+        """
+        self._check_parameters(
+            [
+                {
+                    "name": "media_files",
+                    "type": list,
+                    "value": media_files,
+                    "validator": lambda v: all(isinstance(f, str) for f in v),
+                    "message": "Media files must be a list of file paths",
+                },
+                {
+                    "name": "delay",
+                    "type": int,
+                    "value": delay,
+                    "validator": lambda v: 0 <= v <= 3600,
+                    "message": "Delay must be between 0 and 3600 seconds",
+                },
+                {
+                    "name": "budget",
+                    "type": int,
+                    "value": budget,
+                    "validator": lambda v: 0 < v <= 512,
+                    "message": "Budget must be between 1 and 512 MB",
+                },
+            ]
+        )
+
+        config = {
+            "media_files": media_files,
+            "media_read_ahead_delay": delay,
+            "media_read_ahead_budget": budget,
+        }
+        if not self._update_config(config):
+            raise CommandError("Unable to save configuration")
+
+        self.__media_read_ahead.budget = budget * 1048576
+        with self.__trigger_lock:
+            self.media_files = media_files
+            self.media_read_ahead_delay = delay
+            # force timer rearm with new settings
+            self.__read_ahead = self.__arm_timer(self.__read_ahead, None, 0, None)
+            self._arm_read_ahead()
+
+    def get_metrics(self):
+        """
+        Return latency metrics
+
+        Returns:
+            dict: latency histograms (in milliseconds)::
+
+                {
+                    tick_delay (dict): delay between minute start and time.now tick receipt
+                    trigger_delay (dict): delay between minute start and alarm triggered event
+                    schedule_duration (dict): alarms scheduling duration
+                    rpc_duration (dict): commands sent to other apps duration
+                }
+
+        """
+        return {name: histogram.dump() for name, histogram in self.__metrics.items()}
+
+    def send_command(self, command, to, params=None, timeout=3.0):
+        """
+        Send command to other app measuring its duration
+
+        Args:
+            command (string): command name
+            to (string): recipient app name
+            params (dict): command parameters
+            timeout (float): command timeout (in seconds)
+
+        Returns:
+            MessageResponse: command response
+        """
+        start = time.perf_counter()
+        try:
+            return CleepModule.send_command(self, command, to, params, timeout)
+        finally:
+            self.__metrics["rpc_duration"].record((time.perf_counter() - start) * 1000)
+
+    @staticmethod
+    def _get_tick_minute_start(current_time, now):
+        """
+        Return timestamp of the start of the minute of specified time.now tick
+
+        Args:
+            current_time (dict): received time.now event parameters
+            now (float): current timestamp
+
+        Returns:
+            float: tick minute start timestamp
+        """
+        local = time.localtime(now)
+        # tick may be received late, possibly after day change
+        late_minutes = (
+            (local.tm_hour * 60 + local.tm_min)
+            - (current_time["hour"] * 60 + current_time["minute"])
+        ) % 1440
+        return int(now) - local.tm_sec - late_minutes * 60
+
     def add_alarm(
         self, alarm_time, timeout, days, non_working_days, volume, repeat, shuffle
     ):
@@ -136,64 +539,76 @@ class Alarmclock(CleepModule):
             MissingParameter: if parameter is missing
             InvalidParameter: if parameter has invalid value
         """
-        self._check_parameters(
-            [
-                {
-                    "name": "alarm_time",
-                    "type": dict,
-                    "value": alarm_time,
-                    "validator": lambda v: len(v) > 0
-                    and all(key in ["hour", "minute"] for key in v.keys())
-                    and isinstance(v["hour"], int)
-                    and isinstance(v["minute"], int),
-                },
-                {
-                    "name": "days",
-                    "type": dict,
-                    "value": days,
-                    "validator": Alarmclock._check_days_validator,
-                    "message": 'Parameter "days" is invalid or no day is selected',
-                },
-                {"name": "non_working_days", "type": bool, "value": non_working_days},
-                {
-                    "name": "timeout",
-                    "type": int,
-                    "value": timeout,
-                    "validator": lambda v: v >= 0,
-                    "message": "Timeout must be greater or equal to 0",
-                },
-                {
-                    "name": "volume",
-                    "value": volume,
-                    "type": int,
-                    "validator": lambda v: 0 < v <= 100,
-                    "message": "Volume must be between 1 and 100",
-                },
-                {"name": "repeat", "value": repeat, "type": bool},
-                {"name": "shuffle", "value": shuffle, "type": bool},
-            ]
+        self.__check_alarm_parameters(
+            alarm_time, timeout, days, non_working_days, volume, repeat, shuffle
         )
 
-        alarm = {
-            "type": "alarmclock",
-            "name": "Alarm",
-            "time": alarm_time,
-            "days": days,
-            "nonWorkingDays": non_working_days,
-            "enabled": True,
-            "timeout": timeout,
-            "volume": volume,
-            "repeat": repeat,
-            "shuffle": shuffle,
-        }
+        alarm = self.__build_alarm(
+            alarm_time, timeout, days, non_working_days, volume, repeat, shuffle
+        )
         created_alarm = self._add_device(alarm)
         if not created_alarm:
             raise CommandError("Error adding alarm")
 
-        self._schedule_alarm()
-
         return created_alarm["uuid"]
 
+    def update_alarm(
+        self,
+        alarm_uuid,
+        alarm_time,
+        timeout,
+        days,
+        non_working_days,
+        volume,
+        repeat,
+        shuffle,
+    ):
+        """
+        Update existing alarm in place. Alarm enabled status is kept.
+
+        Args:
+            alarm_uuid (string): alarm identifier
+            alarm_time (dict): time to trigger alarm::
+
+                {
+                    hour (int): alarm hour
+                    minute (int): alarm minute
+                }
+
+            timeout (int): alarm timeout (in minutes)
+            days (dict): list of days to triger alarm (see add_alarm)
+            non_working_days (bool): True to enable alarm on non working days
+            volume (int): volume percentage
+            repeat (bool): repeat playlist while it ends
+            shuffle (bool): shuffle playlist when it restarts
+
+        Raises:
+            CommandError: if alarm update failed
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter has invalid value
+        """
+        self._check_parameters(
+            [
+                {
+                    "name": "alarm_uuid",
+                    "type": str,
+                    "value": alarm_uuid,
+                    "validator": lambda v: self._get_device(v) is not None,
+                    "message": "Alarm does not exist",
+                }
+            ]
+        )
+        self.__check_alarm_parameters(
+            alarm_time, timeout, days, non_working_days, volume, repeat, shuffle
+        )
+
+        alarm = self.__build_alarm(
+            alarm_time, timeout, days, non_working_days, volume, repeat, shuffle
+        )
+        del alarm["enabled"]
+        if not self._update_device(alarm_uuid, alarm):
+            raise CommandError("Error updating alarm")
+
     def remove_alarm(self, alarm_uuid):
         """
         Remove specified alarm
@@ -219,26 +634,9 @@ class Alarmclock(CleepModule):
             ]
         )
 
-        alarm = self._get_device(alarm_uuid)
-
         if not self._delete_device(alarm_uuid):
             raise CommandError("Error removing alarm")
 
-        if alarm_uuid in self.__scheduled_alarm_uuids:
-            self.__scheduled_alarm_uuids.remove(alarm_uuid)
-            self.alarm_unscheduled_event.send(
-                params={
-                    "hour": alarm.get("time", {}).get("hour", 12),
-                    "minute": alarm.get("time", {}).get("minute", 0),
-                    "timeout": alarm.get("timeout", 500),
-                    "volume": alarm.get("volume", 50),
-                    "repeat": alarm.get("repeat", False),
-                    "shuffle": alarm.get("shuffle", False),
-                    "count": len(self.__scheduled_alarm_uuids),
-                },
-                device_id=alarm_uuid,
-            )
-
     def toggle_alarm(self, alarm_uuid):
         """
         Toggle alarm enabling/disabling it
@@ -272,72 +670,756 @@ class Alarmclock(CleepModule):
         if not updated:
             raise CommandError("Error updating alarm")
 
-        if enabled:
-            self.__scheduled_alarm_uuids.add(alarm_uuid)
-        elif alarm_uuid in self.__scheduled_alarm_uuids:
-            self.__scheduled_alarm_uuids.remove(alarm_uuid)
-        event = self.alarm_scheduled_event if enabled else self.alarm_unscheduled_event
-        event.send(
-            params={
-                "hour": alarm.get("time", {}).get("hour", 12),
-                "minute": alarm.get("time", {}).get("minute", 0),
-                "timeout": alarm.get("timeout", 500),
-                "volume": alarm.get("volume", 50),
-                "repeat": alarm.get("repeat", False),
-                "shuffle": alarm.get("shuffle", False),
-                "count": len(self.__scheduled_alarm_uuids),
-            },
-            device_id=alarm_uuid,
-        )
-
         return enabled
 
-    @staticmethod
-    def _check_days_validator(days):
-        """
-        Validate all days are present in specified dict
-
-        Args:
-            days (dict): list of days
-
-        Returns:
-            bool: True if days dict is valid
+    def __check_alarm_parameters(
+        self, alarm_time, timeout, days, non_working_days, volume, repeat, shuffle
+    ):
         """
-        week_days_exists = all(
-            day in ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
-            for day in days.keys()
-        )
-        at_least_one_day = any(days.values())
-        return week_days_exists and at_least_one_day
+        Check alarm parameters
 
-    def _set_today_is_non_working_day(self):
-        """
-        Get from parameters if today is a non working day
+        Raises:
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter has invalid value
         """
-        try:
-            resp = self.send_command("is_today_non_working_day", "parameters")
-            if resp.error:
-                raise Exception(resp.message)
-            self.today_is_non_working_day = resp.data
-        except Exception:
-            self.logger.exception("Unable to know if today is a non working day")
+        self._check_parameters(
+            [
+                {
+                    "name": "alarm_time",
+                    "type": dict,
+                    "value": alarm_time,
+                    "validator": lambda v: len(v) > 0
+                    and all(key in ["hour", "minute"] for key in v.keys())
+                    and isinstance(v["hour"], int)
+                    and isinstance(v["minute"], int),
+                },
+                {
+                    "name": "days",
+                    "type": dict,
+                    "value": days,
+                    "validator": Alarmclock._check_days_validator,
+                    "message": 'Parameter "days" is invalid or no day is selected',
+                },
+                {"name": "non_working_days", "type": bool, "value": non_working_days},
+                {
+                    "name": "timeout",
+                    "type": int,
+                    "value": timeout,
+                    "validator": lambda v: v >= 0,
+                    "message": "Timeout must be greater or equal to 0",
+                },
+                {
+                    "name": "volume",
+                    "value": volume,
+                    "type": int,
+                    "validator": lambda v: 0 < v <= 100,
+                    "message": "Volume must be between 1 and 100",
+                },
+                {"name": "repeat", "value": repeat, "type": bool},
+                {"name": "shuffle", "value": shuffle, "type": bool},
+            ]
+        )
 
-    def _set_tomorrow_is_non_working_day(self):
+    @staticmethod
+    def __build_alarm(
+        alarm_time, timeout, days, non_working_days, volume, repeat, shuffle
+    ):
+        """
+        Build alarm device
+
+        Returns:
+            dict: alarm device
+        """
+        return {
+            "type": "alarmclock",
+            "name": "Alarm",
+            "time": alarm_time,
+            "days": days,
+            "nonWorkingDays": non_working_days,
+            "enabled": True,
+            "timeout": timeout,
+            "volume": volume,
+            "repeat": repeat,
+            "shuffle": shuffle,
+        }
+
+    def add_alarms(self, alarms):
+        """
+        Add multiple alarms at once. All alarms are checked before being added.
+
+        Args:
+            alarms (list): list of alarms. Each alarm is a dict with add_alarm parameters::
+
+                [
+                    {
+                        alarm_time (dict),
+                        timeout (int),
+                        days (dict),
+                        non_working_days (bool),
+                        volume (int),
+                        repeat (bool),
+                        shuffle (bool),
+                    },
+                    ...
+                ]
+
+        Returns:
+            list: created alarm identifiers
+
+        Raises:
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter has invalid value
+        """
+        self._check_parameters(
+            [
+                {
+                    "name": "alarms",
+                    "type": list,
+                    "value": alarms,
+                    "validator": lambda v: len(v) > 0
+                    and all(isinstance(alarm, dict) for alarm in v),
+                },
+            ]
+        )
+
+        new_alarms = []
+        for alarm in alarms:
+            params = [
+                alarm.get(name)
+                for name in (
+                    "alarm_time",
+                    "timeout",
+                    "days",
+                    "non_working_days",
+                    "volume",
+                    "repeat",
+                    "shuffle",
+                )
+            ]
+            self.__check_alarm_parameters(*params)
+            new_alarms.append(self.__build_alarm(*params))
+
+        self.__commit_devices(added=new_alarms)
+
+        return [alarm["uuid"] for alarm in new_alarms]
+
+    def remove_alarms(self, alarm_uuids):
         """
-        Get from parameters if tomorrow is a non working day
+        Remove multiple alarms at once
+
+        Args:
+            alarm_uuids (list): list of alarm identifiers
+
+        Raises:
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter has invalid value
+        """
+        self._check_parameters(
+            [
+                {
+                    "name": "alarm_uuids",
+                    "type": list,
+                    "value": alarm_uuids,
+                    "validator": lambda v: len(v) > 0
+                    and all(self._get_device(uuid) is not None for uuid in v),
+                    "message": "Alarm does not exist",
+                }
+            ]
+        )
+
+        self.__commit_devices(deleted=alarm_uuids)
+
+    def set_alarms_enabled(self, alarm_uuids, enabled):
+        """
+        Enable or disable multiple alarms at once
+
+        Args:
+            alarm_uuids (list): list of alarm identifiers
+            enabled (bool): True to enable alarms, False to disable them
+
+        Raises:
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter has invalid value
+        """
+        self._check_parameters(
+            [
+                {
+                    "name": "alarm_uuids",
+                    "type": list,
+                    "value": alarm_uuids,
+                    "validator": lambda v: len(v) > 0
+                    and all(self._get_device(uuid) is not None for uuid in v),
+                    "message": "Alarm does not exist",
+                },
+                {"name": "enabled", "type": bool, "value": enabled},
+            ]
+        )
+
+        updated = {uuid: {"enabled": enabled} for uuid in alarm_uuids}
+        self.__commit_devices(updated=updated)
+
+    def __commit_devices(self, added=None, updated=None, deleted=None):
+        """
+        Apply multiple device changes at once
+
+        Args:
+            added (list): list of devices to add. Device uuid is set
+            updated (dict): device fields to update indexed by device uuid
+            deleted (list): list of device uuids to delete
+        """
+        added = added or []
+        updated = updated or {}
+        deleted = deleted or []
+
+        records = []
+        for device in added:
+            device["uuid"] = str(uuid4())
+            records.append(
+                self.__make_record(AlarmJournal.OP_ADD, device["uuid"], device)
+            )
+        for device_uuid, data in updated.items():
+            records.append(
+                self.__make_record(AlarmJournal.OP_UPDATE, device_uuid, data)
+            )
+        for device_uuid in deleted:
+            records.append(self.__make_record(AlarmJournal.OP_DELETE, device_uuid))
+        self.__commit_records(records)
+
+        devices = self.__get_devices()
+        self.__devices_changed(
+            added=added,
+            updated={device_uuid: devices[device_uuid] for device_uuid in updated},
+            deleted=deleted,
+        )
+
+    @staticmethod
+    def __make_record(op, device_uuid, data=None):
+        """
+        Build journal record
+
+        Args:
+            op (string): mutation type
+            device_uuid (string): device identifier
+            data (dict): added device or updated fields
+
+        Returns:
+            dict: journal record
+        """
+        return {"op": op, "uuid": device_uuid, "data": copy.deepcopy(data)}
+
+    def __get_devices(self):
+        """
+        Return in-memory devices, loading them from config and journal the first time
+
+        Returns:
+            dict: devices indexed by uuid
+        """
+        with self.__devices_lock:
+            if self.__devices is None:
+                devices = copy.deepcopy(self._get_config().get("devices", {}))
+                try:
+                    records = self.__journal.replay()
+                except OSError:
+                    self.logger.exception("Unable to replay alarms journal")
+                    records = []
+                self.__devices = AlarmJournal.apply(devices, records)
+            return self.__devices
+
+    def __commit_records(self, records):
+        """
+        Apply records to in-memory devices. Records are written to journal later by
+        journal writer, coalesced with other mutations.
+
+        Args:
+            records (list): list of journal records
+        """
+        with self.__devices_lock:
+            AlarmJournal.apply(self.__get_devices(), records)
+            self.__journal_writer.add(records)
+
+    def _write_journal(self, records):
+        """
+        Append batch of records to journal, with a single fsync
+
+        Args:
+            records (list): list of journal records
+
+        Raises:
+            OSError: if write failed. Records are kept pending by journal writer
+        """
+        self.__journal.append(records)
+        self.__compact_journal_if_needed()
+
+    def __compact_journal_if_needed(self):
+        """
+        Compact journal in background when it exceeds size threshold
+        """
+        with self.__devices_lock:
+            if self.__compacting:
+                return
+            if self.__journal.size() <= self.JOURNAL_COMPACT_SIZE:
+                return
+            self.__compacting = True
+        Task(None, self._compact_journal, self.logger).start()
+
+    def _compact_journal(self):
+        """
+        Write in-memory devices to module config and drop compacted journal records
         """
         try:
-            self.tomorrow["date"] = date.today() + timedelta(days=1)
-            resp = self.send_command(
-                "is_non_working_day",
-                "parameters",
-                {"day": self.tomorrow["date"].isoformat()},
+            with self.__devices_lock:
+                if not self.__journal.rotate():
+                    return
+                devices = copy.deepcopy(self.__get_devices())
+
+            if not self._update_config({"devices": devices}):
+                self.logger.error("Unable to compact alarms journal")
+                return
+            self.__journal.discard_rotated()
+        except OSError:
+            self.logger.exception("Unable to compact alarms journal")
+        finally:
+            with self.__devices_lock:
+                self.__compacting = False
+
+    def get_next_alarms(self, count=1):
+        """
+        Return next alarms to fire
+
+        Args:
+            count (int): number of alarms to return
+
+        Returns:
+            list: list of next alarms sorted by fire time::
+
+                [
+                    {
+                        uuid (string): alarm identifier
+                        timestamp (int): alarm fire timestamp
+                    },
+                    ...
+                ]
+
+        Raises:
+            InvalidParameter: if parameter has invalid value
+        """
+        self._check_parameters(
+            [
+                {
+                    "name": "count",
+                    "type": int,
+                    "value": count,
+                    "validator": lambda v: v > 0,
+                    "message": "Count must be greater than 0",
+                }
+            ]
+        )
+
+        with self.__trigger_lock:
+            nexts = self.__scheduler.get_next(count)
+        return [
+            {"uuid": alarm_uuid, "timestamp": int(fire.timestamp())}
+            for fire, alarm_uuid in nexts
+        ]
+
+    def get_module_devices(self):
+        """
+        Return module devices from in-memory devices, journal included
+
+        Returns:
+            dict: devices indexed by uuid
+        """
+        return copy.deepcopy(self.__get_devices())
+
+    def _get_device(self, device_uuid):
+        """
+        Return device from in-memory devices
+
+        Args:
+            device_uuid (string): device identifier
+
+        Returns:
+            dict: device or None if device not found
+        """
+        device = self.__get_devices().get(device_uuid)
+        return copy.deepcopy(device) if device else None
+
+    def _add_device(self, data):
+        """
+        Add device, journal it and index it for triggering
+
+        Args:
+            data (dict): device data
+
+        Returns:
+            dict: created device or None if error occured
+        """
+        device = copy.deepcopy(data)
+        device["uuid"] = str(uuid4())
+        self.__commit_records(
+            [self.__make_record(AlarmJournal.OP_ADD, device["uuid"], device)]
+        )
+
+        self.__devices_changed(added=[device])
+        return device
+
+    def _update_device(self, device_uuid, data):
+        """
+        Update device, journal it and reindex it for triggering
+
+        Args:
+            device_uuid (string): device identifier
+            data (dict): device data to update
+
+        Returns:
+            bool: True if device updated
+        """
+        if device_uuid not in self.__get_devices():
+            return False
+        data = {key: value for key, value in data.items() if key != "uuid"}
+        self.__commit_records(
+            [self.__make_record(AlarmJournal.OP_UPDATE, device_uuid, data)]
+        )
+
+        self.__devices_changed(updated={device_uuid: self.__get_devices()[device_uuid]})
+        return True
+
+    def _delete_device(self, device_uuid):
+        """
+        Delete device, journal it and remove it from trigger index
+
+        Args:
+            device_uuid (string): device identifier
+
+        Returns:
+            bool: True if device deleted
+        """
+        if device_uuid not in self.__get_devices():
+            return False
+        self.__commit_records([self.__make_record(AlarmJournal.OP_DELETE, device_uuid)])
+
+        self.__devices_changed(deleted=[device_uuid])
+        return True
+
+    def __devices_changed(self, added=None, updated=None, deleted=None):
+        """
+        Keep internal structures in sync with changed devices. Changed alarms are
+        (un)scheduled at once, created, updated and deleted events are sent per device
+
+        Args:
+            added (list): list of added devices
+            updated (dict): updated devices indexed by device uuid
+            deleted (list): list of deleted device uuids
+        """
+        added = [Alarm.from_device(device) for device in added or []]
+        updated = {
+            device_uuid: Alarm.from_device(device, device_uuid)
+            for device_uuid, device in (updated or {}).items()
+        }
+        deleted = deleted or []
+
+        with self.__trigger_lock:
+            scheduled = {}
+            for alarm in added:
+                self.__alarms[alarm.uuid] = alarm
+                self.__trigger_index.add(alarm.uuid, alarm)
+                scheduled[alarm.uuid] = alarm
+            for device_uuid, alarm in updated.items():
+                self.__alarms[device_uuid] = alarm
+                self.__payloads.invalidate(device_uuid)
+                self.__trigger_index.add(device_uuid, alarm)
+                self.__fired_minutes.pop(device_uuid, None)
+                scheduled[device_uuid] = alarm
+            unscheduled = {}
+            for device_uuid in deleted:
+                unscheduled[device_uuid] = self.__alarms.pop(device_uuid, None)
+                self.__trigger_index.remove(device_uuid)
+                self.__fired_minutes.pop(device_uuid, None)
+
+            if scheduled:
+                self.__schedule_alarms(scheduled)
+            if unscheduled:
+                self.__unschedule_alarms(unscheduled)
+            for device_uuid in deleted:
+                self.__payloads.invalidate(device_uuid)
+
+        for alarm in added:
+            self.alarm_created_event.send(
+                params=alarm.to_device(), device_id=alarm.uuid
+            )
+        for device_uuid, alarm in updated.items():
+            self.alarm_updated_event.send(
+                params=alarm.to_device(), device_id=device_uuid
             )
+        for device_uuid in deleted:
+            self.alarm_deleted_event.send(
+                params={"uuid": device_uuid}, device_id=device_uuid
+            )
+
+    @staticmethod
+    def _check_days_validator(days):
+        """
+        Validate all days are present in specified dict
+
+        Args:
+            days (dict): list of days
+
+        Returns:
+            bool: True if days dict is valid
+        """
+        week_days_exists = all(day in Alarm.WEEKDAY_BITS for day in days.keys())
+        at_least_one_day = Alarm.days_to_mask(days) != 0
+        return week_days_exists and at_least_one_day
+
+    def _refresh_non_working_days(self, force=False):
+        """
+        Refresh non working days cache over configured horizon if necessary.
+        Days are fetched in one request per year if parameters app supports it,
+        or one request per day otherwise (limited to NON_WORKING_DAYS_MAX_DAY_REQUESTS
+        days per refresh, missing days first).
+
+        Args:
+            force (bool): force refresh even if cache is still valid
+        """
+        today = date.today()
+        self.non_working_days.purge(today)
+        if not force and not self.non_working_days.needs_refresh(today):
+            return
+
+        days = self.non_working_days.get_horizon_days(today)
+        flags = self.__fetch_non_working_days_by_year(days)
+        if flags is None:
+            missing_days = [
+                day for day in days if self.non_working_days.get(day) is None
+            ]
+            days = missing_days + [day for day in days if day not in missing_days]
+            flags = self.__fetch_non_working_days_by_day(
+                days[: self.NON_WORKING_DAYS_MAX_DAY_REQUESTS]
+            )
+        if flags:
+            self.non_working_days.update(flags)
+            self._save_non_working_days()
+        self.logger.debug("Non working days cache refreshed (%d days)", len(flags))
+
+    def _update_non_working_days(self):
+        """
+        Non working days task: refresh cache and prefetch next day status
+        """
+        self._refresh_non_working_days()
+        self._prefetch_day_status()
+
+    def _prefetch_day_status(self):
+        """
+        Prepare non working day statuses to apply at next day change, so midnight
+        processing does not have to request parameters app
+        """
+        next_day = date.today() + timedelta(days=1)
+        day_after = next_day + timedelta(days=1)
+        next_day_flag = self.__get_non_working_day(next_day)
+        day_after_flag = self.__get_non_working_day(day_after)
+        if next_day_flag is None or day_after_flag is None:
+            return
+
+        # single assignment, status is swapped atomically at day change
+        self.__next_day_status = (
+            next_day,
+            next_day_flag,
+            {"date": day_after, "is_non_working_day": day_after_flag},
+        )
+
+    def _swap_day_status(self):
+        """
+        Apply today and tomorrow non working day statuses at day change.
+        It never requests parameters app: if status was not prefetched, cached values
+        are used and a background refresh is launched.
+        """
+        today = date.today()
+        status = self.__next_day_status
+        if status and status[0] == today:
+            self.today_is_non_working_day = status[1]
+            self.tomorrow = status[2]
+            return
+
+        self.logger.warning("Day status was not prefetched, use cached values")
+        tomorrow = today + timedelta(days=1)
+        today_flag = self.non_working_days.get(today)
+        tomorrow_flag = self.non_working_days.get(tomorrow)
+        self.today_is_non_working_day = bool(today_flag)
+        self.tomorrow = {"date": tomorrow, "is_non_working_day": bool(tomorrow_flag)}
+        if today_flag is None or tomorrow_flag is None:
+            Task(None, self._revalidate_non_working_days, self.logger).start()
+
+    def __get_non_working_day(self, day):
+        """
+        Return non working day status of specified day from cache or from parameters app
+
+        Args:
+            day (date): day
+
+        Returns:
+            bool: True if day is non working day, None if status is unknown
+        """
+        cached = self.non_working_days.get(day)
+        if cached is not None:
+            return cached
+
+        flags = self.__fetch_non_working_days_by_day([day])
+        if day not in flags:
+            return None
+        self.non_working_days.set(day, flags[day])
+        return flags[day]
+
+    def _revalidate_non_working_days(self):
+        """
+        Refresh non working days cache loaded from snapshot and reschedule alarms if
+        today or tomorrow status changed
+        """
+        self._refresh_non_working_days(force=True)
+
+        today_is_non_working_day = self.today_is_non_working_day
+        tomorrow_is_non_working_day = self.tomorrow["is_non_working_day"]
+        self._set_today_is_non_working_day()
+        self._set_tomorrow_is_non_working_day()
+        if (
+            today_is_non_working_day != self.today_is_non_working_day
+            or tomorrow_is_non_working_day != self.tomorrow["is_non_working_day"]
+        ):
+            self.logger.info("Non working days changed, reschedule alarms")
+            self._schedule_alarm()
+        self._prefetch_day_status()
+
+    def _load_non_working_days(self):
+        """
+        Load non working days cache snapshot from filesystem
+
+        Returns:
+            bool: True if snapshot loaded
+        """
+        path = os.path.join(self.STORAGE_PATH, self.NON_WORKING_DAYS_CACHE_FILE)
+        if not os.path.exists(path):
+            return False
+
+        try:
+            data = self.cleep_filesystem.read_json(path)
+        except Exception:
+            self.logger.exception("Unable to read non working days snapshot")
+            return False
+
+        loaded = self.non_working_days.load(data)
+        if loaded:
+            self.non_working_days.purge(date.today())
+        else:
+            self.logger.warning("Non working days snapshot is invalid, drop it")
+        return loaded
+
+    def _save_non_working_days(self):
+        """
+        Save non working days cache snapshot to filesystem
+        """
+        try:
+            if not os.path.exists(self.STORAGE_PATH):
+                self.cleep_filesystem.mkdirs(self.STORAGE_PATH)
+            path = os.path.join(self.STORAGE_PATH, self.NON_WORKING_DAYS_CACHE_FILE)
+            if not self.cleep_filesystem.write_json(path, self.non_working_days.dump()):
+                raise Exception("Write failed")
+        except Exception:
+            self.logger.exception("Unable to save non working days snapshot")
+
+    def __fetch_non_working_days_by_year(self, days):
+        """
+        Fetch non working days using one request per year
+
+        Args:
+            days (list): list of dates
+
+        Returns:
+            dict: non working day flags indexed by date (empty if parameters app did not
+                respond), None if parameters app does not support it
+        """
+        non_working_days = set()
+        for year in sorted({day.year for day in days}):
+            try:
+                resp = self.send_command(
+                    "get_non_working_days", "parameters", {"year": year}
+                )
+            except Exception:
+                self.logger.exception("Unable to get non working days of %s", year)
+                return {}
+            if resp.error:
+                self.logger.debug(
+                    "Unable to get non working days by year: %s", resp.message
+                )
+                return None
+            non_working_days.update(resp.data)
+
+        return {day: day.isoformat() in non_working_days for day in days}
+
+    def __fetch_non_working_days_by_day(self, days):
+        """
+        Fetch non working days using one request per day
+
+        Args:
+            days (list): list of dates
+
+        Returns:
+            dict: non working day flags indexed by date. Requests are stopped at
+                first failure, so failed and remaining days are not returned
+        """
+        flags = {}
+        for day in days:
+            try:
+                resp = self.send_command(
+                    "is_non_working_day", "parameters", {"day": day.isoformat()}
+                )
+                if resp.error:
+                    raise Exception(resp.message)
+                flags[day] = resp.data
+            except Exception:
+                self.logger.exception("Unable to know if %s is a non working day", day)
+                break
+
+        return flags
+
+    def _set_today_is_non_working_day(self):
+        """
+        Set if today is a non working day from cache, or from parameters if not cached
+        """
+        today = date.today()
+        cached = self.non_working_days.get(today)
+        if cached is not None:
+            self.today_is_non_working_day = cached
+            return
+
+        try:
+            resp = self.send_command("is_today_non_working_day", "parameters")
             if resp.error:
                 raise Exception(resp.message)
-            self.tomorrow["is_non_working_day"] = resp.data
+            self.today_is_non_working_day = resp.data
+            self.non_working_days.set(today, resp.data)
         except Exception:
-            self.logger.exception("Unable to know if tomorrow is a non working day")
+            self.logger.exception("Unable to know if today is a non working day")
+
+    def _set_tomorrow_is_non_working_day(self):
+        """
+        Set if tomorrow is a non working day from cache, or from parameters if not cached
+        """
+        tomorrow = date.today() + timedelta(days=1)
+        is_non_working_day = self.non_working_days.get(tomorrow)
+        if is_non_working_day is None:
+            try:
+                resp = self.send_command(
+                    "is_non_working_day", "parameters", {"day": tomorrow.isoformat()}
+                )
+                if resp.error:
+                    raise Exception(resp.message)
+                is_non_working_day = resp.data
+                self.non_working_days.set(tomorrow, resp.data)
+            except Exception:
+                self.logger.exception("Unable to know if tomorrow is a non working day")
+                is_non_working_day = self.tomorrow.get("is_non_working_day", False)
+
+        # single assignment, tomorrow status is read by scheduler from other threads
+        self.tomorrow = {"date": tomorrow, "is_non_working_day": is_non_working_day}
 
     def _trigger_alarm(self, current_time, weekday):
         """
@@ -347,46 +1429,416 @@ class Alarmclock(CleepModule):
             current_time: received time.now event parameters
             weekday (string): literal weekday with 3 first chars (mon, tue...)
         """
-        alarms = self.get_module_devices()
-        for alarm_uuid, alarm in alarms.items():
-            if not alarm["nonWorkingDays"] and self.today_is_non_working_day:
-                self.logger.debug(
-                    "Alarm %s: dropped because non working days", alarm_uuid
+        alarm_uuids = self.__trigger_index.get(
+            weekday, current_time["hour"], current_time["minute"]
+        )
+        if not alarm_uuids:
+            return
+
+        minute_start = self._get_tick_minute_start(current_time, time.time())
+        with self.__trigger_lock:
+            for alarm_uuid in alarm_uuids:
+                self.__fire_alarm(alarm_uuid, minute_start)
+
+    def __fire_alarm(self, alarm_uuid, minute_start):
+        """
+        Fire specified alarm once per minute
+
+        Args:
+            alarm_uuid (string): alarm identifier
+            minute_start (float): timestamp of the start of the fire minute
+        """
+        alarm = self.__alarms.get(alarm_uuid)
+        if not alarm:
+            return
+        if self.__fired_minutes.get(alarm_uuid) == minute_start:
+            self.logger.debug("Alarm %s: already fired", alarm_uuid)
+            return
+        if not alarm.non_working_days and self.today_is_non_working_day:
+            self.logger.debug("Alarm %s: dropped because non working days", alarm_uuid)
+            return
+
+        self.__fired_minutes[alarm_uuid] = minute_start
+        self.alarm_triggered_event.send(
+            params=self.__payloads.triggered(alarm_uuid, alarm),
+            device_id=alarm_uuid,
+        )
+        self.__metrics["trigger_delay"].record((time.time() - minute_start) * 1000)
+        self._schedule_alarm(alarm_uuid)
+
+        if self.stop_timers.get(alarm_uuid):
+            self.stop_timers[alarm_uuid].cancel()
+        self.stop_timers[alarm_uuid] = self.timer_wheel.schedule(
+            alarm.timeout * 60, self._stop_alarm, [alarm_uuid]
+        )
+        self.__stop_deadlines[alarm_uuid] = self.__clock.deadline(alarm.timeout * 60)
+        self.logger.info("Trigger alarm %s", alarm_uuid)
+
+    def __schedule_changed(self):
+        """
+        Update next due timestamp and deadline after scheduler changed
+        """
+        with self.__trigger_lock:
+            nexts = self.__scheduler.get_next(1)
+            self.__next_due = nexts[0][0].timestamp() if nexts else None
+            self._arm_deadline()
+            self._arm_prewarm()
+            self._arm_read_ahead()
+            self.__snapshot_writer.touch()
+
+    def _on_clock_jump(self, jump):
+        """
+        Update schedule after wall clock jump. Stop timers run on monotonic clock and
+        are not affected. Only alarms whose next fire is over (clock went forward) or
+        that have an occurrence in the replayed period (clock went back) are
+        rescheduled, unless day changed. When clock went forward, alarms skipped
+        within missed alarms grace window are kept for next tick catch up.
+
+        Args:
+            jump (float): wall clock jump (in seconds)
+        """
+        now = datetime.now()
+        previous_now = now - timedelta(seconds=jump)
+        self.logger.warning("Wall clock jumped by %.0f seconds", jump)
+
+        with self.__trigger_lock:
+            if jump < 0:
+                # duplicate tick guard would drop ticks until clock catches up
+                self.__last_tick_minute = None
+            # armed timers delays were computed from previous wall clock
+            self.__deadline = self.__arm_timer(self.__deadline, None, 0, None)
+            self.__prewarm = self.__arm_timer(self.__prewarm, None, 0, None)
+            self.__read_ahead = self.__arm_timer(self.__read_ahead, None, 0, None)
+
+            if now.date() != previous_now.date():
+                if jump < 0:
+                    # window never moves back by itself
+                    self.__schedule_window.reset(now.date())
+                self._set_today_is_non_working_day()
+                self._set_tomorrow_is_non_working_day()
+                self._schedule_alarm()
+                return
+
+            if jump > 0:
+                due_until = now - timedelta(minutes=self.missed_alarms_grace)
+            else:
+                due_until = now
+            alarm_uuids = {
+                alarm_uuid for _, alarm_uuid in self.__scheduler.get_due(due_until)
+            }
+            if jump < 0:
+                alarm_uuids.update(self.__get_alarms_between(now, previous_now))
+            self.__schedule_alarms(
+                {
+                    alarm_uuid: self.__alarms.get(alarm_uuid)
+                    for alarm_uuid in alarm_uuids
+                }
+            )
+
+    def __get_alarms_between(self, start, end):
+        """
+        Return alarms with an occurrence between specified datetimes, using trigger
+        index
+
+        Args:
+            start (datetime): period start (excluded)
+            end (datetime): period end (included)
+
+        Returns:
+            set: alarm uuids
+        """
+        minutes = int((end - start).total_seconds() // 60)
+        if minutes > self.CLOCK_JUMP_MAX_MINUTES:
+            return set(self.__alarms.keys())
+
+        alarm_uuids = set()
+        current = start.replace(second=0, microsecond=0)
+        for _ in range(minutes + 1):
+            current += timedelta(minutes=1)
+            alarm_uuids.update(
+                self.__trigger_index.get(
+                    self.WEEKDAYS_MAPPING[current.weekday()],
+                    current.hour,
+                    current.minute,
                 )
+                or ()
+            )
+        return alarm_uuids
+
+    def __get_schedule_hash(self, now):
+        """
+        Compute hash of schedule inputs: alarms, today and non working days statuses
+        over next fire computation range. Snapshot is stale if hash differs
+
+        Args:
+            now (datetime): current datetime
+
+        Returns:
+            int: schedule hash
+        """
+        today = now.date()
+        return ScheduleSnapshot.compute_hash(
+            {
+                "today": today.isoformat(),
+                "non_working_days": [
+                    self._is_non_working_day(today + timedelta(days=offset), today)
+                    for offset in range(8)
+                ],
+                "alarms": sorted(
+                    [
+                        alarm_uuid,
+                        alarm.hour,
+                        alarm.minute,
+                        alarm.days,
+                        alarm.non_working_days,
+                        alarm.enabled,
+                    ]
+                    for alarm_uuid, alarm in list(self.__alarms.items())
+                ),
+            }
+        )
+
+    def _restore_schedule(self):
+        """
+        Restore schedule from snapshot if schedule inputs did not change since it was
+        saved, otherwise schedule all alarms. Only alarms whose snapshot fire datetime
+        is over are rescheduled. Ringing alarms stop deadlines are always restored.
+
+        Returns:
+            bool: True if schedule was restored from snapshot
+        """
+        now = datetime.now()
+        snapshot = self.__snapshot.load()
+        if snapshot:
+            self.__restore_stop_deadlines(snapshot["stops"])
+        if not snapshot or snapshot["hash"] != self.__get_schedule_hash(now):
+            self.logger.debug("Schedule snapshot is stale, schedule all alarms")
+            self._schedule_alarm()
+            return False
+
+        with self.__trigger_lock:
+            self.__schedule_window.advance(now.date())
+            outdated = {}
+            for alarm_uuid, alarm in self.__alarms.items():
+                if alarm_uuid not in snapshot["fires"]:
+                    outdated[alarm_uuid] = alarm
+                    continue
+                fire = snapshot["fires"][alarm_uuid]
+                if fire and fire <= now:
+                    outdated[alarm_uuid] = alarm
+                    continue
+                self.__scheduler.update(alarm_uuid, fire)
+                if alarm_uuid in snapshot["scheduled"]:
+                    self.__schedule_window.set(
+                        alarm_uuid, fire.date() if fire else None
+                    )
+
+            self.logger.debug(
+                "Schedule restored from snapshot (%d alarms outdated)", len(outdated)
+            )
+            self.__schedule_alarms(outdated)
+        return True
+
+    def __restore_stop_deadlines(self, stops):
+        """
+        Re-arm stop timers of alarms that were ringing when module stopped. Alarms
+        whose stop deadline is over are stopped immediately.
+
+        Args:
+            stops (dict): stop deadline wall clock timestamp indexed by alarm uuid
+        """
+        for alarm_uuid, timestamp in stops.items():
+            if alarm_uuid not in self.__alarms:
                 continue
-            if not alarm["enabled"]:
-                self.logger.debug("Alarm %s: dropped because disabled", alarm_uuid)
+
+            deadline = self.__clock.from_wall(timestamp)
+            self.__stop_deadlines[alarm_uuid] = deadline
+            # alarm must not fire again when missed minutes are caught up
+            fired_at = timestamp - self.__alarms[alarm_uuid].timeout * 60
+            self.__fired_minutes[alarm_uuid] = int(fired_at // 60 * 60)
+            remaining = self.__clock.remaining(deadline)
+            if not remaining:
+                self.logger.info("Alarm %s stop deadline is over", alarm_uuid)
+                self._stop_alarm(alarm_uuid)
                 continue
-            if not alarm["days"][weekday]:
-                self.logger.debug(
-                    "Alarm %s: dropped because disabled for this weekday", alarm_uuid
+            self.stop_timers[alarm_uuid] = self.timer_wheel.schedule(
+                remaining, self._stop_alarm, [alarm_uuid]
+            )
+            self.logger.info("Alarm %s still ringing, stop timer restored", alarm_uuid)
+
+    def _write_schedule_snapshot(self, changes):
+        """
+        Write schedule snapshot of current scheduler state
+
+        Args:
+            changes (list): unused, snapshot writes are only requested (see touch)
+        """
+        with self.__trigger_lock:
+            alarm_uuids = list(self.__alarms.keys())
+            fires = {
+                alarm_uuid: self.__scheduler.get_fire(alarm_uuid)
+                for alarm_uuid in alarm_uuids
+            }
+            scheduled = {
+                alarm_uuid
+                for alarm_uuid in alarm_uuids
+                if alarm_uuid in self.__schedule_window
+            }
+            stops = {
+                alarm_uuid: self.__clock.to_wall(deadline)
+                for alarm_uuid, deadline in list(self.__stop_deadlines.items())
+            }
+            schedule_hash = self.__get_schedule_hash(datetime.now())
+
+        try:
+            self.__snapshot.save(schedule_hash, fires, scheduled, stops)
+        except (OSError, ValueError):
+            self.logger.exception("Unable to write schedule snapshot")
+
+    def __arm_timer(self, armed, fire, advance, callback):
+        """
+        Arm timer expiring some time before specified fire datetime. Timer is kept if
+        fire datetime did not change
+
+        Args:
+            armed (tuple): currently armed timer and its fire datetime, or None
+            fire (datetime): fire datetime. None to disarm timer
+            advance (float): expire timer this number of seconds before fire datetime
+            callback (function): timer callback, called with fire datetime
+
+        Returns:
+            tuple: armed timer and its fire datetime, or None
+        """
+        if armed and armed[1] == fire:
+            return armed
+
+        if armed:
+            armed[0].cancel()
+        if fire is None:
+            return None
+
+        delay = max(0.0, (fire - datetime.now()).total_seconds() - advance)
+        return (self.timer_wheel.schedule(delay, callback, [fire]), fire)
+
+    def _arm_deadline(self):
+        """
+        Arm timer on next alarm fire datetime when deadline mode is enabled
+        """
+        nexts = self.__scheduler.get_next(1) if self.deadline_mode else []
+        fire = nexts[0][0] if nexts else None
+        self.__deadline = self.__arm_timer(self.__deadline, fire, 0, self._on_deadline)
+
+    def _arm_prewarm(self):
+        """
+        Arm timer to prepare audioplayer before next alarm fires
+        """
+        enabled = self.has_audioplayer and self.audio_prewarm_delay > 0
+        nexts = self.__scheduler.get_next(1) if enabled else []
+        fire = nexts[0][0] if nexts else None
+        self.__prewarm = self.__arm_timer(
+            self.__prewarm, fire, self.audio_prewarm_delay, self._on_prewarm
+        )
+
+    def _on_prewarm(self, fire):
+        """
+        Prewarm timer callback: audioplayer is prepared in background to not block
+        timer wheel
+
+        Args:
+            fire (datetime): next alarm fire datetime
+        """
+        Task(None, self._prewarm_audio, self.logger, [fire]).start()
+
+    def _arm_read_ahead(self):
+        """
+        Arm timer to read media files ahead before next alarm fires
+        """
+        enabled = len(self.media_files) > 0 and self.media_read_ahead_delay > 0
+        nexts = self.__scheduler.get_next(1) if enabled else []
+        fire = nexts[0][0] if nexts else None
+        self.__read_ahead = self.__arm_timer(
+            self.__read_ahead, fire, self.media_read_ahead_delay, self._on_read_ahead
+        )
+
+    def _on_read_ahead(self, fire):
+        """
+        Read ahead timer callback. Files are read in a task to not block timer wheel
+
+        Args:
+            fire (datetime): next alarm fire datetime
+        """
+        Task(
+            None,
+            self.__media_read_ahead.prefetch,
+            self.logger,
+            [list(self.media_files)],
+        ).start()
+
+    def _prewarm_audio(self, fire):
+        """
+        Ask audioplayer to prepare playback of alarms firing at specified datetime,
+        so alarm triggered event only has to start playback
+
+        Args:
+            fire (datetime): alarms fire datetime
+        """
+        # scheduler is read under lock, audioplayer is requested outside of it
+        prepares = []
+        with self.__trigger_lock:
+            for due_fire, alarm_uuid in self.__scheduler.get_due(fire):
+                alarm = self.__alarms.get(alarm_uuid)
+                if due_fire != fire or not alarm:
+                    continue
+                prepares.append((alarm_uuid, alarm.volume, alarm.repeat, alarm.shuffle))
+
+        for alarm_uuid, volume, repeat, shuffle in prepares:
+            try:
+                resp = self.send_command(
+                    self.AUDIOPLAYER_PREPARE_COMMAND,
+                    "audioplayer",
+                    {"volume": volume, "repeat": repeat, "shuffle": shuffle},
+                )
+                if resp.error:
+                    raise Exception(resp.message)
+                self.logger.debug("Audioplayer prepared for alarm %s", alarm_uuid)
+            except Exception as error:
+                self.logger.warning(
+                    "Unable to prepare audioplayer for alarm %s: %s", alarm_uuid, error
                 )
-                continue
-            if (
-                alarm["time"]["hour"] != current_time["hour"]
-                or alarm["time"]["minute"] != current_time["minute"]
-            ):
-                self.logger.debug("Alarm %s: dropped because no alarm time", alarm_uuid)
-                continue
 
-            self.alarm_triggered_event.send(
-                params={
-                    "hour": alarm.get("time", {}).get("hour", 12),
-                    "minute": alarm.get("time", {}).get("minute", 0),
-                    "timeout": alarm.get("timeout", 500),
-                    "volume": alarm.get("volume", 50),
-                    "repeat": alarm.get("repeat", False),
-                    "shuffle": alarm.get("shuffle", False),
-                },
-                device_id=alarm_uuid,
-            )
-            self._schedule_alarm()
+    def _on_deadline(self, fire):
+        """
+        Deadline timer callback: fire due alarms and arm next deadline
+
+        Args:
+            fire (datetime): deadline fire datetime
+        """
+        with self.__trigger_lock:
+            self.__deadline = None
+            now = datetime.now()
+            if now < fire:
+                # wheel resolution may expire timer a bit early
+                self._arm_deadline()
+                return
 
-            self.stop_timers[alarm_uuid] = Timer(
-                alarm["timeout"] * 60, self._stop_alarm, [alarm_uuid]
+            self._trigger_alarm(
+                {"hour": fire.hour, "minute": fire.minute},
+                self.WEEKDAYS_MAPPING[fire.weekday()],
             )
-            self.logger.info("Trigger alarm %s", alarm_uuid)
-            self.stop_timers[alarm_uuid].start()
+            self.__reschedule_due(now)
+            self.__schedule_changed()
+
+    def __reschedule_due(self, now):
+        """
+        Reschedule due alarms that were not fired (non working day, missed out of
+        grace window...) so next due datetime does not stay in the past
+
+        Args:
+            now (datetime): reference datetime
+        """
+        due = self.__scheduler.get_due(now)
+        if due:
+            self.__schedule_alarms({uuid: self.__alarms.get(uuid) for _, uuid in due})
 
     def _stop_alarm(self, alarm_uuid, snoozed=False):
         """
@@ -400,8 +1852,10 @@ class Alarmclock(CleepModule):
         if self.stop_timers.get(alarm_uuid):
             self.stop_timers[alarm_uuid].cancel()
             del self.stop_timers[alarm_uuid]
+        if self.__stop_deadlines.pop(alarm_uuid, None) is not None:
+            self.__snapshot_writer.touch()
 
-        alarm = self._get_device(alarm_uuid)
+        alarm = self.__alarms.get(alarm_uuid)
         if not alarm:
             self.logger.warning(
                 'Unable to stop alarm "%s": device not found', alarm_uuid
@@ -409,75 +1863,122 @@ class Alarmclock(CleepModule):
             return
 
         self.alarm_stopped_event.send(
-            params={
-                "hour": alarm["time"]["hour"],
-                "minute": alarm["time"]["minute"],
-                "timeout": alarm["timeout"],
-                "volume": alarm["volume"],
-                "snoozed": snoozed,
-            },
+            params=self.__payloads.stopped(alarm_uuid, alarm, snoozed),
             device_id=alarm_uuid,
         )
 
-    def _schedule_alarm(self):
+        # release read ahead media once no alarm is ringing
+        if not self.stop_timers:
+            self.__media_read_ahead.evict()
+
+    def _is_non_working_day(self, day, today):
         """
-        Schedule alarm for today
+        Return non working day status of specified day from known statuses
+
+        Args:
+            day (date): day to check
+            today (date): today date
+
+        Returns:
+            bool: True if day is a non working day
         """
-        now = datetime.now()
-        tomorrow_weekday_literal = self.WEEKDAYS_MAPPING[
-            self.tomorrow["date"].weekday()
-        ]
-        today_weekday_literal = self.WEEKDAYS_MAPPING[now.weekday()]
-        alarms = self.get_module_devices()
+        if day == today:
+            return self.today_is_non_working_day
+        if day == self.tomorrow["date"]:
+            return self.tomorrow.get("is_non_working_day", False)
+        return self.non_working_days.get(day) or False
 
-        # check next alarm for today
-        for alarm_uuid, alarm in alarms.items():
-            if not alarm["nonWorkingDays"] and self.today_is_non_working_day:
-                continue
-            if not alarm["enabled"]:
-                continue
+    def __compute_next_fire(self, alarm, now):
+        """
+        Compute alarm next fire datetime
 
-            if (
-                alarm["days"][today_weekday_literal]
-                and alarm["time"]["hour"] >= now.hour
-                and alarm["time"]["minute"] > now.minute
-                and alarm_uuid not in self.__scheduled_alarm_uuids
-            ):
-                self.__scheduled_alarm_uuids.add(alarm_uuid)
-                self.alarm_scheduled_event.send(
-                    params={
-                        "hour": alarm.get("time", {}).get("hour", 12),
-                        "minute": alarm.get("time", {}).get("minute", 0),
-                        "timeout": alarm.get("timeout", 500),
-                        "volume": alarm.get("volume", 50),
-                        "count": len(self.__scheduled_alarm_uuids),
-                        "repeat": alarm.get("repeat", False),
-                        "shuffle": alarm.get("shuffle", False),
-                    },
-                    device_id=alarm_uuid,
+        Args:
+            alarm (Alarm): alarm instance
+            now (datetime): current datetime
+
+        Returns:
+            datetime: next fire datetime or None
+        """
+        today = now.date()
+        return AlarmScheduler.compute_next_fire(
+            alarm, now, lambda day: self._is_non_working_day(day, today)
+        )
+
+    def _schedule_alarm(self, alarm_uuid=None):
+        """
+        Schedule alarms that will fire today or tomorrow. Single alarm is rescheduled
+        after each change, all alarms are rescheduled at day change only.
+
+        Args:
+            alarm_uuid (string): alarm identifier to schedule. If not specified all alarms are scheduled
+        """
+        start = time.perf_counter()
+        if alarm_uuid:
+            alarms = {alarm_uuid: self.__alarms.get(alarm_uuid)}
+        else:
+            alarms = dict(self.__alarms)
+        self.__schedule_alarms(alarms)
+        self.__metrics["schedule_duration"].record(
+            (time.perf_counter() - start) * 1000
+        )
+
+    def __schedule_alarms(self, alarms):
+        """
+        Update schedule of specified alarms, sending scheduled (or unscheduled) event
+        only for alarms whose state changed
+
+        Args:
+            alarms (dict): alarm instances indexed by uuid. None alarm is unscheduled
+        """
+        with self.__trigger_lock:
+            now = datetime.now()
+            self.__schedule_window.advance(now.date())
+            for uuid, alarm in alarms.items():
+                if not alarm:
+                    self.__scheduler.remove(uuid)
+                    self.__schedule_window.remove(uuid)
+                    continue
+
+                fire = self.__compute_next_fire(alarm, now)
+                self.__scheduler.update(uuid, fire)
+                was_scheduled = uuid in self.__schedule_window
+                scheduled = self.__schedule_window.set(
+                    uuid, fire.date() if fire else None
                 )
+                if scheduled == was_scheduled:
+                    continue
 
-        # check next alarm for tomorrow
-        for alarm_uuid, alarm in alarms.items():
-            if not alarm["nonWorkingDays"] and self.tomorrow["is_non_working_day"]:
-                continue
-            if not alarm["enabled"]:
-                continue
+                event = (
+                    self.alarm_scheduled_event
+                    if scheduled
+                    else self.alarm_unscheduled_event
+                )
+                event.send(
+                    params=self.__payloads.scheduled(
+                        uuid, alarm, len(self.__schedule_window)
+                    ),
+                    device_id=uuid,
+                )
+            self.__schedule_changed()
 
-            if (
-                alarm["days"][tomorrow_weekday_literal]
-                and alarm_uuid not in self.__scheduled_alarm_uuids
-            ):
-                self.__scheduled_alarm_uuids.add(alarm_uuid)
-                self.alarm_scheduled_event.send(
-                    params={
-                        "hour": alarm.get("time", {}).get("hour", 12),
-                        "minute": alarm.get("time", {}).get("minute", 0),
-                        "timeout": alarm.get("timeout", 500),
-                        "volume": alarm.get("volume", 50),
-                        "count": len(self.__scheduled_alarm_uuids),
-                        "repeat": alarm.get("repeat", False),
-                        "shuffle": alarm.get("shuffle", False),
-                    },
-                    device_id=alarm_uuid,
+    def __unschedule_alarms(self, alarms):
+        """
+        Unschedule specified alarms sending unscheduled event for scheduled ones
+
+        Args:
+            alarms (dict): alarm instances indexed by uuid. No event is sent for None
+                alarm
+        """
+        with self.__trigger_lock:
+            for uuid, alarm in alarms.items():
+                self.__scheduler.remove(uuid)
+                if not self.__schedule_window.remove(uuid) or not alarm:
+                    continue
+
+                self.alarm_unscheduled_event.send(
+                    params=self.__payloads.scheduled(
+                        uuid, alarm, len(self.__schedule_window)
+                    ),
+                    device_id=uuid,
                 )
+            self.__schedule_changed()
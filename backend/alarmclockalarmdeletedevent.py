@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from cleep.libs.internals.event import Event
+
+
+class AlarmclockAlarmDeletedEvent(Event):
+    """
+    Alarmclock.alarm.deleted event
+    """
+
+    EVENT_NAME = "alarmclock.alarm.deleted"
+    EVENT_PROPAGATE = False
+    EVENT_PARAMS = ["uuid"]
+
+    def __init__(self, params):
+        """
+        Constructor
+
+        Args:
+            params (dict): event parameters
+        """
+        Event.__init__(self, params)
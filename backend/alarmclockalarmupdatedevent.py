@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from cleep.libs.internals.event import Event
+
+
+class AlarmclockAlarmUpdatedEvent(Event):
+    """
+    Alarmclock.alarm.updated event
+    """
+
+    EVENT_NAME = "alarmclock.alarm.updated"
+    EVENT_PROPAGATE = False
+    EVENT_PARAMS = [
+        "uuid",
+        "type",
+        "name",
+        "time",
+        "days",
+        "nonWorkingDays",
+        "enabled",
+        "timeout",
+        "volume",
+        "repeat",
+        "shuffle",
+    ]
+
+    def __init__(self, params):
+        """
+        Constructor
+
+        Args:
+            params (dict): event parameters
+        """
+        Event.__init__(self, params)
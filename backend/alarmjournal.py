@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+from threading import Lock
+
+
+class AlarmJournal:
+    """
+    Append-only journal of alarm mutations, one json record per line. Journal is
+    rotated before compaction so records appended meanwhile are kept.
+    Writes go through cleep filesystem so they work on read-only root filesystem.
+    """
+
+    OP_ADD = "add"
+    OP_UPDATE = "update"
+    OP_DELETE = "delete"
+
+    def __init__(self, path, cleep_filesystem, logger=None):
+        """
+        Constructor
+
+        Args:
+            path (string): journal file path
+            cleep_filesystem (CleepFilesystem): cleep filesystem instance
+            logger (Logger): logger instance
+        """
+        self.logger = logger or logging.getLogger(self.__class__.__name__)
+        self.cleep_filesystem = cleep_filesystem
+        self.path = path
+        self.rotated_path = path + ".old"
+        self.__lock = Lock()
+
+    def size(self):
+        """
+        Return journal size, including rotated journal not compacted yet
+
+        Returns:
+            int: journal size (in bytes)
+        """
+        size = 0
+        for path in (self.rotated_path, self.path):
+            if os.path.exists(path):
+                size += os.path.getsize(path)
+        return size
+
+    def append(self, records):
+        """
+        Append records to journal with a single write
+
+        Args:
+            records (list): list of records::
+
+                [
+                    {
+                        op (string): mutation type (add, update or delete)
+                        uuid (string): device identifier
+                        data (dict): added device or updated fields. None for delete
+                    },
+                    ...
+                ]
+
+        Raises:
+            OSError: if write failed
+        """
+        lines = "".join(
+            json.dumps(record, separators=(",", ":")) + "\n" for record in records
+        )
+        with self.__lock:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                if not self.cleep_filesystem.mkdirs(directory):
+                    raise OSError("Unable to create journal directory")
+            self.__write(self.path, lines)
+
+    def __write(self, path, content):
+        """
+        Append content to file and sync it to disk
+
+        Args:
+            path (string): file path
+            content (string): content to append
+
+        Raises:
+            OSError: if write failed
+        """
+        fd = self.cleep_filesystem.open(path, "a", encoding="utf-8")
+        try:
+            fd.write(content)
+            fd.flush()
+            os.fsync(fd.fileno())
+        finally:
+            self.cleep_filesystem.close(fd)
+
+    def replay(self):
+        """
+        Read all journal records, rotated journal first. Truncated or invalid lines
+        (power loss during write) are skipped.
+
+        Returns:
+            list: list of records (see append)
+        """
+        records = []
+        with self.__lock:
+            for path in (self.rotated_path, self.path):
+                if not os.path.exists(path):
+                    continue
+                with open(path, encoding="utf-8") as fd:
+                    for line in fd:
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            self.logger.warning("Invalid journal record skipped")
+        return records
+
+    def rotate(self):
+        """
+        Move journal records aside before compaction. Records are appended to
+        rotated journal if a previous compaction failed.
+
+        Returns:
+            bool: True if there are records to compact
+
+        Raises:
+            OSError: if rotation failed
+        """
+        with self.__lock:
+            if not os.path.exists(self.path):
+                return os.path.exists(self.rotated_path)
+            if not os.path.exists(self.rotated_path):
+                if not self.cleep_filesystem.move(self.path, self.rotated_path):
+                    raise OSError("Unable to rotate journal")
+                return True
+
+            with open(self.path, encoding="utf-8") as fd:
+                self.__write(self.rotated_path, fd.read())
+            if not self.cleep_filesystem.rm(self.path):
+                raise OSError("Unable to remove rotated journal records")
+            return True
+
+    def discard_rotated(self):
+        """
+        Remove rotated journal once its records are compacted
+
+        Raises:
+            OSError: if rotated journal removal failed
+        """
+        with self.__lock:
+            if os.path.exists(self.rotated_path):
+                if not self.cleep_filesystem.rm(self.rotated_path):
+                    raise OSError("Unable to remove rotated journal")
+
+    @staticmethod
+    def apply(devices, records):
+        """
+        Apply records to devices. Applying already compacted records is harmless.
+
+        Args:
+            devices (dict): devices indexed by uuid, updated in place
+            records (list): list of records (see append)
+
+        Returns:
+            dict: updated devices
+        """
+        for record in records:
+            device_uuid = record.get("uuid")
+            if record.get("op") == AlarmJournal.OP_ADD:
+                devices[device_uuid] = record["data"]
+            elif record.get("op") == AlarmJournal.OP_UPDATE:
+                if device_uuid in devices:
+                    devices[device_uuid].update(record["data"])
+            elif record.get("op") == AlarmJournal.OP_DELETE:
+                devices.pop(device_uuid, None)
+        return devices
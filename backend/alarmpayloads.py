@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from .alarm import Alarm
+
+PAYLOAD_FIELDS = ("hour", "minute", "timeout", "volume", "repeat", "shuffle")
+STOPPED_PAYLOAD_FIELDS = ("hour", "minute", "timeout", "volume")
+
+
+class AlarmPayloads:
+    """
+    Cache of alarm event payloads, built once per alarm and invalidated when alarm is
+    updated. Cached payloads are sent as is (propagated events must stay json
+    serializable) so they must not be modified by callers.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.__payloads = {}
+
+    def __len__(self):
+        """
+        Return number of cached payloads
+        """
+        return len(self.__payloads)
+
+    @staticmethod
+    def build(alarm):
+        """
+        Build alarm payloads
+
+        Args:
+            alarm (Alarm|dict): alarm instance or alarm device
+
+        Returns:
+            tuple: alarm payload, stopped alarm payload and snoozed alarm payload
+        """
+        if not isinstance(alarm, Alarm):
+            alarm = Alarm.from_device(alarm)
+        payload = {field: getattr(alarm, field) for field in PAYLOAD_FIELDS}
+        stopped = {field: payload[field] for field in STOPPED_PAYLOAD_FIELDS}
+        return payload, {**stopped, "snoozed": False}, {**stopped, "snoozed": True}
+
+    def get(self, alarm_uuid, alarm):
+        """
+        Return cached alarm payloads, building them if necessary
+
+        Args:
+            alarm_uuid (string): alarm identifier
+            alarm (Alarm|dict): alarm instance or alarm device
+
+        Returns:
+            tuple: alarm payload, stopped alarm payload and snoozed alarm payload
+        """
+        payloads = self.__payloads.get(alarm_uuid)
+        if payloads is None:
+            payloads = self.build(alarm)
+            self.__payloads[alarm_uuid] = payloads
+        return payloads
+
+    def invalidate(self, alarm_uuid):
+        """
+        Drop cached payloads of specified alarm
+
+        Args:
+            alarm_uuid (string): alarm identifier
+        """
+        self.__payloads.pop(alarm_uuid, None)
+
+    def triggered(self, alarm_uuid, alarm):
+        """
+        Return alarm triggered event parameters
+
+        Args:
+            alarm_uuid (string): alarm identifier
+            alarm (Alarm|dict): alarm instance or alarm device
+
+        Returns:
+            dict: cached event parameters
+        """
+        return self.get(alarm_uuid, alarm)[0]
+
+    def scheduled(self, alarm_uuid, alarm, count):
+        """
+        Return alarm scheduled or unscheduled event parameters
+
+        Args:
+            alarm_uuid (string): alarm identifier
+            alarm (Alarm|dict): alarm instance or alarm device
+            count (int): number of scheduled alarms
+
+        Returns:
+            dict: event parameters
+        """
+        return {**self.get(alarm_uuid, alarm)[0], "count": count}
+
+    def stopped(self, alarm_uuid, alarm, snoozed):
+        """
+        Return alarm stopped event parameters
+
+        Args:
+            alarm_uuid (string): alarm identifier
+            alarm (Alarm|dict): alarm instance or alarm device
+            snoozed (bool): True if alarm was snoozed
+
+        Returns:
+            dict: cached event parameters
+        """
+        return self.get(alarm_uuid, alarm)[2 if snoozed else 1]
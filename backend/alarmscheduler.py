@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import heapq
+from datetime import datetime, timedelta
+
+
+class AlarmScheduler:
+    """
+    Keep next fire datetime of each alarm in a heap.
+    Only the changed alarm is updated, stale heap entries are lazily dropped.
+    """
+
+    # index of entry fields
+    FIRE = 0
+    UUID = 2
+    VALID = 3
+
+    COMPACT_MARGIN = 32
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.__heap = []
+        self.__entries = {}
+        self.__counter = 0
+
+    def __len__(self):
+        """
+        Return number of scheduled alarms
+        """
+        return len(self.__entries)
+
+    def __contains__(self, alarm_uuid):
+        """
+        Return True if alarm is scheduled
+        """
+        return alarm_uuid in self.__entries
+
+    @staticmethod
+    def compute_next_fire(alarm, now, is_non_working_day, max_days=7):
+        """
+        Compute next fire datetime of specified alarm
+
+        Args:
+            alarm (Alarm): alarm instance
+            now (datetime): reference datetime
+            is_non_working_day (function): function returning True if specified date is a non working day
+            max_days (int): number of days to look ahead
+
+        Returns:
+            datetime: next fire datetime or None if alarm will not fire within max_days
+        """
+        if not alarm.enabled or not alarm.days:
+            return None
+
+        today = now.date()
+        for offset in range(max_days + 1):
+            day = today + timedelta(days=offset)
+            if not alarm.days & (1 << day.weekday()):
+                continue
+            if not alarm.non_working_days and is_non_working_day(day):
+                continue
+            fire = datetime(day.year, day.month, day.day, alarm.hour, alarm.minute)
+            if fire > now:
+                return fire
+
+        return None
+
+    def update(self, alarm_uuid, fire):
+        """
+        Update next fire datetime of specified alarm
+
+        Args:
+            alarm_uuid (string): alarm identifier
+            fire (datetime): next fire datetime. None to unschedule alarm
+        """
+        self.remove(alarm_uuid)
+        if fire is None:
+            return
+
+        self.__counter += 1
+        entry = [fire, self.__counter, alarm_uuid, True]
+        self.__entries[alarm_uuid] = entry
+        heapq.heappush(self.__heap, entry)
+
+    def remove(self, alarm_uuid):
+        """
+        Remove specified alarm from scheduler
+
+        Args:
+            alarm_uuid (string): alarm identifier
+        """
+        entry = self.__entries.pop(alarm_uuid, None)
+        if entry:
+            entry[self.VALID] = False
+        while self.__heap and not self.__heap[0][self.VALID]:
+            heapq.heappop(self.__heap)
+
+        # compact heap when too many stale entries remain
+        if len(self.__heap) > 2 * len(self.__entries) + self.COMPACT_MARGIN:
+            self.__heap = [entry for entry in self.__heap if entry[self.VALID]]
+            heapq.heapify(self.__heap)
+
+    def get_fire(self, alarm_uuid):
+        """
+        Return next fire datetime of specified alarm
+
+        Args:
+            alarm_uuid (string): alarm identifier
+
+        Returns:
+            datetime: next fire datetime or None if alarm is not scheduled
+        """
+        entry = self.__entries.get(alarm_uuid)
+        return entry[self.FIRE] if entry else None
+
+    def get_next(self, count=1):
+        """
+        Return next alarms to fire, walking heap tree in O(k log N)
+
+        Args:
+            count (int): number of alarms to return
+
+        Returns:
+            list: list of (fire datetime, alarm uuid) tuples sorted by fire datetime
+        """
+        nexts = []
+        candidates = [(self.__heap[0], 0)] if self.__heap else []
+        while candidates and len(nexts) < count:
+            entry, index = heapq.heappop(candidates)
+            if entry[self.VALID]:
+                nexts.append((entry[self.FIRE], entry[self.UUID]))
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(self.__heap):
+                    heapq.heappush(candidates, (self.__heap[child], child))
+
+        return nexts
+
+    def get_due(self, now):
+        """
+        Return alarms whose fire datetime is reached, walking only due heap entries
+
+        Args:
+            now (datetime): reference datetime
+
+        Returns:
+            list: list of (fire datetime, alarm uuid) tuples sorted by fire datetime
+        """
+        due = []
+        indexes = [0] if self.__heap else []
+        while indexes:
+            index = indexes.pop()
+            entry = self.__heap[index]
+            if entry[self.FIRE] > now:
+                continue
+            if entry[self.VALID]:
+                due.append((entry[self.FIRE], entry[self.UUID]))
+            indexes.extend(
+                child
+                for child in (2 * index + 1, 2 * index + 2)
+                if child < len(self.__heap)
+            )
+
+        return sorted(due)
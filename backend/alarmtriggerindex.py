@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from .alarm import Alarm
+
+
+class AlarmTriggerIndex:
+    """
+    Index enabled alarms by trigger slot (weekday, hour, minute) to avoid
+    walking all alarms on each time tick
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.__slots = {}
+        self.__alarm_slots = {}
+
+    def __len__(self):
+        """
+        Return number of indexed alarms
+        """
+        return len(self.__alarm_slots)
+
+    def __contains__(self, alarm_uuid):
+        """
+        Return True if alarm is indexed
+        """
+        return alarm_uuid in self.__alarm_slots
+
+    def add(self, alarm_uuid, alarm):
+        """
+        Index (or reindex) specified alarm. Disabled alarm is not indexed
+
+        Args:
+            alarm_uuid (string): alarm identifier
+            alarm (Alarm): alarm instance
+        """
+        self.remove(alarm_uuid)
+        if not alarm.enabled:
+            return
+
+        keys = [
+            (weekday, alarm.hour, alarm.minute)
+            for weekday, bit in Alarm.WEEKDAY_BITS.items()
+            if alarm.days & bit
+        ]
+        for key in keys:
+            self.__slots.setdefault(key, set()).add(alarm_uuid)
+        self.__alarm_slots[alarm_uuid] = keys
+
+    def remove(self, alarm_uuid):
+        """
+        Remove specified alarm from index
+
+        Args:
+            alarm_uuid (string): alarm identifier
+        """
+        for key in self.__alarm_slots.pop(alarm_uuid, []):
+            uuids = self.__slots.get(key)
+            if uuids is None:
+                continue
+            uuids.discard(alarm_uuid)
+            if not uuids:
+                del self.__slots[key]
+
+    def build(self, alarms):
+        """
+        Rebuild index from scratch
+
+        Args:
+            alarms (dict): alarm instances indexed by uuid
+        """
+        self.clear()
+        for alarm_uuid, alarm in alarms.items():
+            self.add(alarm_uuid, alarm)
+
+    def clear(self):
+        """
+        Clear index
+        """
+        self.__slots.clear()
+        self.__alarm_slots.clear()
+
+    def get(self, weekday, hour, minute):
+        """
+        Return alarms to trigger at specified slot
+
+        Args:
+            weekday (string): literal weekday with 3 first chars (mon, tue...)
+            hour (int): hour
+            minute (int): minute
+
+        Returns:
+            list: list of alarm uuids
+        """
+        return list(self.__slots.get((weekday, hour, minute), ()))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+
+
+class Clock:
+    """
+    Keep deadlines on monotonic clock and detect wall clock jumps (NTP correction on
+    devices without RTC, manual time change) from drift between both clocks.
+    """
+
+    def __init__(self, tolerance=5.0):
+        """
+        Constructor
+
+        Args:
+            tolerance (float): min wall clock change considered as a jump (in seconds)
+        """
+        self.tolerance = tolerance
+        self.__offset = self.__get_offset()
+
+    @staticmethod
+    def __get_offset():
+        """
+        Return offset between wall clock and monotonic clock
+        """
+        return time.time() - time.monotonic()
+
+    def deadline(self, delay):
+        """
+        Return monotonic deadline
+
+        Args:
+            delay (float): delay from now (in seconds)
+
+        Returns:
+            float: monotonic deadline
+        """
+        return time.monotonic() + delay
+
+    def remaining(self, deadline):
+        """
+        Return remaining time before deadline
+
+        Args:
+            deadline (float): monotonic deadline
+
+        Returns:
+            float: remaining time (in seconds), 0 if deadline is over
+        """
+        return max(0.0, deadline - time.monotonic())
+
+    def to_wall(self, deadline):
+        """
+        Convert monotonic deadline to wall clock timestamp, to persist it
+
+        Args:
+            deadline (float): monotonic deadline
+
+        Returns:
+            float: wall clock timestamp
+        """
+        return deadline + self.__get_offset()
+
+    def from_wall(self, timestamp):
+        """
+        Convert wall clock timestamp to monotonic deadline
+
+        Args:
+            timestamp (float): wall clock timestamp
+
+        Returns:
+            float: monotonic deadline
+        """
+        return timestamp - self.__get_offset()
+
+    def check_jump(self):
+        """
+        Check if wall clock jumped since last check. Slow drift (NTP slewing) is
+        absorbed by each check.
+
+        Returns:
+            float: wall clock jump (in seconds, negative if clock went back) or 0.0
+        """
+        offset = self.__get_offset()
+        jump = offset - self.__offset
+        self.__offset = offset
+        return jump if abs(jump) > self.tolerance else 0.0
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from threading import Condition, Lock, Thread
+
+
+class CoalescingWriter:
+    """
+    Buffer records in memory and write them in batches once no record was added for
+    some delay. Pending records are written at most max_delay after the first one.
+    Writers of state snapshots can request a write without records (see touch).
+    """
+
+    def __init__(self, write, delay=0.5, max_delay=5.0, logger=None):
+        """
+        Constructor
+
+        Args:
+            write (function): function writing a batch, called with list of records.
+                              Raising an exception keeps records pending
+            delay (float): delay without new record before writing (in seconds)
+            max_delay (float): max delay a record stays pending (in seconds)
+            logger (Logger): logger instance
+        """
+        self.logger = logger or logging.getLogger(self.__class__.__name__)
+        self.delay = delay
+        self.max_delay = max_delay
+        self.__write = write
+        self.__pending = []
+        self.__dirty = False
+        self.__first_at = None
+        self.__last_at = None
+        self.__condition = Condition()
+        self.__write_lock = Lock()
+        self.__running = False
+        self.__thread = None
+
+    def __len__(self):
+        """
+        Return number of pending records
+        """
+        with self.__condition:
+            return len(self.__pending)
+
+    def add(self, records):
+        """
+        Add records to write. Writer thread is started if necessary
+
+        Args:
+            records (list): list of records
+        """
+        with self.__condition:
+            self.__changed()
+            self.__pending.extend(records)
+
+    def touch(self):
+        """
+        Request a write without record, for writers saving a state snapshot: write
+        function is called with records added meanwhile (maybe none). Requests are
+        merged until next write so nothing accumulates while writes fail.
+        """
+        with self.__condition:
+            self.__changed()
+            self.__dirty = True
+
+    def __changed(self):
+        """
+        Update write timings, wake up writer thread and start it if necessary. Must
+        be called with condition acquired, before pending state is updated
+        """
+        now = time.monotonic()
+        if not self.__dirty and not self.__pending:
+            self.__first_at = now
+        self.__last_at = now
+        self.__condition.notify()
+
+        if not self.__running:
+            self.__running = True
+            self.__thread = Thread(
+                target=self.__run, name="coalescingwriter", daemon=True
+            )
+            self.__thread.start()
+
+    def flush(self):
+        """
+        Write pending records now
+
+        Returns:
+            bool: True if pending records were written
+        """
+        with self.__write_lock:
+            with self.__condition:
+                batch = self.__pending
+                dirty = self.__dirty
+                self.__pending = []
+                self.__dirty = False
+            if not batch and not dirty:
+                return True
+
+            try:
+                self.__write(batch)
+            except Exception:
+                self.logger.exception("Unable to write %d records", len(batch))
+                with self.__condition:
+                    # keep order and retry after delay
+                    self.__pending = batch + self.__pending
+                    self.__dirty = self.__dirty or dirty
+                    self.__first_at = self.__last_at = time.monotonic()
+                return False
+
+            return True
+
+    def stop(self):
+        """
+        Stop writer thread and write pending records
+
+        Returns:
+            bool: True if pending records were written
+        """
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+        if self.__thread:
+            self.__thread.join(self.max_delay)
+            self.__thread = None
+
+        return self.flush()
+
+    def __run(self):
+        """
+        Writer thread main loop
+        """
+        while True:
+            with self.__condition:
+                while self.__running and not self.__dirty and not self.__pending:
+                    self.__condition.wait()
+                if not self.__running:
+                    return
+
+                write_at = min(
+                    self.__last_at + self.delay, self.__first_at + self.max_delay
+                )
+                timeout = write_at - time.monotonic()
+                if timeout > 0:
+                    self.__condition.wait(timeout)
+                    continue
+
+            self.flush()
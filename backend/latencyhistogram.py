@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from threading import Lock
+
+
+class LatencyHistogram:
+    """
+    Latency histogram with fixed buckets (in milliseconds). Values greater than last
+    bucket bound are counted in overflow bucket.
+    """
+
+    BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 60000)
+
+    def __init__(self, buckets=None):
+        """
+        Constructor
+
+        Args:
+            buckets (tuple): sorted bucket upper bounds (in milliseconds)
+        """
+        self.buckets = tuple(buckets or self.BUCKETS)
+        self.__lock = Lock()
+        self.clear()
+
+    def __len__(self):
+        """
+        Return number of recorded values
+        """
+        return self.__count
+
+    def clear(self):
+        """
+        Reset histogram
+        """
+        with self.__lock:
+            self.__counts = [0] * (len(self.buckets) + 1)
+            self.__count = 0
+            self.__sum = 0.0
+            self.__min = None
+            self.__max = None
+
+    def record(self, value):
+        """
+        Record value
+
+        Args:
+            value (float): latency (in milliseconds)
+        """
+        index = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            index += 1
+
+        with self.__lock:
+            self.__counts[index] += 1
+            self.__count += 1
+            self.__sum += value
+            self.__min = value if self.__min is None else min(self.__min, value)
+            self.__max = value if self.__max is None else max(self.__max, value)
+
+    def dump(self):
+        """
+        Dump histogram content
+
+        Returns:
+            dict: histogram content::
+
+                {
+                    count (int): number of recorded values
+                    sum (float): sum of recorded values (in milliseconds)
+                    min (float): min recorded value or None
+                    max (float): max recorded value or None
+                    mean (float): mean of recorded values or None
+                    buckets (list): list of buckets::
+
+                        [
+                            {
+                                le (int): bucket upper bound, None for overflow bucket
+                                count (int): number of values in bucket
+                            },
+                            ...
+                        ]
+
+                }
+
+        """
+        with self.__lock:
+            counts = list(self.__counts)
+            content = {
+                "count": self.__count,
+                "sum": self.__sum,
+                "min": self.__min,
+                "max": self.__max,
+                "mean": self.__sum / self.__count if self.__count else None,
+            }
+
+        bounds = list(self.buckets) + [None]
+        content["buckets"] = [
+            {"le": bound, "count": count} for bound, count in zip(bounds, counts)
+        ]
+        return content
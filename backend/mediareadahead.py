@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+from threading import Lock
+
+
+class MediaReadAhead:
+    """
+    Read media files ahead into page cache, within a memory budget, so alarm audio
+    does not stutter reading cold files. Cached pages are released on eviction.
+    """
+
+    CHUNK_SIZE = 262144
+
+    def __init__(self, budget=33554432, logger=None):
+        """
+        Constructor
+
+        Args:
+            budget (int): max number of bytes to read ahead
+            logger (Logger): logger instance
+        """
+        self.logger = logger or logging.getLogger(self.__class__.__name__)
+        self.budget = budget
+        self.__warmed = {}
+        self.__lock = Lock()
+
+    def __len__(self):
+        """
+        Return number of files read ahead
+        """
+        return len(self.__warmed)
+
+    def get_used(self):
+        """
+        Return number of bytes read ahead
+
+        Returns:
+            int: number of bytes
+        """
+        return sum(self.__warmed.values())
+
+    def prefetch(self, paths):
+        """
+        Read ahead specified files until budget is reached. Already read files are
+        skipped.
+
+        Args:
+            paths (list): list of file paths
+
+        Returns:
+            int: number of bytes read ahead
+        """
+        with self.__lock:
+            used = sum(self.__warmed.values())
+            for path in paths:
+                if path in self.__warmed:
+                    continue
+                remaining = self.budget - used
+                if remaining <= 0:
+                    self.logger.debug("Read ahead budget reached")
+                    break
+
+                try:
+                    size = self.__read(path, min(os.path.getsize(path), remaining))
+                except OSError as error:
+                    self.logger.warning("Unable to read ahead %s: %s", path, error)
+                    continue
+                self.__warmed[path] = size
+                used += size
+
+            return used
+
+    def evict(self):
+        """
+        Release read ahead files from page cache
+        """
+        with self.__lock:
+            warmed = self.__warmed
+            self.__warmed = {}
+
+        if not hasattr(os, "posix_fadvise"):
+            return
+        for path, size in warmed.items():
+            try:
+                with open(path, "rb") as fd:
+                    os.posix_fadvise(fd.fileno(), 0, size, os.POSIX_FADV_DONTNEED)
+            except OSError as error:
+                self.logger.debug("Unable to evict %s: %s", path, error)
+
+    def __read(self, path, size):
+        """
+        Read file head into page cache
+
+        Args:
+            path (string): file path
+            size (int): number of bytes to read
+
+        Returns:
+            int: number of bytes read
+        """
+        buffer = bytearray(min(self.CHUNK_SIZE, max(size, 1)))
+        read = 0
+        with open(path, "rb") as fd:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd.fileno(), 0, size, os.POSIX_FADV_WILLNEED)
+            view = memoryview(buffer)
+            while read < size:
+                count = fd.readinto(view[: min(len(buffer), size - read)])
+                if not count:
+                    break
+                read += count
+
+        return read
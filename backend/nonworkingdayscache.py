@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+from datetime import date, timedelta
+from threading import Lock
+
+
+class NonWorkingDaysCache:
+    """
+    Cache of non working day flags over a rolling horizon of days.
+    Cache is considered as stale after ttl and should be refreshed a bit before (refresh-ahead).
+    """
+
+    VERSION = 1
+
+    def __init__(self, horizon=30, ttl=43200, refresh_ahead=0.8):
+        """
+        Constructor
+
+        Args:
+            horizon (int): number of days to cache starting from today
+            ttl (int): cache time to live (in seconds)
+            refresh_ahead (float): ratio of ttl after which cache should be refreshed
+        """
+        self.horizon = horizon
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.__days = {}
+        self.__updated_at = None
+        self.__lock = Lock()
+
+    def __len__(self):
+        """
+        Return number of cached days
+        """
+        return len(self.__days)
+
+    def get(self, day):
+        """
+        Return non working day flag of specified day
+
+        Args:
+            day (date): day
+
+        Returns:
+            bool: True if non working day, None if day is not cached
+        """
+        return self.__days.get(day)
+
+    def set(self, day, is_non_working_day):
+        """
+        Cache non working day flag of single day
+
+        Args:
+            day (date): day
+            is_non_working_day (bool): True if day is non working day
+        """
+        with self.__lock:
+            self.__days[day] = is_non_working_day
+
+    def update(self, days, updated_at=None):
+        """
+        Cache non working day flags of multiple days at once
+
+        Args:
+            days (dict): non working day flags indexed by date
+            updated_at (float): update timestamp. Now if not specified
+        """
+        with self.__lock:
+            new_days = dict(self.__days)
+            new_days.update(days)
+            self.__days = new_days
+            self.__updated_at = time.time() if updated_at is None else updated_at
+
+    def purge(self, today):
+        """
+        Drop days before today
+
+        Args:
+            today (date): today date
+        """
+        with self.__lock:
+            self.__days = {
+                day: flag for day, flag in self.__days.items() if day >= today
+            }
+
+    def get_horizon_days(self, today):
+        """
+        Return days covered by horizon
+
+        Args:
+            today (date): today date
+
+        Returns:
+            list: list of dates
+        """
+        return [today + timedelta(days=offset) for offset in range(self.horizon)]
+
+    def is_complete(self, today):
+        """
+        Return True if all horizon days are cached
+
+        Args:
+            today (date): today date
+
+        Returns:
+            bool: True if cache is complete
+        """
+        return all(day in self.__days for day in self.get_horizon_days(today))
+
+    def needs_refresh(self, today):
+        """
+        Return True if cache should be refreshed: horizon not fully cached or ttl almost over
+
+        Args:
+            today (date): today date
+
+        Returns:
+            bool: True if cache should be refreshed
+        """
+        if self.__updated_at is None or not self.is_complete(today):
+            return True
+        return time.time() - self.__updated_at >= self.ttl * self.refresh_ahead
+
+    def dump(self):
+        """
+        Dump cache content to serializable dict
+
+        Returns:
+            dict: cache content::
+
+                {
+                    version (int): cache format version
+                    updated_at (float): last update timestamp
+                    days (dict): non working day flags indexed by iso date
+                }
+
+        """
+        days = self.__days
+        return {
+            "version": self.VERSION,
+            "updated_at": self.__updated_at,
+            "days": {day.isoformat(): flag for day, flag in days.items()},
+        }
+
+    def load(self, data):
+        """
+        Load cache content from dumped dict
+
+        Args:
+            data (dict): dumped cache content
+
+        Returns:
+            bool: True if content loaded, False if content is invalid or has different version
+        """
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return False
+
+        try:
+            days = {
+                date.fromisoformat(day): bool(flag)
+                for day, flag in data.get("days", {}).items()
+            }
+        except (AttributeError, TypeError, ValueError):
+            return False
+
+        with self.__lock:
+            self.__days = days
+            self.__updated_at = data.get("updated_at")
+
+        return True
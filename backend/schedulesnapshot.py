@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import struct
+import zlib
+from datetime import datetime
+from uuid import UUID
+
+
+class ScheduleSnapshot:
+    """
+    Compact binary snapshot of scheduler state: next fire timestamp and scheduled
+    flag of each alarm, pending stop deadlines and hash of schedule inputs.
+    Alarm identifiers are stored as 16 bytes uuids. Snapshot is written through cleep
+    filesystem so it works on read-only root filesystem.
+    """
+
+    MAGIC = b"ACSS"
+    VERSION = 1
+    # magic, version, schedule hash, alarms count, stop deadlines count
+    HEADER = struct.Struct("<4sBIII")
+    # alarm uuid, next fire timestamp (0 if none), flags
+    ALARM = struct.Struct("<16sqB")
+    # alarm uuid, stop deadline timestamp
+    STOP = struct.Struct("<16sd")
+    FLAG_SCHEDULED = 1
+
+    def __init__(self, path, cleep_filesystem, logger=None):
+        """
+        Constructor
+
+        Args:
+            path (string): snapshot file path
+            cleep_filesystem (CleepFilesystem): cleep filesystem instance
+            logger (Logger): logger instance
+        """
+        self.logger = logger or logging.getLogger(self.__class__.__name__)
+        self.cleep_filesystem = cleep_filesystem
+        self.path = path
+
+    @staticmethod
+    def compute_hash(inputs):
+        """
+        Compute hash of schedule inputs
+
+        Args:
+            inputs (any): json serializable schedule inputs
+
+        Returns:
+            int: 32 bits hash
+        """
+        content = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+        return zlib.crc32(content.encode("utf-8"))
+
+    def save(self, schedule_hash, fires, scheduled, stops):
+        """
+        Save snapshot atomically
+
+        Args:
+            schedule_hash (int): hash of schedule inputs
+            fires (dict): next fire datetime (or None) indexed by alarm uuid
+            scheduled (set): uuids of scheduled alarms
+            stops (dict): stop deadline timestamp indexed by alarm uuid
+
+        Raises:
+            OSError: if write failed
+            ValueError: if an alarm identifier is not an uuid
+        """
+        chunks = [
+            self.HEADER.pack(
+                self.MAGIC, self.VERSION, schedule_hash, len(fires), len(stops)
+            )
+        ]
+        for alarm_uuid, fire in fires.items():
+            flags = self.FLAG_SCHEDULED if alarm_uuid in scheduled else 0
+            timestamp = int(fire.timestamp()) if fire else 0
+            chunks.append(self.ALARM.pack(UUID(alarm_uuid).bytes, timestamp, flags))
+        for alarm_uuid, deadline in stops.items():
+            chunks.append(self.STOP.pack(UUID(alarm_uuid).bytes, deadline))
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            if not self.cleep_filesystem.mkdirs(directory):
+                raise OSError("Unable to create snapshot directory")
+        tmp_path = self.path + ".tmp"
+        fd = self.cleep_filesystem.open(tmp_path, "wb")
+        try:
+            fd.write(b"".join(chunks))
+            fd.flush()
+            os.fsync(fd.fileno())
+        finally:
+            self.cleep_filesystem.close(fd)
+        if not self.cleep_filesystem.move(tmp_path, self.path):
+            raise OSError("Unable to replace snapshot")
+
+    def load(self):
+        """
+        Load snapshot
+
+        Returns:
+            dict: snapshot content or None if snapshot does not exist or is invalid::
+
+                {
+                    hash (int): hash of schedule inputs
+                    fires (dict): next fire datetime (or None) indexed by alarm uuid
+                    scheduled (set): uuids of scheduled alarms
+                    stops (dict): stop deadline timestamp indexed by alarm uuid
+                }
+
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        try:
+            with open(self.path, "rb") as fd:
+                data = fd.read()
+            magic, version, schedule_hash, alarms_count, stops_count = (
+                self.HEADER.unpack_from(data, 0)
+            )
+            expected_size = (
+                self.HEADER.size
+                + alarms_count * self.ALARM.size
+                + stops_count * self.STOP.size
+            )
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError("Unsupported snapshot format")
+            if len(data) != expected_size:
+                raise ValueError("Snapshot size mismatch")
+        except (OSError, struct.error, ValueError) as error:
+            self.logger.warning("Invalid schedule snapshot: %s", error)
+            return None
+
+        fires = {}
+        scheduled = set()
+        offset = self.HEADER.size
+        for uuid_bytes, timestamp, flags in self.ALARM.iter_unpack(
+            data[offset : offset + alarms_count * self.ALARM.size]
+        ):
+            alarm_uuid = str(UUID(bytes=uuid_bytes))
+            fires[alarm_uuid] = datetime.fromtimestamp(timestamp) if timestamp else None
+            if flags & self.FLAG_SCHEDULED:
+                scheduled.add(alarm_uuid)
+        offset += alarms_count * self.ALARM.size
+        stops = {
+            str(UUID(bytes=uuid_bytes)): deadline
+            for uuid_bytes, deadline in self.STOP.iter_unpack(data[offset:])
+        }
+
+        return {
+            "hash": schedule_hash,
+            "fires": fires,
+            "scheduled": scheduled,
+            "stops": stops,
+        }
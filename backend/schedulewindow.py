@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+
+class ScheduleWindow:
+    """
+    Rolling window of scheduled alarm occurrences over next days, keyed by date.
+    Past days are expired in O(1) per day.
+    """
+
+    def __init__(self, days=2):
+        """
+        Constructor
+
+        Args:
+            days (int): number of days covered by window, starting from today
+        """
+        self.days = days
+        self.__start = None
+        self.__occurrences = {}
+        self.__alarm_days = {}
+
+    def __len__(self):
+        """
+        Return number of scheduled alarms
+        """
+        return len(self.__alarm_days)
+
+    def __contains__(self, alarm_uuid):
+        """
+        Return True if alarm is scheduled
+        """
+        return alarm_uuid in self.__alarm_days
+
+    def advance(self, today):
+        """
+        Move window start to today, expiring past days
+
+        Args:
+            today (date): today date
+
+        Returns:
+            list: uuids of alarms whose occurrence expired
+        """
+        if self.__start is None:
+            self.__start = today
+            return []
+        if today <= self.__start:
+            return []
+
+        expired = []
+        elapsed = min((today - self.__start).days, self.days)
+        for offset in range(elapsed):
+            day = self.__start + timedelta(days=offset)
+            for alarm_uuid in self.__occurrences.pop(day, ()):
+                del self.__alarm_days[alarm_uuid]
+                expired.append(alarm_uuid)
+        self.__start = today
+
+        return expired
+
+    def set(self, alarm_uuid, day):
+        """
+        Set occurrence day of specified alarm
+
+        Args:
+            alarm_uuid (string): alarm identifier
+            day (date): occurrence day. None if alarm has no occurrence
+
+        Returns:
+            bool: True if alarm occurrence is within window
+        """
+        self.remove(alarm_uuid)
+        if day is None or self.__start is None:
+            return False
+        if not self.__start <= day < self.__start + timedelta(days=self.days):
+            return False
+
+        self.__occurrences.setdefault(day, set()).add(alarm_uuid)
+        self.__alarm_days[alarm_uuid] = day
+        return True
+
+    def remove(self, alarm_uuid):
+        """
+        Remove specified alarm from window
+
+        Args:
+            alarm_uuid (string): alarm identifier
+
+        Returns:
+            bool: True if alarm was scheduled
+        """
+        day = self.__alarm_days.pop(alarm_uuid, None)
+        if day is None:
+            return False
+
+        alarm_uuids = self.__occurrences[day]
+        alarm_uuids.discard(alarm_uuid)
+        if not alarm_uuids:
+            del self.__occurrences[day]
+        return True
+
+    def clear(self):
+        """
+        Clear window
+        """
+        self.__occurrences.clear()
+        self.__alarm_days.clear()
+
+    def reset(self, today):
+        """
+        Clear window and move its start to today, even backward
+
+        Args:
+            today (date): today date
+        """
+        self.clear()
+        self.__start = today
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import math
+import time
+from threading import Event, Lock, Thread, current_thread
+
+
+class TimerWheelTimer:
+    """
+    Timer handle returned by TimerWheel
+    """
+
+    __slots__ = ("wheel", "deadline", "bucket", "callback", "args")
+
+    def __init__(self, wheel, deadline, callback, args):
+        """
+        Constructor
+
+        Args:
+            wheel (TimerWheel): timer wheel instance
+            deadline (int): deadline tick
+            callback (function): function to call when timer expires
+            args (list): callback arguments
+        """
+        self.wheel = wheel
+        self.deadline = deadline
+        self.bucket = None
+        self.callback = callback
+        self.args = args
+
+    def cancel(self):
+        """
+        Cancel timer
+        """
+        self.wheel.cancel(self)
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: a single thread handles all timers.
+    Timer insertion and cancellation are O(1).
+    """
+
+    def __init__(self, tick=1.0, slots=512, logger=None):
+        """
+        Constructor
+
+        Args:
+            tick (float): wheel resolution (in seconds)
+            slots (int): number of wheel buckets
+            logger (Logger): logger instance
+        """
+        self.logger = logger or logging.getLogger(self.__class__.__name__)
+        self.tick = tick
+        self.__buckets = [{} for _ in range(slots)]
+        self.__lock = Lock()
+        self.__stop_event = Event()
+        self.__thread = None
+        self.__started_at = time.monotonic()
+        self.__current_tick = 0
+
+    def __len__(self):
+        """
+        Return number of pending timers
+        """
+        with self.__lock:
+            return sum(len(bucket) for bucket in self.__buckets)
+
+    def is_running(self):
+        """
+        Return True if wheel thread is running
+
+        Returns:
+            bool: True if running
+        """
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self):
+        """
+        Start wheel thread
+        """
+        if self.is_running():
+            return
+
+        # skip ticks elapsed while wheel was not running, no timer is pending there
+        with self.__lock:
+            self.__current_tick = max(self.__current_tick, self.__elapsed_ticks())
+        self.__stop_event.clear()
+        self.__thread = Thread(target=self.__run, name="timerwheel", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stop wheel thread. Pending timers are dropped
+        """
+        self.__stop_event.set()
+        if (
+            self.__thread
+            and self.__thread.is_alive()
+            and self.__thread is not current_thread()
+        ):
+            self.__thread.join(self.tick * 2)
+        self.__thread = None
+        with self.__lock:
+            for bucket in self.__buckets:
+                bucket.clear()
+
+    def schedule(self, delay, callback, args=None):
+        """
+        Schedule new timer. Wheel is started if necessary
+
+        Args:
+            delay (float): delay before calling callback (in seconds)
+            callback (function): function to call
+            args (list): callback arguments
+
+        Returns:
+            TimerWheelTimer: timer handle that can be cancelled
+        """
+        with self.__lock:
+            ticks = max(1, math.ceil(delay / self.tick))
+            base_tick = max(self.__current_tick, self.__elapsed_ticks())
+            timer = TimerWheelTimer(self, base_tick + ticks, callback, args or [])
+            timer.bucket = timer.deadline % len(self.__buckets)
+            self.__buckets[timer.bucket][id(timer)] = timer
+
+        self.start()
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancel specified timer
+
+        Args:
+            timer (TimerWheelTimer): timer handle
+        """
+        with self.__lock:
+            if timer.bucket is not None:
+                self.__buckets[timer.bucket].pop(id(timer), None)
+                timer.bucket = None
+
+    def __elapsed_ticks(self):
+        """
+        Return number of ticks elapsed since wheel creation
+        """
+        return int((time.monotonic() - self.__started_at) / self.tick)
+
+    def __run(self):
+        """
+        Wheel thread main loop
+        """
+        while not self.__stop_event.is_set():
+            target_tick = self.__elapsed_ticks()
+            while self.__current_tick < target_tick:
+                self.__process_tick()
+            next_tick_at = self.__started_at + (self.__current_tick + 1) * self.tick
+            self.__stop_event.wait(max(0.0, next_tick_at - time.monotonic()))
+
+    def __process_tick(self):
+        """
+        Advance wheel by one tick and run expired timers
+        """
+        with self.__lock:
+            self.__current_tick += 1
+            bucket = self.__buckets[self.__current_tick % len(self.__buckets)]
+            expired = [
+                timer
+                for timer in bucket.values()
+                if timer.deadline <= self.__current_tick
+            ]
+            for timer in expired:
+                del bucket[id(timer)]
+                timer.bucket = None
+
+        for timer in expired:
+            try:
+                timer.callback(*timer.args)
+            except Exception:
+                self.logger.exception("Error occured during timer callback")
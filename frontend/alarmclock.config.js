@@ -30,14 +30,23 @@ function($rootScope, cleepService, toastService, alarmclockService, $location, $
         self.selectedDays = [];
         self.playlistRepeat = true;
         self.playlistShuffle = false;
+        self.editedAlarmUuid = null;
 
         self.$onInit = function() {
             cleepService.getModuleConfig('alarmclock');
             cleepService.reloadDevices();
         };
 
-        self.addAlarm = function() {
-            var days = {
+        self.saveAlarm = function() {
+            if (self.editedAlarmUuid) {
+                self.updateAlarm();
+            } else {
+                self.addAlarm();
+            }
+        };
+
+        self.__getSelectedDays = function() {
+            return {
                 mon: self.selectedDays.indexOf('mon') !== -1,
                 tue: self.selectedDays.indexOf('tue') !== -1,
                 wed: self.selectedDays.indexOf('wed') !== -1,
@@ -46,16 +55,30 @@ function($rootScope, cleepService, toastService, alarmclockService, $location, $
                 sat: self.selectedDays.indexOf('sat') !== -1,
                 sun: self.selectedDays.indexOf('sun') !== -1,
             };
+        };
+
+        self.addAlarm = function() {
+            var days = self.__getSelectedDays();
 
             alarmclockService.addAlarm(self.time.getHours(), self.time.getMinutes(), self.timeout, days, self.nonWorkingDays, self.volume, self.playlistRepeat, self.playlistShuffle)
                 .then(resp => {
                     toastService.success('Alarm added');
-                    cleepService.reloadDevices();
+                    self.clearForm();
+                });
+        };
+
+        self.updateAlarm = function() {
+            var days = self.__getSelectedDays();
+
+            alarmclockService.updateAlarm(self.editedAlarmUuid, self.time.getHours(), self.time.getMinutes(), self.timeout, days, self.nonWorkingDays, self.volume, self.playlistRepeat, self.playlistShuffle)
+                .then(resp => {
+                    toastService.success('Alarm updated');
                     self.clearForm();
                 });
         };
 
         self.clearForm = function() {
+            self.editedAlarmUuid = null;
             self.selectedDays.splice(0, self.selectedDays.length);
             self.nonWorkingDays = false;
             self.time = self.defaultTime;
@@ -75,16 +98,16 @@ function($rootScope, cleepService, toastService, alarmclockService, $location, $
                     if (showToast) {
                         toastService.success('Alarm deleted');
                     }
-                    cleepService.reloadDevices();
                 });
         };
 
         self.editAlarm = function(device) {
             self.duplicateAlarm(device);
-            self.__removeAlarm(device.uuid, false);
+            self.editedAlarmUuid = device.uuid;
         };
 
         self.duplicateAlarm = function(device) {
+            self.editedAlarmUuid = null;
             self.selectedDays.splice(0, self.selectedDays.length);
             for (const [day, enabled] of Object.entries(device.days)) {
                 if (enabled) {
@@ -104,7 +127,6 @@ function($rootScope, cleepService, toastService, alarmclockService, $location, $
                 .then(resp => {
                     var message = resp.data ? 'Alarm enabled' : 'Alarm disabled';
                     toastService.success(message);
-                    cleepService.reloadDevices();
                 });
         };
 
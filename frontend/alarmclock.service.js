@@ -20,10 +20,46 @@ angular
         return selectedDays.join(', ') || 'No day selected';
     };  
 })
-.service('alarmclockService', ['$rootScope', 'rpcService',
-function($rootScope, rpcService) {
+.service('alarmclockService', ['$rootScope', 'rpcService', 'cleepService',
+function($rootScope, rpcService, cleepService) {
     var self = this;
 
+    /**
+     * Patch local devices list with alarm delta (device is null when alarm is deleted)
+     * Devices are fully reloaded if patch is not possible
+     */
+    self.patchDevice = function(alarmUuid, device) {
+        const devices = cleepService.devices;
+        if (!Array.isArray(devices) || !alarmUuid) {
+            cleepService.reloadDevices();
+            return;
+        }
+
+        const index = devices.findIndex(current => current.uuid === alarmUuid);
+        if (!device) {
+            if (index !== -1) {
+                devices.splice(index, 1);
+            }
+        } else if (index === -1) {
+            devices.push(Object.assign({ module: 'alarmclock' }, device));
+        } else {
+            // replace object so collection watchers are notified
+            devices[index] = Object.assign({}, devices[index], device);
+        }
+    };
+
+    $rootScope.$on('alarmclock.alarm.created', function(event, uuid, params) {
+        self.patchDevice(uuid, params);
+    });
+
+    $rootScope.$on('alarmclock.alarm.updated', function(event, uuid, params) {
+        self.patchDevice(uuid, params);
+    });
+
+    $rootScope.$on('alarmclock.alarm.deleted', function(event, uuid, params) {
+        self.patchDevice(uuid, null);
+    });
+
     self.addAlarm = function(hour, minute, timeout, days, nonWorkingDays, volume, repeat, shuffle) {
         return rpcService.sendCommand('add_alarm', 'alarmclock', {
             alarm_time: { hour, minute },
@@ -36,6 +72,19 @@ function($rootScope, rpcService) {
         });
     };
 
+    self.updateAlarm = function(alarmUuid, hour, minute, timeout, days, nonWorkingDays, volume, repeat, shuffle) {
+        return rpcService.sendCommand('update_alarm', 'alarmclock', {
+            alarm_uuid: alarmUuid,
+            alarm_time: { hour, minute },
+            timeout,
+            days,
+            non_working_days: nonWorkingDays,
+            volume,
+            repeat,
+            shuffle,
+        });
+    };
+
     self.removeAlarm = function(alarmUuid) {
         return rpcService.sendCommand('remove_alarm', 'alarmclock', {
             alarm_uuid: alarmUuid,
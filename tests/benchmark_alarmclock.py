@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Alarmclock hot paths benchmark
+
+Times _trigger_alarm, _schedule_alarm, add_alarm and formatters _fill_profile with
+synthetic alarms and stores results in a json file that can be compared with a
+previous run.
+
+Run it from tests directory, like unit tests (backend and test helpers are imported
+relatively to it).
+
+Usage:
+    python benchmark_alarmclock.py [--sizes 10,1000,100000] [--runs 5]
+                                   [--output benchmark.json] [--compare previous.json]
+"""
+from cleep.libs.tests import session
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock
+
+sys.path.append("../")
+from backend.alarmclock import Alarmclock
+from backend.alarmjournal import AlarmJournal
+from backend.schedulesnapshot import ScheduleSnapshot
+from backend.alarmscheduledtoalarmformatter import AlarmScheduledToAlarmFormatter
+from backend.alarmunscheduledtoalarmformatter import AlarmUnscheduledToAlarmFormatter
+from backend.alarmtriggeredtoalarmformatter import AlarmTriggeredToAlarmFormatter
+from backend.alarmstoppedtoalarmformatter import AlarmStoppedToAlarmFormatter
+from test_alarmclock import LocalFilesystem
+
+DEFAULT_SIZES = [10, 1000, 100000]
+BENCHMARK_VERSION = 1
+OPTIONS = {
+    "sizes": DEFAULT_SIZES,
+    "runs": 5,
+    "output": "benchmark.json",
+    "compare": None,
+}
+RESULTS = {}
+
+
+def make_alarms(count):
+    """
+    Build synthetic alarms spread over the week
+
+    Args:
+        count (int): number of alarms
+
+    Returns:
+        list: list of add_alarm parameters
+    """
+    weekdays = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+    alarms = []
+    for index in range(count):
+        alarms.append(
+            {
+                "alarm_time": {"hour": index % 24, "minute": (index // 24) % 60},
+                "timeout": 10,
+                "days": {
+                    weekday: (index + offset) % 3 == 0
+                    for offset, weekday in enumerate(weekdays)
+                },
+                "non_working_days": index % 2 == 0,
+                "volume": 50,
+                "repeat": False,
+                "shuffle": False,
+            }
+        )
+        # make sure at least one day is selected
+        alarms[-1]["days"]["mon"] = True
+    return alarms
+
+
+def measure(func, runs, setup=None):
+    """
+    Measure function duration
+
+    Args:
+        func (function): function to measure
+        runs (int): number of runs
+        setup (function): function called before each run, not measured
+
+    Returns:
+        dict: durations statistics (in milliseconds)
+    """
+    durations = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "mean": statistics.mean(durations),
+        "max": max(durations),
+        "runs": runs,
+    }
+
+
+class BenchmarkAlarmclock(unittest.TestCase):
+    # number of alarms, set before each suite run
+    size = 10
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL)
+        self.session = session.TestSession(self)
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.session.clean()
+        self.tmpdir.cleanup()
+
+    def init(self, size):
+        self.module = self.session.setup(Alarmclock, mock_on_start=True)
+        self.module._Alarmclock__journal = AlarmJournal(
+            os.path.join(self.tmpdir.name, "alarms.journal"), LocalFilesystem()
+        )
+        self.module._Alarmclock__snapshot = ScheduleSnapshot(
+            os.path.join(self.tmpdir.name, "schedule.snapshot"), LocalFilesystem()
+        )
+        # journal and snapshot are only written when test ends, not while measuring
+        for writer in (
+            self.module._Alarmclock__journal_writer,
+            self.module._Alarmclock__snapshot_writer,
+        ):
+            writer.delay = writer.max_delay = 3600
+        self.module._refresh_non_working_days = Mock()
+        self.module._prefetch_day_status = Mock()
+        self.session.start_module(self.module)
+        # events are not what is measured here
+        for event in (
+            self.module.alarm_triggered_event,
+            self.module.alarm_scheduled_event,
+            self.module.alarm_unscheduled_event,
+            self.module.alarm_stopped_event,
+            self.module.alarm_created_event,
+            self.module.alarm_updated_event,
+            self.module.alarm_deleted_event,
+        ):
+            event.send = Mock()
+        self.module.timer_wheel = Mock()
+        self.module.add_alarms(make_alarms(size))
+
+    def __store(self, size, name, result):
+        RESULTS.setdefault(str(size), {})[name] = result
+
+    def bench_trigger_alarm(self):
+        self.init(self.size)
+        current_time = {"hour": 7, "minute": 0}
+        # alarms fire once per minute, forget previous run fires
+        fired_minutes = self.module._Alarmclock__fired_minutes
+
+        self.__store(
+            self.size,
+            "_trigger_alarm",
+            measure(
+                lambda: self.module._trigger_alarm(current_time, "mon"),
+                OPTIONS["runs"],
+                setup=fired_minutes.clear,
+            ),
+        )
+
+    def bench_schedule_alarm(self):
+        self.init(self.size)
+
+        self.__store(
+            self.size,
+            "_schedule_alarm",
+            measure(self.module._schedule_alarm, OPTIONS["runs"]),
+        )
+
+    def bench_add_alarm(self):
+        self.init(self.size)
+        params = make_alarms(1)[0]
+
+        self.__store(
+            self.size,
+            "add_alarm",
+            measure(
+                lambda: self.module.add_alarm(
+                    params["alarm_time"],
+                    params["timeout"],
+                    params["days"],
+                    params["non_working_days"],
+                    params["volume"],
+                    params["repeat"],
+                    params["shuffle"],
+                ),
+                OPTIONS["runs"],
+            ),
+        )
+
+    def bench_fill_profile(self):
+        params = {
+            "hour": 12,
+            "minute": 30,
+            "timeout": 10,
+            "volume": 50,
+            "count": 2,
+            "repeat": False,
+            "shuffle": True,
+            "snoozed": False,
+        }
+        for formatter_class in (
+            AlarmScheduledToAlarmFormatter,
+            AlarmUnscheduledToAlarmFormatter,
+            AlarmTriggeredToAlarmFormatter,
+            AlarmStoppedToAlarmFormatter,
+        ):
+            formatter = formatter_class({"events_broker": Mock()})
+            profile = Mock()
+
+            def fill_profiles():
+                for _ in range(self.size):
+                    formatter._fill_profile(params, profile)
+
+            self.__store(
+                self.size,
+                "%s._fill_profile" % formatter_class.__name__,
+                measure(fill_profiles, OPTIONS["runs"]),
+            )
+
+
+def compare(previous, current):
+    """
+    Print comparison of current results with previous ones
+
+    Args:
+        previous (dict): previous benchmark content
+        current (dict): current benchmark content
+    """
+    print(
+        "\n%-10s %-50s %12s %12s %8s" % ("size", "bench", "before", "after", "ratio")
+    )
+    for size, benchs in sorted(current["results"].items(), key=lambda i: int(i[0])):
+        for name, result in sorted(benchs.items()):
+            before = previous.get("results", {}).get(size, {}).get(name)
+            if not before:
+                continue
+            ratio = result["median"] / before["median"] if before["median"] else 0
+            print(
+                "%-10s %-50s %10.3fms %10.3fms %7.2fx"
+                % (size, name, before["median"], result["median"], ratio)
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alarmclock benchmark")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="comma separated number of alarms",
+    )
+    parser.add_argument("--runs", type=int, default=OPTIONS["runs"])
+    parser.add_argument("--output", default=OPTIONS["output"])
+    parser.add_argument("--compare", default=None, help="previous benchmark file")
+    args = parser.parse_args()
+    OPTIONS.update(
+        {
+            "sizes": [int(size) for size in args.sizes.split(",")],
+            "runs": args.runs,
+            "output": args.output,
+            "compare": args.compare,
+        }
+    )
+
+    loader = unittest.TestLoader()
+    loader.testMethodPrefix = "bench"
+    for size in OPTIONS["sizes"]:
+        print("Benchmark with %d alarms" % size)
+        BenchmarkAlarmclock.size = size
+        suite = loader.loadTestsFromTestCase(BenchmarkAlarmclock)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
+    content = {
+        "version": BENCHMARK_VERSION,
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "runs": OPTIONS["runs"],
+        "results": RESULTS,
+    }
+    with open(OPTIONS["output"], "w") as fd:
+        json.dump(content, fd, indent=2, sort_keys=True)
+    print("Results written to %s" % OPTIONS["output"])
+
+    if OPTIONS["compare"]:
+        with open(OPTIONS["compare"]) as fd:
+            compare(json.load(fd), content)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,9 @@ import unittest
 import logging
 import datetime
 import sys
+import time
+import os
+import tempfile
 
 sys.path.append("../")
 from backend.alarmclock import Alarmclock
@@ -12,10 +15,26 @@ from backend.alarmclockalarmtriggeredevent import AlarmclockAlarmTriggeredEvent
 from backend.alarmclockalarmscheduledevent import AlarmclockAlarmScheduledEvent
 from backend.alarmclockalarmunscheduledevent import AlarmclockAlarmUnscheduledEvent
 from backend.alarmclockalarmstoppedevent import AlarmclockAlarmStoppedEvent
+from backend.alarmclockalarmcreatedevent import AlarmclockAlarmCreatedEvent
+from backend.alarmclockalarmupdatedevent import AlarmclockAlarmUpdatedEvent
+from backend.alarmclockalarmdeletedevent import AlarmclockAlarmDeletedEvent
 from backend.alarmscheduledtoalarmformatter import AlarmScheduledToAlarmFormatter
 from backend.alarmunscheduledtoalarmformatter import AlarmUnscheduledToAlarmFormatter
 from backend.alarmtriggeredtoalarmformatter import AlarmTriggeredToAlarmFormatter
 from backend.alarmstoppedtoalarmformatter import AlarmStoppedToAlarmFormatter
+from backend.alarmtriggerindex import AlarmTriggerIndex
+from backend.alarmscheduler import AlarmScheduler
+from backend.timerwheel import TimerWheel
+from backend.nonworkingdayscache import NonWorkingDaysCache
+from backend.alarmpayloads import AlarmPayloads
+from backend.alarm import Alarm
+from backend.latencyhistogram import LatencyHistogram
+from backend.schedulewindow import ScheduleWindow
+from backend.mediareadahead import MediaReadAhead
+from backend.alarmjournal import AlarmJournal
+from backend.coalescingwriter import CoalescingWriter
+from backend.schedulesnapshot import ScheduleSnapshot
+from backend.clock import Clock
 from cleep.exception import (
     InvalidParameter,
     MissingParameter,
@@ -23,11 +42,36 @@ from cleep.exception import (
     Unauthorized,
 )
 from unittest.mock import Mock, patch, MagicMock
+from threading import Thread
 from cleep.libs.tests.common import get_log_level
 
 LOG_LEVEL = get_log_level()
 
 
+class LocalFilesystem:
+    """
+    Cleep filesystem methods used by alarmclock, working on local filesystem
+    """
+
+    def open(self, path, mode, encoding=None):
+        return open(path, mode, encoding=encoding)
+
+    def close(self, fd):
+        fd.close()
+
+    def mkdirs(self, path):
+        os.makedirs(path, exist_ok=True)
+        return True
+
+    def move(self, src, dst):
+        os.replace(src, dst)
+        return True
+
+    def rm(self, path):
+        os.remove(path)
+        return True
+
+
 class TestsAlarmclock(unittest.TestCase):
     def setUp(self):
         logging.basicConfig(
@@ -35,33 +79,59 @@ class TestsAlarmclock(unittest.TestCase):
             format=u"%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
         )
         self.session = session.TestSession(self)
+        self.tmpdir = tempfile.TemporaryDirectory()
 
     def tearDown(self):
         self.session.clean()
+        self.tmpdir.cleanup()
 
     def init(self, start=True, mock_fn=True, mock_on_start=True):
         self.module = self.session.setup(Alarmclock, mock_on_start=mock_on_start)
+        self.journal = AlarmJournal(
+            os.path.join(self.tmpdir.name, "alarms.journal"), LocalFilesystem()
+        )
+        self.module._Alarmclock__journal = self.journal
+        # journal is written when test flushes it
+        self.writer = self.module._Alarmclock__journal_writer
+        self.writer.delay = self.writer.max_delay = 3600
+        self.snapshot = ScheduleSnapshot(
+            os.path.join(self.tmpdir.name, "schedule.snapshot"), LocalFilesystem()
+        )
+        self.module._Alarmclock__snapshot = self.snapshot
+        self.snapshot_writer = self.module._Alarmclock__snapshot_writer
+        self.snapshot_writer.delay = self.snapshot_writer.max_delay = 3600
 
         if mock_fn:
+            self.module._refresh_non_working_days = Mock()
+            self.module._prefetch_day_status = Mock()
             self.module._set_today_is_non_working_day = Mock()
             self.module._set_tomorrow_is_non_working_day = Mock()
 
         if start:
             self.session.start_module(self.module)
 
-    def test__on_start(self):
+    @patch("backend.alarmclock.Task")
+    def test__on_start(self, task_mock):
         self.init(False, mock_fn=True, mock_on_start=False)
         self.module._schedule_alarm = Mock()
         self.module.is_module_loaded = Mock(return_value=True)
 
         self.session.start_module(self.module)
 
+        self.module._refresh_non_working_days.assert_not_called()
+        self.module._prefetch_day_status.assert_not_called()
+        self.assertEqual(self.module.non_working_days.horizon, 30)
+        task_mock.assert_any_call(
+            None, self.module._revalidate_non_working_days, self.module.logger
+        )
+        task_mock.return_value.start.assert_called()
         self.module._set_today_is_non_working_day.assert_called()
         self.module._set_tomorrow_is_non_working_day.assert_called()
         self.module._schedule_alarm.assert_called()
         self.assertTrue(self.module.has_audioplayer)
 
-    def test__on_start_no_audioplayer(self):
+    @patch("backend.alarmclock.Task")
+    def test__on_start_no_audioplayer(self, task_mock):
         self.init(False, mock_fn=True, mock_on_start=False)
         self.module._set_today_is_non_working_day = Mock()
         self.module._set_tomorrow_is_non_working_day = Mock()
@@ -72,6 +142,21 @@ class TestsAlarmclock(unittest.TestCase):
 
         self.assertFalse(self.module.has_audioplayer)
 
+    @patch("backend.alarmclock.Task")
+    def test__on_start_with_non_working_days_snapshot(self, task_mock):
+        self.init(False, mock_fn=True, mock_on_start=False)
+        self.module._load_non_working_days = Mock(return_value=True)
+        self.module._schedule_alarm = Mock()
+        self.module.is_module_loaded = Mock(return_value=True)
+
+        self.session.start_module(self.module)
+
+        self.module._refresh_non_working_days.assert_not_called()
+        self.module._schedule_alarm.assert_called()
+        task_mock.assert_any_call(
+            None, self.module._revalidate_non_working_days, self.module.logger
+        )
+
     def test_on_event_unhandled_event(self):
         self.init()
         event = {
@@ -102,6 +187,8 @@ class TestsAlarmclock(unittest.TestCase):
 
     def test_on_event_time_event_midnight(self):
         self.init()
+        self.module._swap_day_status = Mock()
+        self.module._schedule_alarm = Mock()
         event = {
             "event": "parameters.time.now",
             "params": {
@@ -114,8 +201,210 @@ class TestsAlarmclock(unittest.TestCase):
 
         self.module.on_event(event)
 
-        self.assertEqual(self.module._set_today_is_non_working_day.call_count, 1)
-        self.assertEqual(self.module._set_tomorrow_is_non_working_day.call_count, 1)
+        self.module._swap_day_status.assert_called()
+        self.module._schedule_alarm.assert_called_with()
+        self.assertEqual(self.module._set_today_is_non_working_day.call_count, 0)
+        self.assertEqual(self.module._set_tomorrow_is_non_working_day.call_count, 0)
+
+    def __make_time_event(self, when):
+        return {
+            "event": "parameters.time.now",
+            "params": {
+                "hour": when.hour,
+                "minute": when.minute,
+                "weekday_literal": "mon",
+                "weekday": when.weekday(),
+            },
+        }
+
+    def test_on_event_idle_without_alarm(self):
+        self.init()
+        self.module._trigger_alarm = Mock()
+
+        self.module.on_event(self.__make_time_event(datetime.datetime.now()))
+
+        self.module._trigger_alarm.assert_not_called()
+
+    @patch("backend.alarmclock.datetime")
+    def test_on_event_idle_until_next_alarm(self, datetime_mock):
+        now = datetime.datetime.now()
+        datetime_mock.now.return_value = now
+        self.init()
+        self.module._trigger_alarm = Mock()
+        later = now + datetime.timedelta(hours=3)
+        self.module.add_alarms([self.__make_alarm_params(later.hour, later.minute)])
+
+        self.module.on_event(self.__make_time_event(now))
+
+        self.module._trigger_alarm.assert_not_called()
+
+    @patch("backend.alarmclock.datetime")
+    def test_on_event_not_idle_when_alarm_is_due(self, datetime_mock):
+        now = datetime.datetime.now()
+        datetime_mock.now.return_value = now
+        self.init()
+        self.module._trigger_alarm = Mock()
+        soon = now + datetime.timedelta(minutes=1)
+        self.module.add_alarms([self.__make_alarm_params(soon.hour, soon.minute)])
+
+        self.module.on_event(self.__make_time_event(now))
+
+        self.module._trigger_alarm.assert_called()
+
+    @patch("backend.alarmclock.datetime")
+    def test_on_event_duplicate_tick(self, datetime_mock):
+        now = datetime.datetime.now()
+        datetime_mock.now.return_value = now
+        self.init()
+        self.module._trigger_alarm = Mock()
+        soon = now + datetime.timedelta(minutes=1)
+        self.module.add_alarms([self.__make_alarm_params(soon.hour, soon.minute)])
+
+        self.module.on_event(self.__make_time_event(now))
+        self.module.on_event(self.__make_time_event(now))
+
+        self.assertEqual(self.module._trigger_alarm.call_count, 1)
+
+    @patch("backend.alarmclock.datetime")
+    def test_on_event_missed_minutes(self, datetime_mock):
+        now = datetime.datetime.now()
+        before = now - datetime.timedelta(minutes=3)
+        missed = now - datetime.timedelta(minutes=2)
+        datetime_mock.now.return_value = before
+        self.init()
+        self.module.timer_wheel = Mock()
+        self.module.add_alarms([self.__make_alarm_params(missed.hour, missed.minute)])
+        self.module.on_event(self.__make_time_event(before))
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 0)
+
+        self.module.on_event(self.__make_time_event(now))
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 1)
+
+    @patch("backend.alarmclock.datetime")
+    def test_on_event_missed_minutes_out_of_grace(self, datetime_mock):
+        now = datetime.datetime.now()
+        before = now - datetime.timedelta(minutes=10)
+        missed = now - datetime.timedelta(minutes=8)
+        datetime_mock.now.return_value = before
+        self.init()
+        self.module.timer_wheel = Mock()
+        self.module._trigger_alarm = Mock(wraps=self.module._trigger_alarm)
+        self.module.add_alarms([self.__make_alarm_params(missed.hour, missed.minute)])
+        self.module.on_event(self.__make_time_event(before))
+        datetime_mock.now.return_value = now
+
+        self.module.on_event(self.__make_time_event(now))
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 0)
+        # grace window (5 minutes) and current minute
+        self.assertEqual(self.module._trigger_alarm.call_count, 6)
+        # skipped alarm is rescheduled, next due is not kept in the past
+        next_fire = (missed + datetime.timedelta(days=1)).replace(
+            second=0, microsecond=0
+        )
+        self.assertEqual(
+            self.module.get_next_alarms(1)[0]["timestamp"], int(next_fire.timestamp())
+        )
+
+    @patch("backend.alarmclock.time")
+    def test_on_event_missed_midnight_tick(self, time_mock):
+        time_mock.localtime.side_effect = time.localtime
+        time_mock.perf_counter.side_effect = time.perf_counter
+        self.init()
+        self.module._swap_day_status = Mock()
+        self.module._schedule_alarm = Mock()
+        before = datetime.datetime(2021, 12, 16, 23, 59, 1)
+        time_mock.time.return_value = before.timestamp()
+        self.module.on_event(self.__make_time_event(before))
+        self.module._swap_day_status.assert_not_called()
+
+        after = datetime.datetime(2021, 12, 17, 0, 1, 1)
+        time_mock.time.return_value = after.timestamp()
+        self.module.on_event(self.__make_time_event(after))
+
+        self.module._swap_day_status.assert_called_once()
+
+    def test_set_missed_alarms_grace(self):
+        self.init()
+
+        self.module.set_missed_alarms_grace(10)
+
+        self.assertEqual(self.module.missed_alarms_grace, 10)
+        self.assertEqual(self.module._get_config_field("missed_alarms_grace"), 10)
+
+    def test_set_missed_alarms_grace_invalid_parameters(self):
+        self.init()
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_missed_alarms_grace(61)
+        self.assertEqual(str(cm.exception), "Grace must be between 0 and 60 minutes")
+        with self.assertRaises(MissingParameter):
+            self.module.set_missed_alarms_grace(None)
+
+    @patch("backend.alarmclock.date")
+    def test__prefetch_day_status(self, date_mock):
+        date_mock.today.return_value = datetime.date(2021, 12, 15)
+        self.init(start=False, mock_fn=False)
+        is_non_working_day_mock = self.session.make_mock_command(
+            "is_non_working_day", True
+        )
+        self.session.add_mock_command(is_non_working_day_mock)
+        self.session.start_module(self.module)
+        self.module.non_working_days.set(datetime.date(2021, 12, 16), False)
+
+        self.module._prefetch_day_status()
+
+        self.session.assert_command_called_with(
+            "is_non_working_day", {"day": "2021-12-17"}, to="parameters"
+        )
+        self.assertTrue(self.module.non_working_days.get(datetime.date(2021, 12, 17)))
+        date_mock.today.return_value = datetime.date(2021, 12, 16)
+        self.module._swap_day_status()
+        self.assertFalse(self.module.today_is_non_working_day)
+        self.assertEqual(
+            self.module.tomorrow,
+            {"date": datetime.date(2021, 12, 17), "is_non_working_day": True},
+        )
+
+    @patch("backend.alarmclock.date")
+    def test__prefetch_day_status_failed(self, date_mock):
+        date_mock.today.return_value = datetime.date(2021, 12, 15)
+        self.init(start=False, mock_fn=False)
+        is_non_working_day_mock = self.session.make_mock_command(
+            "is_non_working_day", True, fail=True
+        )
+        self.session.add_mock_command(is_non_working_day_mock)
+        self.session.start_module(self.module)
+        self.module._Alarmclock__next_day_status = None
+
+        try:
+            self.module._prefetch_day_status()
+        except Exception:
+            self.fail("_prefetch_day_status should not raise exception")
+        self.assertIsNone(self.module._Alarmclock__next_day_status)
+        self.assertIsNone(self.module.non_working_days.get(datetime.date(2021, 12, 16)))
+
+    @patch("backend.alarmclock.Task")
+    @patch("backend.alarmclock.date")
+    def test__swap_day_status_not_prefetched(self, date_mock, task_mock):
+        date_mock.today.return_value = datetime.date(2021, 12, 16)
+        self.init(start=False, mock_fn=False)
+        self.session.start_module(self.module)
+        self.module.send_command = Mock()
+        self.module.non_working_days.set(datetime.date(2021, 12, 16), True)
+
+        self.module._swap_day_status()
+
+        self.assertTrue(self.module.today_is_non_working_day)
+        self.assertEqual(
+            self.module.tomorrow,
+            {"date": datetime.date(2021, 12, 17), "is_non_working_day": False},
+        )
+        self.module.send_command.assert_not_called()
+        task_mock.assert_called_with(
+            None, self.module._revalidate_non_working_days, self.module.logger
+        )
 
     def test_add_alarm(self):
         self.init()
@@ -269,612 +558,636 @@ class TestsAlarmclock(unittest.TestCase):
             self.module.add_alarm(time_, 10, days, False, 101, False, False)
         self.assertEqual(str(cm.exception), "Volume must be between 1 and 100")
 
-    def test_remove_alarm(self):
-        self.init()
-        self.module._get_device = Mock(return_value={})
-        self.module._delete_device = Mock(return_value=True)
-        alarm = {
-            "time": {"hour": 1, "minute": 1},
+    def __make_alarm_params(self, hour=1, minute=1):
+        return {
+            "alarm_time": {"hour": hour, "minute": minute},
             "timeout": 10,
-            "enabled": True,
+            "days": {
+                "mon": True,
+                "tue": True,
+                "wed": True,
+                "thu": True,
+                "fri": True,
+                "sat": True,
+                "sun": True,
+            },
+            "non_working_days": True,
             "volume": 50,
             "repeat": False,
             "shuffle": False,
         }
-        self.module._get_device = Mock(return_value=alarm)
-        self.module._Alarmclock__scheduled_alarm_uuids = set(("123456789",))
 
-        self.module.remove_alarm("123456789")
+    def test_add_alarms(self):
+        self.init()
+        self.journal.append = Mock(wraps=self.journal.append)
+        self.module.tomorrow = {
+            "date": datetime.date.today() + datetime.timedelta(days=1),
+            "is_non_working_day": False,
+        }
 
-        self.module._delete_device.assert_called_with("123456789")
-        self.assertEqual(len(self.module._Alarmclock__scheduled_alarm_uuids), 0)
-        self.session.assert_event_called_with(
-            "alarmclock.alarm.unscheduled",
-            {
-                "hour": 1,
-                "minute": 1,
-                "timeout": 10,
-                "volume": 50,
-                "count": 0,
-                "repeat": False,
-                "shuffle": False,
-            },
+        alarm_uuids = self.module.add_alarms(
+            [self.__make_alarm_params(1, 1), self.__make_alarm_params(2, 2)]
         )
 
-    def test_remove_alarm_failed(self):
+        self.writer.flush()
+        self.assertEqual(len(alarm_uuids), 2)
+        self.assertEqual(self.journal.append.call_count, 1)
+        self.assertEqual(
+            self.module._get_device(alarm_uuids[1])["time"], {"hour": 2, "minute": 2}
+        )
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 2)
+
+    def test_bulk_commands_reschedule_once(self):
         self.init()
-        self.module._get_device = Mock(return_value={})
-        self.module._delete_device = Mock(return_value=False)
+        self.module._Alarmclock__schedule_changed = Mock()
 
-        with self.assertRaises(CommandError) as cm:
-            self.module.remove_alarm("123456789")
-        self.assertEqual(str(cm.exception), "Error removing alarm")
+        alarm_uuids = self.module.add_alarms(
+            [self.__make_alarm_params(hour, 0) for hour in range(20)]
+        )
+        self.module.set_alarms_enabled(alarm_uuids, False)
+        self.module.remove_alarms(alarm_uuids)
 
-    def test_remove_alarm_check_parameters(self):
+        self.assertEqual(self.module._Alarmclock__schedule_changed.call_count, 3)
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.created"), 20)
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.updated"), 20)
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.deleted"), 20)
+
+    def test_add_alarms_invalid_parameters(self):
         self.init()
-        self.module._get_device = Mock(return_value=None)
+        self.journal.append = Mock()
+        invalid_alarm = self.__make_alarm_params()
+        invalid_alarm["volume"] = 0
+        missing_alarm = self.__make_alarm_params()
+        del missing_alarm["days"]
 
         with self.assertRaises(InvalidParameter) as cm:
-            self.module.remove_alarm("123456789")
-        self.assertEqual(str(cm.exception), "Alarm does not exist")
+            self.module.add_alarms([self.__make_alarm_params(), invalid_alarm])
+        self.assertEqual(str(cm.exception), "Volume must be between 1 and 100")
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.add_alarms([missing_alarm])
+        self.assertEqual(str(cm.exception), 'Parameter "days" is missing')
+        with self.assertRaises(InvalidParameter):
+            self.module.add_alarms([])
+        self.writer.flush()
+        self.journal.append.assert_not_called()
 
-    def test_toggle_alarm_disable(self):
+    def test_add_alarms_journal_failed(self):
         self.init()
-        self.module._Alarmclock__scheduled_alarm_uuids = set(("123456789",))
-        alarm = {
-            "time": {"hour": 1, "minute": 1},
-            "timeout": 10,
-            "enabled": True,
-            "volume": 50,
-            "repeat": False,
-            "shuffle": False,
-        }
-        self.module._get_device = Mock(return_value=alarm)
-        self.module._update_device = Mock(return_value=True)
+        self.journal.append = Mock(side_effect=OSError())
 
-        enabled = self.module.toggle_alarm("123456789")
+        alarm_uuids = self.module.add_alarms([self.__make_alarm_params()])
 
-        self.assertFalse(enabled)
-        self.module._update_device.assert_called_with("123456789", {"enabled": False})
-        self.session.assert_event_called_with(
-            "alarmclock.alarm.unscheduled",
-            {
-                "hour": 1,
-                "minute": 1,
-                "timeout": 10,
-                "volume": 50,
-                "count": 0,
-                "repeat": False,
-                "shuffle": False,
-            },
-        )
-        self.assertFalse(self.session.event_called("alarmclock.alarm.scheduled"))
+        self.assertIsNotNone(self.module._get_device(alarm_uuids[0]))
+        self.assertFalse(self.writer.flush())
+        # records are kept for next write
+        self.assertEqual(len(self.writer), 1)
 
-    def test_toggle_alarm_enable(self):
+    def test_remove_alarms(self):
         self.init()
-        alarm = {
-            "time": {"hour": 1, "minute": 1},
-            "timeout": 10,
-            "enabled": False,
-            "volume": 50,
-            "repeat": False,
-            "shuffle": False,
+        self.module.tomorrow = {
+            "date": datetime.date.today() + datetime.timedelta(days=1),
+            "is_non_working_day": False,
         }
-        self.module._get_device = Mock(return_value=alarm)
-        self.module._update_device = Mock(return_value=True)
+        alarm_uuids = self.module.add_alarms(
+            [self.__make_alarm_params(1, 1), self.__make_alarm_params(2, 2)]
+        )
+        self.journal.append = Mock(wraps=self.journal.append)
 
-        enabled = self.module.toggle_alarm("123456789")
+        self.module.remove_alarms(alarm_uuids)
 
-        self.assertTrue(enabled)
-        self.module._update_device.assert_called_with("123456789", {"enabled": True})
-        self.session.assert_event_called_with(
-            "alarmclock.alarm.scheduled",
-            {
-                "hour": 1,
-                "minute": 1,
-                "timeout": 10,
-                "volume": 50,
-                "count": 1,
-                "repeat": False,
-                "shuffle": False,
-            },
+        self.writer.flush()
+        self.assertEqual(self.journal.append.call_count, 1)
+        self.assertIsNone(self.module._get_device(alarm_uuids[0]))
+        self.assertIsNone(self.module._get_device(alarm_uuids[1]))
+        self.assertEqual(
+            self.session.event_call_count("alarmclock.alarm.unscheduled"), 2
         )
-        self.assertFalse(self.session.event_called("alarmclock.alarm.unscheduled"))
+        self.assertEqual(self.module.get_next_alarms(5), [])
 
-    def test_toggle_alarm_failed(self):
+    def test_remove_alarms_check_parameters(self):
         self.init()
-        alarm = {
-            "time": {"hour": 1, "minute": 1},
-            "timeout": 10,
-            "enabled": True,
-            "volume": 10,
+        alarm_uuids = self.module.add_alarms([self.__make_alarm_params()])
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.remove_alarms([alarm_uuids[0], "123456789"])
+        self.assertEqual(str(cm.exception), "Alarm does not exist")
+        self.assertIsNotNone(self.module._get_device(alarm_uuids[0]))
+
+    def test_set_alarms_enabled(self):
+        self.init()
+        self.module.tomorrow = {
+            "date": datetime.date.today() + datetime.timedelta(days=1),
+            "is_non_working_day": False,
         }
-        self.module._get_device = Mock(return_value=alarm)
-        self.module._update_device = Mock(return_value=False)
+        alarm_uuids = self.module.add_alarms(
+            [self.__make_alarm_params(1, 1), self.__make_alarm_params(2, 2)]
+        )
+        self.journal.append = Mock(wraps=self.journal.append)
 
-        with self.assertRaises(CommandError) as cm:
-            self.module.toggle_alarm("123456789")
-        self.assertEqual(str(cm.exception), "Error updating alarm")
+        self.module.set_alarms_enabled(alarm_uuids, False)
 
-    def test_toggle_alarm_check_parameters(self):
+        self.writer.flush()
+        self.assertEqual(self.journal.append.call_count, 1)
+        self.assertFalse(self.module._get_device(alarm_uuids[0])["enabled"])
+        self.assertFalse(self.module._get_device(alarm_uuids[1])["enabled"])
+        self.assertEqual(
+            self.session.event_call_count("alarmclock.alarm.unscheduled"), 2
+        )
+
+        self.module.set_alarms_enabled(alarm_uuids, True)
+
+        self.writer.flush()
+        self.assertEqual(self.journal.append.call_count, 2)
+        self.assertTrue(self.module._get_device(alarm_uuids[0])["enabled"])
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 4)
+
+    def test_set_alarms_enabled_check_parameters(self):
         self.init()
-        self.module._get_device = Mock(return_value=None)
+        alarm_uuids = self.module.add_alarms([self.__make_alarm_params()])
 
         with self.assertRaises(InvalidParameter) as cm:
-            self.module.toggle_alarm("123456789")
+            self.module.set_alarms_enabled(["123456789"], True)
         self.assertEqual(str(cm.exception), "Alarm does not exist")
+        with self.assertRaises(MissingParameter):
+            self.module.set_alarms_enabled(alarm_uuids, None)
 
-    def test__set_today_is_non_working_day(self):
-        self.init(start=False, mock_fn=False)
-        is_today_non_working_day_mock = self.session.make_mock_command(
-            "is_today_non_working_day", True
-        )
-        self.session.add_mock_command(is_today_non_working_day_mock)
-        self.module._set_tomorrow_is_non_working_day = Mock()
-        self.session.start_module(self.module)
+    def test_toggle_alarm_appends_journal(self):
+        self.init()
+        alarm_uuid = self.module.add_alarms([self.__make_alarm_params()])[0]
+        self.module._update_config = Mock()
 
-        self.module._set_today_is_non_working_day()
+        self.module.toggle_alarm(alarm_uuid)
 
-        self.assertTrue(self.module.today_is_non_working_day)
-        self.session.assert_command_called_with(
-            "is_today_non_working_day", None, to="parameters"
+        self.writer.flush()
+        self.module._update_config.assert_not_called()
+        self.assertEqual(
+            self.journal.replay()[-1],
+            {"op": "update", "uuid": alarm_uuid, "data": {"enabled": False}},
         )
 
-    def test__set_today_is_non_working_day_failed(self):
-        self.init(start=False, mock_fn=False)
-        is_today_non_working_day_mock = self.session.make_mock_command(
-            "is_today_non_working_day", True, fail=True
-        )
-        self.session.add_mock_command(is_today_non_working_day_mock)
-        self.module._set_tomorrow_is_non_working_day = Mock()
-        self.session.start_module(self.module)
-        self.module._set_tomorrow_is_non_working_day = Mock()
+    def test_journal_writes_coalesced(self):
+        self.init()
+        self.journal.append = Mock(wraps=self.journal.append)
+        alarm_uuid = self.module.add_alarm(**self.__make_alarm_params())
 
-        try:
-            self.module._set_today_is_non_working_day()
-        except:
-            self.fail("_set_today_is_non_working_day should not raise exception")
+        self.module.toggle_alarm(alarm_uuid)
+        self.module.toggle_alarm(alarm_uuid)
+        self.journal.append.assert_not_called()
+        self.writer.flush()
 
-    @patch("backend.alarmclock.date")
-    def test__set_tomorrow_is_non_working_day(self, date_mock):
-        today = datetime.date(2021, 12, 15)
-        date_mock.today.return_value = today
-        self.init(start=False, mock_fn=False)
-        is_module_loaded = self.session.make_mock_command("is_module_loaded", True)
-        self.session.add_mock_command(is_module_loaded)
-        is_non_working_day_mock = self.session.make_mock_command(
-            "is_non_working_day", True
-        )
-        self.session.add_mock_command(is_non_working_day_mock)
-        self.module._set_today_is_non_working_day = Mock()
-        self.session.start_module(self.module)
+        self.journal.append.assert_called_once()
+        self.assertEqual(len(self.journal.append.call_args[0][0]), 3)
+        self.assertTrue(self.module._get_device(alarm_uuid)["enabled"])
 
-        self.module._set_tomorrow_is_non_working_day()
+    def test_journal_flushed_on_stop(self):
+        self.init()
+        alarm_uuid = self.module.add_alarm(**self.__make_alarm_params())
 
-        self.assertTrue(self.module.tomorrow["is_non_working_day"])
-        self.assertEqual(self.module.tomorrow["date"], datetime.date(2021, 12, 16))
-        self.session.assert_command_called_with(
-            "is_non_working_day", {"day": "2021-12-16"}, to="parameters"
-        )
+        self.module._on_stop()
 
-    @patch("backend.alarmclock.date")
-    def test__set_tomorrow_is_non_working_day_failed(self, date_mock):
-        today = datetime.date(2021, 12, 15)
-        date_mock.today.return_value = today
-        self.init(start=False, mock_fn=False)
-        is_module_loaded = self.session.make_mock_command("is_module_loaded", True)
-        self.session.add_mock_command(is_module_loaded)
-        is_non_working_day_mock = self.session.make_mock_command(
-            "is_non_working_day", True, fail=True
+        self.assertEqual(len(self.writer), 0)
+        self.assertEqual(self.journal.replay()[0]["uuid"], alarm_uuid)
+
+    def test_journal_replayed(self):
+        self.init(start=False)
+        device = {"type": "alarmclock", "name": "Alarm", "uuid": "123", "enabled": True}
+        self.journal.append(
+            [
+                {"op": "add", "uuid": "123", "data": device},
+                {"op": "update", "uuid": "123", "data": {"enabled": False}},
+            ]
         )
-        self.session.add_mock_command(is_non_working_day_mock)
-        self.module._set_today_is_non_working_day = Mock()
-        self.session.start_module(self.module)
 
-        try:
-            self.module._set_tomorrow_is_non_working_day()
-        except:
-            self.fail("_set_tomorrow_is_non_working_day should not raise exception")
+        devices = self.module.get_module_devices()
 
-    @patch("backend.alarmclock.Timer")
-    def test__trigger_alarm(self, timer_mock):
+        self.assertEqual(list(devices.keys()), ["123"])
+        self.assertFalse(devices["123"]["enabled"])
+
+    def test__compact_journal(self):
         self.init()
-        alarm = self.module._add_device(
-            {
-                "type": "alarmclock",
-                "name": "Alarm",
-                "enabled": True,
-                "nonWorkingDays": True,
-                "time": {
-                    "hour": 12,
-                    "minute": 0,
-                },
-                "timeout": 10,
-                "days": {
-                    "mon": True,
-                    "tue": True,
-                    "wed": True,
-                    "thu": True,
-                    "fri": True,
-                    "sat": True,
-                    "sun": True,
-                },
-                "volume": 50,
-                "repeat": False,
-                "shuffle": False,
-            }
-        )
-        self.module.tomorrow = {
-            "date": datetime.date(2021, 12, 16),
-            "nonWorkingDay": False,
-        }
+        alarm_uuid = self.module.add_alarms([self.__make_alarm_params()])[0]
+        self.module.remove_alarm(alarm_uuid)
+        alarm_uuid = self.module.add_alarms([self.__make_alarm_params()])[0]
+        self.writer.flush()
 
-        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
+        self.module._compact_journal()
 
-        self.session.assert_event_called_with(
-            "alarmclock.alarm.triggered",
-            {
-                "hour": 12,
-                "minute": 0,
-                "timeout": 10,
-                "volume": 50,
-                "repeat": False,
-                "shuffle": False,
-            },
+        self.assertEqual(self.journal.size(), 0)
+        self.assertEqual(
+            list(self.module._get_config()["devices"].keys()), [alarm_uuid]
         )
-        timer_mock.assert_called_with(600, self.module._stop_alarm, [alarm["uuid"]])
+        self.assertIsNotNone(self.module._get_device(alarm_uuid))
 
-    def test__trigger_alarm_with_alarm_disabled(self):
+    def test__compact_journal_failed(self):
         self.init()
-        self.module._add_device(
-            {
-                "type": "alarmclock",
-                "name": "Alarm",
-                "enabled": False,
-                "nonWorkingDays": True,
-                "time": {
-                    "hour": 12,
-                    "minute": 0,
-                },
-                "timeout": 10,
-                "days": {
-                    "mon": True,
-                    "tue": True,
-                    "wed": True,
-                    "thu": True,
-                    "fri": True,
-                    "sat": True,
-                    "sun": True,
-                },
-                "repeat": False,
-                "shuffle": False,
-            }
-        )
-        self.module.tomorrow = {
-            "date": datetime.date(2021, 12, 16),
-            "nonWorkingDay": False,
-        }
+        self.module.add_alarms([self.__make_alarm_params()])
+        self.writer.flush()
+        self.module._update_config = Mock(return_value=False)
 
-        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
+        self.module._compact_journal()
 
-        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 0)
+        # records are kept until compaction succeeds
+        self.assertEqual(len(self.journal.replay()), 1)
 
-    def test__trigger_alarm_with_not_good_time(self):
+    @patch("backend.alarmclock.Task")
+    def test_journal_compaction_triggered(self, task_mock):
         self.init()
-        self.module._add_device(
-            {
-                "type": "alarmclock",
-                "name": "Alarm",
-                "enabled": True,
-                "nonWorkingDays": True,
-                "time": {
-                    "hour": 12,
-                    "minute": 12,
-                },
-                "timeout": 10,
-                "days": {
-                    "mon": True,
-                    "tue": True,
-                    "wed": True,
-                    "thu": True,
-                    "fri": True,
-                    "sat": True,
-                    "sun": True,
-                },
-                "repeat": False,
-                "shuffle": False,
-            }
-        )
-        self.module.tomorrow = {
-            "date": datetime.date(2021, 12, 16),
-            "nonWorkingDay": False,
-        }
+        self.module.JOURNAL_COMPACT_SIZE = 0
 
-        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
+        self.module.add_alarms([self.__make_alarm_params()])
+        self.writer.flush()
+        self.module.add_alarms([self.__make_alarm_params()])
+        self.writer.flush()
 
-        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 0)
+        task_mock.assert_called_once_with(
+            None, self.module._compact_journal, self.module.logger
+        )
 
-    def test__trigger_alarm_on_working_day(self):
+    def test__restore_schedule_no_snapshot(self):
         self.init()
-        self.module._add_device(
-            {
-                "type": "alarmclock",
-                "name": "Alarm",
-                "enabled": True,
-                "nonWorkingDays": False,
-                "time": {
-                    "hour": 12,
-                    "minute": 0,
-                },
-                "timeout": 10,
-                "days": {
-                    "mon": True,
-                    "tue": True,
-                    "wed": True,
-                    "thu": True,
-                    "fri": True,
-                    "sat": True,
-                    "sun": True,
-                },
-                "repeat": False,
-                "shuffle": False,
-            }
-        )
-        self.module.tomorrow = {
-            "date": datetime.date(2021, 12, 16),
-            "nonWorkingDay": False,
-        }
-        self.module.today_is_non_working_day = True
+        self.module._schedule_alarm = Mock()
 
-        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
+        self.assertFalse(self.module._restore_schedule())
 
-        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 0)
+        self.module._schedule_alarm.assert_called_with()
 
-    def test__trigger_alarm_on_disabled_day(self):
+    @patch("backend.alarmclock.datetime")
+    def test__restore_schedule(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
         self.init()
-        self.module._add_device(
-            {
-                "type": "alarmclock",
-                "name": "Alarm",
-                "enabled": True,
-                "nonWorkingDays": True,
-                "time": {
-                    "hour": 12,
-                    "minute": 0,
-                },
-                "timeout": 10,
-                "days": {
-                    "mon": True,
-                    "tue": False,
-                    "wed": True,
-                    "thu": True,
-                    "fri": True,
-                    "sat": True,
-                    "sun": True,
-                },
-                "repeat": False,
-                "shuffle": False,
-            }
+        self.module.add_alarms(
+            [self.__make_alarm_params(12, 10), self.__make_alarm_params(13, 0)]
         )
-        self.module.tomorrow = {
-            "date": datetime.date(2021, 12, 16),
-            "nonWorkingDay": False,
-        }
-        self.module.today_is_non_working_day = True
+        next_alarms = self.module.get_next_alarms(2)
+        self.module._write_schedule_snapshot([])
+        self.module._Alarmclock__scheduler = AlarmScheduler()
+        self.module._Alarmclock__schedule_window.clear()
+        self.module._schedule_alarm = Mock()
 
-        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
+        self.assertTrue(self.module._restore_schedule())
 
-        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 0)
+        self.module._schedule_alarm.assert_not_called()
+        self.assertEqual(self.module.get_next_alarms(2), next_alarms)
+        self.assertEqual(len(self.module._Alarmclock__schedule_window), 2)
+        # no event sent for restored alarms
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 2)
 
-    def test__stop_alarm(self):
+    @patch("backend.alarmclock.datetime")
+    def test__restore_schedule_alarm_changed(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
         self.init()
-        device = {
-            "name": "Alarm",
-            "type": "alarmclock",
-            "time": {
-                "hour": 12,
-                "minute": 0,
-            },
-            "enabled": True,
-            "timeout": 10,
-            "volume": 50,
-        }
-        self.module._get_device = Mock(return_value=device)
-        timer_mock = Mock()
-        self.module.stop_timers["1234567789"] = timer_mock
+        alarm_uuid = self.module.add_alarms([self.__make_alarm_params(12, 10)])[0]
+        self.module._write_schedule_snapshot([])
+        self.module._Alarmclock__alarms[alarm_uuid].hour = 13
+        self.module._schedule_alarm = Mock()
 
-        self.module._stop_alarm("1234567789")
+        self.assertFalse(self.module._restore_schedule())
 
-        self.session.assert_event_called_with(
-            "alarmclock.alarm.stopped",
-            {
-                "hour": 12,
-                "minute": 0,
-                "timeout": 10,
-                "snoozed": False,
-                "volume": 50,
-            },
-        )
-        timer_mock.cancel.assert_called()
-        self.assertEqual(len(self.module.stop_timers.keys()), 0)
+        self.module._schedule_alarm.assert_called_with()
 
-    def test__stop_alarm_alarm_not_found(self):
+    @patch("backend.alarmclock.datetime")
+    def test__restore_schedule_fire_over(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
         self.init()
-        self.module._get_device = Mock(return_value=None)
+        self.module.add_alarms(
+            [self.__make_alarm_params(12, 10), self.__make_alarm_params(13, 0)]
+        )
+        self.module._write_schedule_snapshot([])
+        self.module._Alarmclock__scheduler = AlarmScheduler()
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 30)
 
-        self.module._stop_alarm("1234567789")
+        self.assertTrue(self.module._restore_schedule())
 
-        self.assertEqual(self.session.event_call_count("alarmclock.alarm.stopped"), 0)
+        self.assertEqual(
+            [alarm["timestamp"] for alarm in self.module.get_next_alarms(2)],
+            [
+                int(datetime.datetime(2021, 12, 16, 13, 0).timestamp()),
+                int(datetime.datetime(2021, 12, 17, 12, 10).timestamp()),
+            ],
+        )
 
-    @patch("backend.alarmclock.datetime")
-    def test__schedule_alarm_for_today(self, datetime_mock):
-        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+    @patch("backend.clock.time")
+    def test__restore_schedule_stop_deadlines(self, time_mock):
+        time_mock.time.return_value = 1639652400.0
+        time_mock.monotonic.return_value = 1000.0
         self.init()
-        self.module._add_device(
+        self.module.timer_wheel = Mock()
+        self.module._schedule_alarm = Mock()
+        ringing_uuid, overdue_uuid = self.module.add_alarms(
+            [self.__make_alarm_params(12, 0), self.__make_alarm_params(11, 50)]
+        )
+        self.snapshot.save(
+            0,
+            {},
+            set(),
             {
-                "type": "alarmclock",
-                "name": "Alarm",
-                "enabled": True,
-                "nonWorkingDays": False,
-                "time": {
-                    "hour": 12,
-                    "minute": 10,
-                },
-                "timeout": 10,
-                "days": {
-                    "mon": True,
-                    "tue": True,
-                    "wed": True,
-                    "thu": True,
-                    "fri": True,
-                    "sat": True,
-                    "sun": True,
-                },
-                "volume": 50,
-                "repeat": False,
-                "shuffle": False,
-            }
+                ringing_uuid: 1639652400.0 + 300,
+                overdue_uuid: 1639652400.0 - 10,
+                "0a1b2c3d-0000-4000-8000-000000000001": 1639652400.0 + 300,
+            },
         )
-        self.module.today_is_non_working_day = False
-        self.module.tomorrow = {
-            "date": datetime.date(2021, 12, 17),
-            "is_non_working_day": False,
-        }
 
-        self.module._schedule_alarm()
+        self.module._restore_schedule()
 
-        self.session.assert_event_called_with(
-            "alarmclock.alarm.scheduled",
-            {
-                "hour": 12,
-                "minute": 10,
-                "timeout": 10,
-                "volume": 50,
-                "count": 1,
-                "repeat": False,
-                "shuffle": False,
-            },
+        self.module.timer_wheel.schedule.assert_called_once_with(
+            300.0, self.module._stop_alarm, [ringing_uuid]
         )
-        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 1)
+        self.assertEqual(list(self.module.stop_timers.keys()), [ringing_uuid])
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.stopped"), 1)
+        self.assertEqual(
+            list(self.module._Alarmclock__stop_deadlines.keys()), [ringing_uuid]
+        )
+        # ringing alarm is not fired again by missed minutes catch up
+        self.assertEqual(
+            self.module._Alarmclock__fired_minutes[ringing_uuid], 1639652400 - 300
+        )
+
+    def test_on_event_clock_jump(self):
+        self.init()
+        self.module._on_clock_jump = Mock()
+        self.module._Alarmclock__clock = Mock()
+        self.module._Alarmclock__clock.check_jump.return_value = 0.0
+        event = self.__make_time_event(datetime.datetime.now())
+
+        self.module.on_event(event)
+        self.module._on_clock_jump.assert_not_called()
+
+        self.module._Alarmclock__clock.check_jump.return_value = 3600.0
+        self.module.on_event(event)
+        self.module._on_clock_jump.assert_called_once_with(3600.0)
 
     @patch("backend.alarmclock.datetime")
-    def test__schedule_alarm_for_today_but_disabled(self, datetime_mock):
+    def test__on_clock_jump_forward(self, datetime_mock):
+        now = datetime.datetime.now().replace(second=30, microsecond=0)
+        before = now - datetime.timedelta(minutes=20)
+        skipped = now - datetime.timedelta(minutes=10)
+        missed = now - datetime.timedelta(minutes=1)
+        datetime_mock.now.return_value = before
+        self.init()
+        self.module.timer_wheel = Mock()
+        self.module.add_alarms(
+            [
+                self.__make_alarm_params(skipped.hour, skipped.minute),
+                self.__make_alarm_params(missed.hour, missed.minute),
+            ]
+        )
+        self.module.on_event(self.__make_time_event(before))
+        datetime_mock.now.return_value = now
+
+        self.module._on_clock_jump(1200.0)
+
+        # missed minutes catch up is kept
+        self.assertIsNotNone(self.module._Alarmclock__last_tick_minute)
+        self.module.on_event(self.__make_time_event(now))
+        # alarm within grace window fires, older one is skipped
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 1)
+        self.assertEqual(
+            [alarm["timestamp"] for alarm in self.module.get_next_alarms(2)],
+            [
+                int((skipped + datetime.timedelta(days=1, seconds=-30)).timestamp()),
+                int((missed + datetime.timedelta(days=1, seconds=-30)).timestamp()),
+            ],
+        )
+
+    @patch("backend.alarmclock.datetime")
+    def test__on_clock_jump_backward(self, datetime_mock):
         datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
         self.init()
-        self.module._add_device(
-            {
-                "type": "alarmclock",
-                "name": "Alarm",
-                "enabled": False,
-                "nonWorkingDays": False,
-                "time": {
-                    "hour": 12,
-                    "minute": 10,
-                },
-                "timeout": 10,
-                "days": {
-                    "mon": True,
-                    "tue": True,
-                    "wed": True,
-                    "thu": True,
-                    "fri": True,
-                    "sat": True,
-                    "sun": True,
-                },
-                "repeat": False,
-                "shuffle": False,
-            }
+        self.module.add_alarms(
+            [self.__make_alarm_params(8, 0), self.__make_alarm_params(13, 0)]
         )
-        self.module.today_is_non_working_day = False
-        self.module.tomorrow = {
-            "date": datetime.date(2021, 12, 17),
-            "is_non_working_day": False,
-        }
+        self.module._schedule_alarm = Mock()
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 7, 0)
 
-        self.module._schedule_alarm()
+        self.module._on_clock_jump(-18000.0)
 
-        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 0)
+        self.module._schedule_alarm.assert_not_called()
+        self.assertIsNone(self.module._Alarmclock__last_tick_minute)
+        self.assertEqual(
+            [alarm["timestamp"] for alarm in self.module.get_next_alarms(2)],
+            [
+                int(datetime.datetime(2021, 12, 16, 8, 0).timestamp()),
+                int(datetime.datetime(2021, 12, 16, 13, 0).timestamp()),
+            ],
+        )
 
     @patch("backend.alarmclock.datetime")
-    def test__schedule_alarm_for_today_but_non_working_day(self, datetime_mock):
+    def test__on_clock_jump_day_changed(self, datetime_mock):
         datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
         self.init()
-        self.module._add_device(
-            {
-                "type": "alarmclock",
-                "name": "Alarm",
-                "enabled": True,
-                "nonWorkingDays": False,
-                "time": {
-                    "hour": 12,
-                    "minute": 10,
-                },
-                "timeout": 10,
-                "days": {
-                    "mon": True,
-                    "tue": True,
-                    "wed": True,
-                    "thu": True,
-                    "fri": True,
-                    "sat": True,
-                    "sun": True,
-                },
-                "repeat": False,
-                "shuffle": False,
-            }
+        self.module.add_alarms([self.__make_alarm_params(8, 0)])
+        self.module._schedule_alarm = Mock()
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 17, 12, 0)
+
+        self.module._on_clock_jump(86400.0)
+
+        self.module._set_today_is_non_working_day.assert_called()
+        self.module._schedule_alarm.assert_called_with()
+
+    @patch("backend.alarmclock.datetime")
+    def test__on_clock_jump_rearm_timers(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module.timer_wheel = Mock()
+        self.module.deadline_mode = True
+        self.module.add_alarms([self.__make_alarm_params(13, 0)])
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 30)
+
+        self.module._on_clock_jump(1800.0)
+
+        self.module.timer_wheel.schedule.return_value.cancel.assert_called()
+        self.module.timer_wheel.schedule.assert_called_with(
+            1800.0, self.module._on_deadline, [datetime.datetime(2021, 12, 16, 13, 0)]
         )
-        self.module.today_is_non_working_day = True
-        self.module.tomorrow = {
-            "date": datetime.date(2021, 12, 17),
-            "is_non_working_day": True,
-        }
 
-        self.module._schedule_alarm()
+    def test__write_schedule_snapshot(self):
+        self.init()
+        self.module.timer_wheel = Mock()
+        alarm_uuid = self.module.add_alarms([self.__make_alarm_params(12, 0)])[0]
 
-        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 0)
+        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
+        self.module._write_schedule_snapshot([])
+
+        snapshot = self.snapshot.load()
+        self.assertIn(alarm_uuid, snapshot["fires"])
+        self.assertIn(alarm_uuid, snapshot["stops"])
+
+    def test__write_schedule_snapshot_failed(self):
+        self.init()
+        self.snapshot.save = Mock(side_effect=OSError())
+
+        try:
+            self.module._write_schedule_snapshot([])
+        except Exception:
+            self.fail("_write_schedule_snapshot should not raise exception")
+
+    def test_schedule_snapshot_written_on_stop(self):
+        self.init()
+        self.module.add_alarms([self.__make_alarm_params(12, 0)])
+
+        self.module._on_stop()
+
+        self.assertIsNotNone(self.snapshot.load())
 
     @patch("backend.alarmclock.datetime")
-    def test__schedule_alarm_for_tomorrow(self, datetime_mock):
+    def test_update_alarm(self, datetime_mock):
         datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
         self.init()
-        self.module._add_device(
+        alarm_uuid = self.module.add_alarms([self.__make_alarm_params(14, 0)])[0]
+        self.journal.append = Mock(wraps=self.journal.append)
+        params = self.__make_alarm_params(15, 30)
+
+        self.module.update_alarm(
+            alarm_uuid,
+            params["alarm_time"],
+            20,
+            params["days"],
+            False,
+            80,
+            True,
+            True,
+        )
+
+        device = self.module._get_device(alarm_uuid)
+        self.assertEqual(device["time"], {"hour": 15, "minute": 30})
+        self.assertEqual(device["timeout"], 20)
+        self.assertEqual(device["volume"], 80)
+        self.assertTrue(device["enabled"])
+        self.writer.flush()
+        self.assertEqual(self.journal.append.call_count, 1)
+        self.assertEqual(
+            self.module.get_next_alarms(1)[0]["timestamp"],
+            int(datetime.datetime(2021, 12, 16, 15, 30).timestamp()),
+        )
+        # alarm still scheduled, no schedule change event
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 1)
+        self.assertFalse(self.session.event_called("alarmclock.alarm.unscheduled"))
+
+    def test_update_alarm_keep_disabled(self):
+        self.init()
+        alarm_uuid = self.module.add_alarms([self.__make_alarm_params(14, 0)])[0]
+        self.module.toggle_alarm(alarm_uuid)
+        params = self.__make_alarm_params(15, 30)
+
+        self.module.update_alarm(
+            alarm_uuid,
+            params["alarm_time"],
+            10,
+            params["days"],
+            False,
+            50,
+            False,
+            False,
+        )
+
+        self.assertFalse(self.module._get_device(alarm_uuid)["enabled"])
+        self.assertEqual(self.module.get_next_alarms(1), [])
+
+    def test_update_alarm_failed(self):
+        self.init()
+        alarm_uuid = self.module.add_alarms([self.__make_alarm_params(14, 0)])[0]
+        self.module._update_device = Mock(return_value=False)
+        params = self.__make_alarm_params()
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.update_alarm(alarm_uuid, **params)
+        self.assertEqual(str(cm.exception), "Error updating alarm")
+
+    def test_update_alarm_check_parameters(self):
+        self.init()
+        alarm_uuid = self.module.add_alarms([self.__make_alarm_params(14, 0)])[0]
+        params = self.__make_alarm_params()
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.update_alarm("123456789", **params)
+        self.assertEqual(str(cm.exception), "Alarm does not exist")
+        params["volume"] = 0
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.update_alarm(alarm_uuid, **params)
+        self.assertEqual(str(cm.exception), "Volume must be between 1 and 100")
+
+    def test_alarm_delta_events(self):
+        self.init()
+
+        alarm_uuid = self.module.add_alarms([self.__make_alarm_params(14, 0)])[0]
+        device = self.module._get_device(alarm_uuid)
+        self.session.assert_event_called_with("alarmclock.alarm.created", device)
+
+        self.module.toggle_alarm(alarm_uuid)
+        device = self.module._get_device(alarm_uuid)
+        self.assertFalse(device["enabled"])
+        self.session.assert_event_called_with("alarmclock.alarm.updated", device)
+
+        self.module.remove_alarm(alarm_uuid)
+        self.session.assert_event_called_with(
+            "alarmclock.alarm.deleted", {"uuid": alarm_uuid}
+        )
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.created"), 1)
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.updated"), 1)
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.deleted"), 1)
+
+    def test_remove_alarm(self):
+        self.init()
+        self.module.tomorrow = {
+            "date": datetime.date.today() + datetime.timedelta(days=1),
+            "is_non_working_day": False,
+        }
+        alarm_uuid = self.module.add_alarms([self.__make_alarm_params(1, 1)])[0]
+
+        self.module.remove_alarm(alarm_uuid)
+
+        self.assertIsNone(self.module._get_device(alarm_uuid))
+        self.assertEqual(len(self.module._Alarmclock__schedule_window), 0)
+        self.session.assert_event_called_with(
+            "alarmclock.alarm.unscheduled",
             {
-                "type": "alarmclock",
-                "name": "Alarm",
-                "enabled": True,
-                "nonWorkingDays": False,
-                "time": {
-                    "hour": 12,
-                    "minute": 10,
-                },
+                "hour": 1,
+                "minute": 1,
                 "timeout": 10,
-                "days": {
-                    "mon": True,
-                    "tue": True,
-                    "wed": True,
-                    "thu": False,
-                    "fri": True,
-                    "sat": True,
-                    "sun": True,
-                },
                 "volume": 50,
+                "count": 0,
                 "repeat": False,
                 "shuffle": False,
-            }
+            },
         )
-        self.module.today_is_non_working_day = False
+        self.assertEqual(self.module.get_next_alarms(5), [])
+
+    def test_remove_alarm_failed(self):
+        self.init()
+        self.module._get_device = Mock(return_value={})
+        self.module._delete_device = Mock(return_value=False)
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.remove_alarm("123456789")
+        self.assertEqual(str(cm.exception), "Error removing alarm")
+
+    def test_remove_alarm_check_parameters(self):
+        self.init()
+        self.module._get_device = Mock(return_value=None)
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.remove_alarm("123456789")
+        self.assertEqual(str(cm.exception), "Alarm does not exist")
+
+    def test_toggle_alarm_disable(self):
+        self.init()
         self.module.tomorrow = {
-            "date": datetime.date(2021, 12, 17),
+            "date": datetime.date.today() + datetime.timedelta(days=1),
             "is_non_working_day": False,
         }
+        alarm_uuids = self.module.add_alarms(
+            [self.__make_alarm_params(1, 1), self.__make_alarm_params(2, 2)]
+        )
 
-        self.module._schedule_alarm()
+        enabled = self.module.toggle_alarm(alarm_uuids[0])
 
+        self.assertFalse(enabled)
+        self.assertFalse(self.module._get_device(alarm_uuids[0])["enabled"])
         self.session.assert_event_called_with(
-            "alarmclock.alarm.scheduled",
+            "alarmclock.alarm.unscheduled",
             {
-                "hour": 12,
-                "minute": 10,
+                "hour": 1,
+                "minute": 1,
                 "timeout": 10,
                 "volume": 50,
                 "count": 1,
@@ -882,66 +1195,418 @@ class TestsAlarmclock(unittest.TestCase):
                 "shuffle": False,
             },
         )
-        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 1)
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 2)
+        self.assertEqual(
+            [alarm["uuid"] for alarm in self.module.get_next_alarms(5)],
+            [alarm_uuids[1]],
+        )
 
-    @patch("backend.alarmclock.datetime")
-    def test__schedule_alarm_for_tomorrow_but_disabled(self, datetime_mock):
-        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+    def test_toggle_alarm_enable(self):
         self.init()
-        self.module._add_device(
-            {
-                "type": "alarmclock",
+        self.module.tomorrow = {
+            "date": datetime.date.today() + datetime.timedelta(days=1),
+            "is_non_working_day": False,
+        }
+        alarm_uuids = self.module.add_alarms([self.__make_alarm_params(1, 1)])
+        self.module.toggle_alarm(alarm_uuids[0])
+
+        enabled = self.module.toggle_alarm(alarm_uuids[0])
+
+        self.assertTrue(enabled)
+        self.assertTrue(self.module._get_device(alarm_uuids[0])["enabled"])
+        self.session.assert_event_called_with(
+            "alarmclock.alarm.scheduled",
+            {
+                "hour": 1,
+                "minute": 1,
+                "timeout": 10,
+                "volume": 50,
+                "count": 1,
+                "repeat": False,
+                "shuffle": False,
+            },
+        )
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 2)
+        self.assertEqual(
+            self.session.event_call_count("alarmclock.alarm.unscheduled"), 1
+        )
+
+    def test_toggle_alarm_reschedule_only_toggled_alarm(self):
+        self.init()
+        alarm_uuids = self.module.add_alarms(
+            [self.__make_alarm_params(hour, 0) for hour in range(10)]
+        )
+        self.module._Alarmclock__compute_next_fire = Mock(
+            wraps=self.module._Alarmclock__compute_next_fire
+        )
+
+        self.module.toggle_alarm(alarm_uuids[0])
+
+        self.assertEqual(self.module._Alarmclock__compute_next_fire.call_count, 1)
+
+    def test_toggle_alarm_failed(self):
+        self.init()
+        alarm = {
+            "time": {"hour": 1, "minute": 1},
+            "timeout": 10,
+            "enabled": True,
+            "volume": 10,
+        }
+        self.module._get_device = Mock(return_value=alarm)
+        self.module._update_device = Mock(return_value=False)
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.toggle_alarm("123456789")
+        self.assertEqual(str(cm.exception), "Error updating alarm")
+
+    def test_toggle_alarm_check_parameters(self):
+        self.init()
+        self.module._get_device = Mock(return_value=None)
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.toggle_alarm("123456789")
+        self.assertEqual(str(cm.exception), "Alarm does not exist")
+
+    def test__set_today_is_non_working_day(self):
+        self.init(start=False, mock_fn=False)
+        is_today_non_working_day_mock = self.session.make_mock_command(
+            "is_today_non_working_day", True
+        )
+        self.session.add_mock_command(is_today_non_working_day_mock)
+        self.module._set_tomorrow_is_non_working_day = Mock()
+        self.session.start_module(self.module)
+
+        self.module._set_today_is_non_working_day()
+
+        self.assertTrue(self.module.today_is_non_working_day)
+        self.session.assert_command_called_with(
+            "is_today_non_working_day", None, to="parameters"
+        )
+
+    def test__set_today_is_non_working_day_failed(self):
+        self.init(start=False, mock_fn=False)
+        is_today_non_working_day_mock = self.session.make_mock_command(
+            "is_today_non_working_day", True, fail=True
+        )
+        self.session.add_mock_command(is_today_non_working_day_mock)
+        self.module._set_tomorrow_is_non_working_day = Mock()
+        self.session.start_module(self.module)
+        self.module._set_tomorrow_is_non_working_day = Mock()
+
+        try:
+            self.module._set_today_is_non_working_day()
+        except:
+            self.fail("_set_today_is_non_working_day should not raise exception")
+
+    @patch("backend.alarmclock.date")
+    def test__set_tomorrow_is_non_working_day(self, date_mock):
+        today = datetime.date(2021, 12, 15)
+        date_mock.today.return_value = today
+        self.init(start=False, mock_fn=False)
+        is_module_loaded = self.session.make_mock_command("is_module_loaded", True)
+        self.session.add_mock_command(is_module_loaded)
+        is_non_working_day_mock = self.session.make_mock_command(
+            "is_non_working_day", True
+        )
+        self.session.add_mock_command(is_non_working_day_mock)
+        self.module._set_today_is_non_working_day = Mock()
+        self.session.start_module(self.module)
+
+        self.module._set_tomorrow_is_non_working_day()
+
+        self.assertTrue(self.module.tomorrow["is_non_working_day"])
+        self.assertEqual(self.module.tomorrow["date"], datetime.date(2021, 12, 16))
+        self.session.assert_command_called_with(
+            "is_non_working_day", {"day": "2021-12-16"}, to="parameters"
+        )
+
+    @patch("backend.alarmclock.date")
+    def test__set_tomorrow_is_non_working_day_failed(self, date_mock):
+        today = datetime.date(2021, 12, 15)
+        date_mock.today.return_value = today
+        self.init(start=False, mock_fn=False)
+        is_module_loaded = self.session.make_mock_command("is_module_loaded", True)
+        self.session.add_mock_command(is_module_loaded)
+        is_non_working_day_mock = self.session.make_mock_command(
+            "is_non_working_day", True, fail=True
+        )
+        self.session.add_mock_command(is_non_working_day_mock)
+        self.module._set_today_is_non_working_day = Mock()
+        self.session.start_module(self.module)
+
+        try:
+            self.module._set_tomorrow_is_non_working_day()
+        except:
+            self.fail("_set_tomorrow_is_non_working_day should not raise exception")
+
+    def test__set_today_is_non_working_day_cached(self):
+        self.init(start=False, mock_fn=False)
+        self.session.start_module(self.module)
+        self.module.send_command = Mock()
+        self.module.non_working_days.set(datetime.date.today(), True)
+
+        self.module._set_today_is_non_working_day()
+
+        self.assertTrue(self.module.today_is_non_working_day)
+        self.module.send_command.assert_not_called()
+
+    @patch("backend.alarmclock.date")
+    def test__set_tomorrow_is_non_working_day_cached(self, date_mock):
+        date_mock.today.return_value = datetime.date(2021, 12, 15)
+        self.init(start=False, mock_fn=False)
+        self.session.start_module(self.module)
+        self.module.send_command = Mock()
+        self.module.non_working_days.set(datetime.date(2021, 12, 16), True)
+        previous_tomorrow = self.module.tomorrow
+
+        self.module._set_tomorrow_is_non_working_day()
+
+        # status is replaced, never updated in place
+        self.assertIsNot(self.module.tomorrow, previous_tomorrow)
+        self.assertTrue(self.module.tomorrow["is_non_working_day"])
+        self.assertEqual(self.module.tomorrow["date"], datetime.date(2021, 12, 16))
+        self.module.send_command.assert_not_called()
+
+    @patch("backend.alarmclock.date")
+    def test__refresh_non_working_days_by_year(self, date_mock):
+        date_mock.today.return_value = datetime.date(2021, 12, 15)
+        self.init(start=False, mock_fn=False)
+        get_non_working_days_mock = self.session.make_mock_command(
+            "get_non_working_days", ["2021-12-25", "2022-01-01"]
+        )
+        self.session.add_mock_command(get_non_working_days_mock)
+        self.session.start_module(self.module)
+
+        self.module._refresh_non_working_days()
+
+        self.assertEqual(len(self.module.non_working_days), 30)
+        self.assertTrue(self.module.non_working_days.get(datetime.date(2021, 12, 25)))
+        self.assertTrue(self.module.non_working_days.get(datetime.date(2022, 1, 1)))
+        self.assertFalse(self.module.non_working_days.get(datetime.date(2021, 12, 24)))
+        self.session.assert_command_called_with(
+            "get_non_working_days", {"year": 2022}, to="parameters"
+        )
+
+    @patch("backend.alarmclock.date")
+    def test__refresh_non_working_days_by_day(self, date_mock):
+        date_mock.today.return_value = datetime.date(2021, 12, 15)
+        self.init(start=False, mock_fn=False)
+        get_non_working_days_mock = self.session.make_mock_command(
+            "get_non_working_days", None, fail=True
+        )
+        self.session.add_mock_command(get_non_working_days_mock)
+        is_non_working_day_mock = self.session.make_mock_command(
+            "is_non_working_day", True
+        )
+        self.session.add_mock_command(is_non_working_day_mock)
+        self.session.start_module(self.module)
+
+        self.module.non_working_days.set(datetime.date(2021, 12, 15), False)
+
+        self.module._refresh_non_working_days()
+
+        self.assertEqual(len(self.module.non_working_days), 8)
+        self.assertTrue(self.module.non_working_days.get(datetime.date(2021, 12, 22)))
+        self.assertIsNone(self.module.non_working_days.get(datetime.date(2021, 12, 23)))
+        self.assertEqual(self.session.command_call_count("is_non_working_day"), 7)
+        self.session.assert_command_called_with(
+            "is_non_working_day", {"day": "2021-12-22"}, to="parameters"
+        )
+
+    @patch("backend.alarmclock.date")
+    def test__refresh_non_working_days_by_day_stops_at_first_failure(self, date_mock):
+        date_mock.today.return_value = datetime.date(2021, 12, 15)
+        self.init(start=False, mock_fn=False)
+        self.session.start_module(self.module)
+        self.module.send_command = Mock()
+        self.module.send_command.return_value.error = True
+
+        self.module._refresh_non_working_days()
+
+        # one get_non_working_days request and one is_non_working_day request
+        self.assertEqual(self.module.send_command.call_count, 2)
+        self.assertEqual(len(self.module.non_working_days), 0)
+
+    @patch("backend.alarmclock.date")
+    def test__refresh_non_working_days_no_response(self, date_mock):
+        date_mock.today.return_value = datetime.date(2021, 12, 15)
+        self.init(start=False, mock_fn=False)
+        self.session.start_module(self.module)
+        self.module.send_command = Mock(side_effect=Exception("No response"))
+
+        self.module._refresh_non_working_days()
+
+        # no response is not handled as unsupported command: no fallback by day
+        self.module.send_command.assert_called_once_with(
+            "get_non_working_days", "parameters", {"year": 2021}
+        )
+        self.assertEqual(len(self.module.non_working_days), 0)
+
+    def test__refresh_non_working_days_cache_valid(self):
+        self.init(start=False, mock_fn=False)
+        self.session.start_module(self.module)
+        self.module.send_command = Mock()
+        today = datetime.date.today()
+        self.module.non_working_days.update(
+            {
+                day: False
+                for day in self.module.non_working_days.get_horizon_days(today)
+            }
+        )
+
+        self.module._refresh_non_working_days()
+
+        self.module.send_command.assert_not_called()
+
+    @patch("backend.alarmclock.os.path.exists")
+    def test__load_non_working_days(self, exists_mock):
+        exists_mock.return_value = True
+        self.init()
+        self.module.cleep_filesystem = Mock()
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        self.module.cleep_filesystem.read_json.return_value = {
+            "version": NonWorkingDaysCache.VERSION,
+            "updated_at": 1000,
+            "days": {
+                "2021-12-25": True,
+                tomorrow.isoformat(): True,
+            },
+        }
+
+        loaded = self.module._load_non_working_days()
+
+        self.assertTrue(loaded)
+        self.assertTrue(self.module.non_working_days.get(tomorrow))
+        self.assertIsNone(
+            self.module.non_working_days.get(datetime.date(2021, 12, 25))
+        )
+
+    @patch("backend.alarmclock.os.path.exists")
+    def test__load_non_working_days_invalid_version(self, exists_mock):
+        exists_mock.return_value = True
+        self.init()
+        self.module.cleep_filesystem = Mock()
+        self.module.cleep_filesystem.read_json.return_value = {
+            "version": 0,
+            "days": {},
+        }
+
+        self.assertFalse(self.module._load_non_working_days())
+
+    @patch("backend.alarmclock.os.path.exists")
+    def test__load_non_working_days_no_snapshot(self, exists_mock):
+        exists_mock.return_value = False
+        self.init()
+        self.module.cleep_filesystem = Mock()
+
+        self.assertFalse(self.module._load_non_working_days())
+        self.module.cleep_filesystem.read_json.assert_not_called()
+
+    @patch("backend.alarmclock.os.path.exists")
+    def test__save_non_working_days(self, exists_mock):
+        exists_mock.return_value = True
+        self.init()
+        self.module.cleep_filesystem = Mock()
+        self.module.non_working_days.update({datetime.date(2021, 12, 25): True}, 1000)
+
+        self.module._save_non_working_days()
+
+        self.module.cleep_filesystem.write_json.assert_called_with(
+            "/opt/cleep/modules/Alarmclock/nonworkingdays.json",
+            {
+                "version": NonWorkingDaysCache.VERSION,
+                "updated_at": 1000,
+                "days": {"2021-12-25": True},
+            },
+        )
+
+    def test__revalidate_non_working_days(self):
+        self.init(start=False, mock_fn=False)
+        self.session.start_module(self.module)
+        self.module._refresh_non_working_days = Mock()
+        self.module._prefetch_day_status = Mock()
+        self.module._schedule_alarm = Mock()
+        self.module.non_working_days.set(datetime.date.today(), True)
+
+        self.module._revalidate_non_working_days()
+
+        self.module._refresh_non_working_days.assert_called_with(force=True)
+        self.assertTrue(self.module.today_is_non_working_day)
+        self.module._schedule_alarm.assert_called()
+        self.module._prefetch_day_status.assert_called()
+
+    def test__trigger_alarm(self):
+        self.init()
+        self.module.timer_wheel = Mock()
+        alarm = self.module._add_device(
+            {
+                "type": "alarmclock",
                 "name": "Alarm",
-                "enabled": False,
-                "nonWorkingDays": False,
+                "enabled": True,
+                "nonWorkingDays": True,
                 "time": {
                     "hour": 12,
-                    "minute": 10,
+                    "minute": 0,
                 },
                 "timeout": 10,
                 "days": {
                     "mon": True,
                     "tue": True,
                     "wed": True,
-                    "thu": False,
+                    "thu": True,
                     "fri": True,
                     "sat": True,
                     "sun": True,
                 },
+                "volume": 50,
                 "repeat": False,
                 "shuffle": False,
             }
         )
-        self.module.today_is_non_working_day = False
         self.module.tomorrow = {
-            "date": datetime.date(2021, 12, 17),
-            "is_non_working_day": False,
+            "date": datetime.date(2021, 12, 16),
+            "nonWorkingDay": False,
         }
 
-        self.module._schedule_alarm()
+        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
 
-        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 0)
+        self.session.assert_event_called_with(
+            "alarmclock.alarm.triggered",
+            {
+                "hour": 12,
+                "minute": 0,
+                "timeout": 10,
+                "volume": 50,
+                "repeat": False,
+                "shuffle": False,
+            },
+        )
+        self.module.timer_wheel.schedule.assert_called_with(
+            600, self.module._stop_alarm, [alarm["uuid"]]
+        )
+        self.assertEqual(
+            self.module.stop_timers[alarm["uuid"]],
+            self.module.timer_wheel.schedule.return_value,
+        )
 
-    @patch("backend.alarmclock.datetime")
-    def test__schedule_alarm_for_tomorrow_but_non_working_day(self, datetime_mock):
-        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+    def test__trigger_alarm_with_alarm_disabled(self):
         self.init()
         self.module._add_device(
             {
                 "type": "alarmclock",
                 "name": "Alarm",
                 "enabled": False,
-                "nonWorkingDays": False,
+                "nonWorkingDays": True,
                 "time": {
                     "hour": 12,
-                    "minute": 10,
+                    "minute": 0,
                 },
                 "timeout": 10,
                 "days": {
                     "mon": True,
                     "tue": True,
                     "wed": True,
-                    "thu": False,
+                    "thu": True,
                     "fri": True,
                     "sat": True,
                     "sun": True,
@@ -950,19 +1615,16 @@ class TestsAlarmclock(unittest.TestCase):
                 "shuffle": False,
             }
         )
-        self.module.today_is_non_working_day = False
         self.module.tomorrow = {
-            "date": datetime.date(2021, 12, 17),
-            "is_non_working_day": True,
+            "date": datetime.date(2021, 12, 16),
+            "nonWorkingDay": False,
         }
 
-        self.module._schedule_alarm()
+        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
 
-        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 0)
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 0)
 
-    @patch("backend.alarmclock.datetime")
-    def test__schedule_alarm_alarms_for_today_and_tomorrow(self, datetime_mock):
-        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+    def test__trigger_alarm_with_not_good_time(self):
         self.init()
         self.module._add_device(
             {
@@ -971,11 +1633,45 @@ class TestsAlarmclock(unittest.TestCase):
                 "enabled": True,
                 "nonWorkingDays": True,
                 "time": {
-                    "hour": 14,
-                    "minute": 10,
+                    "hour": 12,
+                    "minute": 12,
+                },
+                "timeout": 10,
+                "days": {
+                    "mon": True,
+                    "tue": True,
+                    "wed": True,
+                    "thu": True,
+                    "fri": True,
+                    "sat": True,
+                    "sun": True,
+                },
+                "repeat": False,
+                "shuffle": False,
+            }
+        )
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 16),
+            "nonWorkingDay": False,
+        }
+
+        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 0)
+
+    def test__trigger_alarm_on_working_day(self):
+        self.init()
+        self.module._add_device(
+            {
+                "type": "alarmclock",
+                "name": "Alarm",
+                "enabled": True,
+                "nonWorkingDays": False,
+                "time": {
+                    "hour": 12,
+                    "minute": 0,
                 },
                 "timeout": 10,
-                "volume": 50,
                 "days": {
                     "mon": True,
                     "tue": True,
@@ -989,6 +1685,18 @@ class TestsAlarmclock(unittest.TestCase):
                 "shuffle": False,
             }
         )
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 16),
+            "nonWorkingDay": False,
+        }
+        self.module.today_is_non_working_day = True
+
+        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 0)
+
+    def test__trigger_alarm_on_disabled_day(self):
+        self.init()
         self.module._add_device(
             {
                 "type": "alarmclock",
@@ -996,11 +1704,183 @@ class TestsAlarmclock(unittest.TestCase):
                 "enabled": True,
                 "nonWorkingDays": True,
                 "time": {
-                    "hour": 10,
-                    "minute": 10,
+                    "hour": 12,
+                    "minute": 0,
+                },
+                "timeout": 10,
+                "days": {
+                    "mon": True,
+                    "tue": False,
+                    "wed": True,
+                    "thu": True,
+                    "fri": True,
+                    "sat": True,
+                    "sun": True,
+                },
+                "repeat": False,
+                "shuffle": False,
+            }
+        )
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 16),
+            "nonWorkingDay": False,
+        }
+        self.module.today_is_non_working_day = True
+
+        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 0)
+
+    def test__trigger_alarm_after_toggle(self):
+        self.init()
+        alarm = self.module._add_device(
+            {
+                "type": "alarmclock",
+                "name": "Alarm",
+                "enabled": True,
+                "nonWorkingDays": True,
+                "time": {
+                    "hour": 12,
+                    "minute": 0,
+                },
+                "timeout": 10,
+                "days": {
+                    "mon": True,
+                    "tue": True,
+                    "wed": True,
+                    "thu": True,
+                    "fri": True,
+                    "sat": True,
+                    "sun": True,
+                },
+                "volume": 50,
+                "repeat": False,
+                "shuffle": False,
+            }
+        )
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 16),
+            "nonWorkingDay": False,
+        }
+
+        self.module.toggle_alarm(alarm["uuid"])
+        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 0)
+
+    def test__trigger_alarm_payload_updated(self):
+        self.init()
+        self.module.timer_wheel = Mock()
+        alarm = self.module._add_device(
+            {
+                "type": "alarmclock",
+                "name": "Alarm",
+                "enabled": True,
+                "nonWorkingDays": True,
+                "time": {
+                    "hour": 12,
+                    "minute": 0,
+                },
+                "timeout": 10,
+                "days": {
+                    "mon": True,
+                    "tue": True,
+                    "wed": True,
+                    "thu": True,
+                    "fri": True,
+                    "sat": True,
+                    "sun": True,
                 },
+                "volume": 50,
+                "repeat": False,
+                "shuffle": False,
+            }
+        )
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 16),
+            "nonWorkingDay": False,
+        }
+        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
+
+        self.module._update_device(alarm["uuid"], {"volume": 80})
+        self.module._trigger_alarm({"hour": 12, "minute": 0}, "tue")
+
+        self.session.assert_event_called_with(
+            "alarmclock.alarm.triggered",
+            {
+                "hour": 12,
+                "minute": 0,
+                "timeout": 10,
+                "volume": 80,
+                "repeat": False,
+                "shuffle": False,
+            },
+        )
+
+    def test__stop_alarm(self):
+        self.init()
+        device = {
+            "name": "Alarm",
+            "type": "alarmclock",
+            "time": {
+                "hour": 12,
+                "minute": 0,
+            },
+            "enabled": True,
+            "timeout": 10,
+            "volume": 50,
+        }
+        self.module._Alarmclock__alarms["1234567789"] = Alarm.from_device(device)
+        timer_mock = Mock()
+        self.module.stop_timers["1234567789"] = timer_mock
+
+        self.module._stop_alarm("1234567789")
+
+        self.session.assert_event_called_with(
+            "alarmclock.alarm.stopped",
+            {
+                "hour": 12,
+                "minute": 0,
                 "timeout": 10,
+                "snoozed": False,
                 "volume": 50,
+            },
+        )
+        timer_mock.cancel.assert_called()
+        self.assertEqual(len(self.module.stop_timers.keys()), 0)
+
+    def test__on_stop(self):
+        self.init()
+        self.module.timer_wheel = Mock()
+        self.module.stop_timers["1234567789"] = Mock()
+
+        self.module._on_stop()
+
+        self.module.timer_wheel.stop.assert_called()
+        self.assertEqual(len(self.module.stop_timers.keys()), 0)
+
+    def test__stop_alarm_alarm_not_found(self):
+        self.init()
+
+        self.module._stop_alarm("1234567789")
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.stopped"), 0)
+
+    @patch("backend.alarmclock.datetime")
+    def test__schedule_alarm_for_today(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module._add_device(
+            {
+                "type": "alarmclock",
+                "name": "Alarm",
+                "enabled": True,
+                "nonWorkingDays": False,
+                "time": {
+                    "hour": 12,
+                    "minute": 10,
+                },
+                "timeout": 10,
                 "days": {
                     "mon": True,
                     "tue": True,
@@ -1010,10 +1890,12 @@ class TestsAlarmclock(unittest.TestCase):
                     "sat": True,
                     "sun": True,
                 },
+                "volume": 50,
                 "repeat": False,
                 "shuffle": False,
             }
         )
+        self.module.today_is_non_working_day = False
         self.module.tomorrow = {
             "date": datetime.date(2021, 12, 17),
             "is_non_working_day": False,
@@ -1021,10 +1903,22 @@ class TestsAlarmclock(unittest.TestCase):
 
         self.module._schedule_alarm()
 
-        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 2)
+        self.session.assert_event_called_with(
+            "alarmclock.alarm.scheduled",
+            {
+                "hour": 12,
+                "minute": 10,
+                "timeout": 10,
+                "volume": 50,
+                "count": 1,
+                "repeat": False,
+                "shuffle": False,
+            },
+        )
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 1)
 
     @patch("backend.alarmclock.datetime")
-    def test__schedule_alarm_no_alarm_for_today_and_tomorrow(self, datetime_mock):
+    def test__schedule_alarm_for_today_but_disabled(self, datetime_mock):
         datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
         self.init()
         self.module._add_device(
@@ -1032,7 +1926,7 @@ class TestsAlarmclock(unittest.TestCase):
                 "type": "alarmclock",
                 "name": "Alarm",
                 "enabled": False,
-                "nonWorkingDays": True,
+                "nonWorkingDays": False,
                 "time": {
                     "hour": 12,
                     "minute": 10,
@@ -1042,8 +1936,8 @@ class TestsAlarmclock(unittest.TestCase):
                     "mon": True,
                     "tue": True,
                     "wed": True,
-                    "thu": False,
-                    "fri": False,
+                    "thu": True,
+                    "fri": True,
                     "sat": True,
                     "sun": True,
                 },
@@ -1051,248 +1945,1966 @@ class TestsAlarmclock(unittest.TestCase):
                 "shuffle": False,
             }
         )
+        self.module.today_is_non_working_day = False
         self.module.tomorrow = {
             "date": datetime.date(2021, 12, 17),
             "is_non_working_day": False,
         }
 
-        self.module._schedule_alarm()
+        self.module._schedule_alarm()
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 0)
+
+    @patch("backend.alarmclock.datetime")
+    def test__schedule_alarm_for_today_but_non_working_day(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module.today_is_non_working_day = True
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 17),
+            "is_non_working_day": True,
+        }
+        self.module._add_device(
+            {
+                "type": "alarmclock",
+                "name": "Alarm",
+                "enabled": True,
+                "nonWorkingDays": False,
+                "time": {
+                    "hour": 12,
+                    "minute": 10,
+                },
+                "timeout": 10,
+                "days": {
+                    "mon": True,
+                    "tue": True,
+                    "wed": True,
+                    "thu": True,
+                    "fri": True,
+                    "sat": True,
+                    "sun": True,
+                },
+                "repeat": False,
+                "shuffle": False,
+            }
+        )
+
+        self.module._schedule_alarm()
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 0)
+
+    @patch("backend.alarmclock.datetime")
+    def test__schedule_alarm_for_tomorrow(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module._add_device(
+            {
+                "type": "alarmclock",
+                "name": "Alarm",
+                "enabled": True,
+                "nonWorkingDays": False,
+                "time": {
+                    "hour": 12,
+                    "minute": 10,
+                },
+                "timeout": 10,
+                "days": {
+                    "mon": True,
+                    "tue": True,
+                    "wed": True,
+                    "thu": False,
+                    "fri": True,
+                    "sat": True,
+                    "sun": True,
+                },
+                "volume": 50,
+                "repeat": False,
+                "shuffle": False,
+            }
+        )
+        self.module.today_is_non_working_day = False
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 17),
+            "is_non_working_day": False,
+        }
+
+        self.module._schedule_alarm()
+
+        self.session.assert_event_called_with(
+            "alarmclock.alarm.scheduled",
+            {
+                "hour": 12,
+                "minute": 10,
+                "timeout": 10,
+                "volume": 50,
+                "count": 1,
+                "repeat": False,
+                "shuffle": False,
+            },
+        )
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 1)
+
+    @patch("backend.alarmclock.datetime")
+    def test__schedule_alarm_for_tomorrow_but_disabled(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module._add_device(
+            {
+                "type": "alarmclock",
+                "name": "Alarm",
+                "enabled": False,
+                "nonWorkingDays": False,
+                "time": {
+                    "hour": 12,
+                    "minute": 10,
+                },
+                "timeout": 10,
+                "days": {
+                    "mon": True,
+                    "tue": True,
+                    "wed": True,
+                    "thu": False,
+                    "fri": True,
+                    "sat": True,
+                    "sun": True,
+                },
+                "repeat": False,
+                "shuffle": False,
+            }
+        )
+        self.module.today_is_non_working_day = False
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 17),
+            "is_non_working_day": False,
+        }
+
+        self.module._schedule_alarm()
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 0)
+
+    @patch("backend.alarmclock.datetime")
+    def test__schedule_alarm_for_tomorrow_but_non_working_day(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module._add_device(
+            {
+                "type": "alarmclock",
+                "name": "Alarm",
+                "enabled": False,
+                "nonWorkingDays": False,
+                "time": {
+                    "hour": 12,
+                    "minute": 10,
+                },
+                "timeout": 10,
+                "days": {
+                    "mon": True,
+                    "tue": True,
+                    "wed": True,
+                    "thu": False,
+                    "fri": True,
+                    "sat": True,
+                    "sun": True,
+                },
+                "repeat": False,
+                "shuffle": False,
+            }
+        )
+        self.module.today_is_non_working_day = False
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 17),
+            "is_non_working_day": True,
+        }
+
+        self.module._schedule_alarm()
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 0)
+
+    @patch("backend.alarmclock.datetime")
+    def test__schedule_alarm_alarms_for_today_and_tomorrow(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module._add_device(
+            {
+                "type": "alarmclock",
+                "name": "Alarm",
+                "enabled": True,
+                "nonWorkingDays": True,
+                "time": {
+                    "hour": 14,
+                    "minute": 10,
+                },
+                "timeout": 10,
+                "volume": 50,
+                "days": {
+                    "mon": True,
+                    "tue": True,
+                    "wed": True,
+                    "thu": True,
+                    "fri": True,
+                    "sat": True,
+                    "sun": True,
+                },
+                "repeat": False,
+                "shuffle": False,
+            }
+        )
+        self.module._add_device(
+            {
+                "type": "alarmclock",
+                "name": "Alarm",
+                "enabled": True,
+                "nonWorkingDays": True,
+                "time": {
+                    "hour": 10,
+                    "minute": 10,
+                },
+                "timeout": 10,
+                "volume": 50,
+                "days": {
+                    "mon": True,
+                    "tue": True,
+                    "wed": True,
+                    "thu": True,
+                    "fri": True,
+                    "sat": True,
+                    "sun": True,
+                },
+                "repeat": False,
+                "shuffle": False,
+            }
+        )
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 17),
+            "is_non_working_day": False,
+        }
+
+        self.module._schedule_alarm()
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 2)
+
+    @patch("backend.alarmclock.datetime")
+    def test__schedule_alarm_no_alarm_for_today_and_tomorrow(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module._add_device(
+            {
+                "type": "alarmclock",
+                "name": "Alarm",
+                "enabled": False,
+                "nonWorkingDays": True,
+                "time": {
+                    "hour": 12,
+                    "minute": 10,
+                },
+                "timeout": 10,
+                "days": {
+                    "mon": True,
+                    "tue": True,
+                    "wed": True,
+                    "thu": False,
+                    "fri": False,
+                    "sat": True,
+                    "sun": True,
+                },
+                "repeat": False,
+                "shuffle": False,
+            }
+        )
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 17),
+            "is_non_working_day": False,
+        }
+
+        self.module._schedule_alarm()
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 0)
+
+    @patch("backend.alarmclock.datetime")
+    def test__schedule_alarm_single_alarm(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        devices = []
+        for hour in (14, 15):
+            devices.append(
+                self.module._add_device(
+                    {
+                        "type": "alarmclock",
+                        "name": "Alarm",
+                        "enabled": True,
+                        "nonWorkingDays": True,
+                        "time": {
+                            "hour": hour,
+                            "minute": 10,
+                        },
+                        "timeout": 10,
+                        "volume": 50,
+                        "days": {
+                            "mon": True,
+                            "tue": True,
+                            "wed": True,
+                            "thu": True,
+                            "fri": True,
+                            "sat": True,
+                            "sun": True,
+                        },
+                        "repeat": False,
+                        "shuffle": False,
+                    }
+                )
+            )
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 17),
+            "is_non_working_day": False,
+        }
+
+        self.module._schedule_alarm(devices[1]["uuid"])
+
+        # alarms are scheduled when added, rescheduling unchanged alarm sends nothing
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 2)
+        self.assertEqual(
+            [alarm["uuid"] for alarm in self.module.get_next_alarms(5)],
+            [devices[0]["uuid"], devices[1]["uuid"]],
+        )
+
+    @patch("backend.alarmclock.datetime")
+    def test__schedule_alarm_day_change(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 17),
+            "is_non_working_day": False,
+        }
+        # thursday only alarm, scheduled today
+        params = self.__make_alarm_params(12, 10)
+        params["days"] = {"thu": True}
+        alarm_uuid = self.module.add_alarms([params])[0]
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 1)
+
+        # alarm did not fire (tick missed) and day changed
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 17, 0, 0)
+        self.module._schedule_alarm()
+
+        self.assertEqual(len(self.module._Alarmclock__schedule_window), 0)
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 1)
+        self.assertEqual(
+            self.module.get_next_alarms(1)[0],
+            {
+                "uuid": alarm_uuid,
+                "timestamp": int(datetime.datetime(2021, 12, 23, 12, 10).timestamp()),
+            },
+        )
+
+    @patch("backend.alarmclock.datetime")
+    def test_get_next_alarms(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        devices = []
+        for hour in (14, 10):
+            devices.append(
+                self.module._add_device(
+                    {
+                        "type": "alarmclock",
+                        "name": "Alarm",
+                        "enabled": True,
+                        "nonWorkingDays": True,
+                        "time": {
+                            "hour": hour,
+                            "minute": 10,
+                        },
+                        "timeout": 10,
+                        "volume": 50,
+                        "days": {
+                            "mon": True,
+                            "tue": True,
+                            "wed": True,
+                            "thu": True,
+                            "fri": True,
+                            "sat": True,
+                            "sun": True,
+                        },
+                        "repeat": False,
+                        "shuffle": False,
+                    }
+                )
+            )
+        self.module.tomorrow = {
+            "date": datetime.date(2021, 12, 17),
+            "is_non_working_day": False,
+        }
+        self.module._schedule_alarm()
+
+        next_alarms = self.module.get_next_alarms(5)
+
+        self.assertEqual(
+            [alarm["uuid"] for alarm in next_alarms],
+            [devices[0]["uuid"], devices[1]["uuid"]],
+        )
+        self.assertEqual(
+            next_alarms[1]["timestamp"],
+            int(datetime.datetime(2021, 12, 17, 10, 10).timestamp()),
+        )
+
+    def test_get_next_alarms_invalid_parameters(self):
+        self.init()
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_next_alarms(0)
+        self.assertEqual(str(cm.exception), "Count must be greater than 0")
+
+    def test__trigger_alarm_duplicate_tick(self):
+        self.init()
+        self.module.timer_wheel = Mock()
+        self.module.add_alarms([self.__make_alarm_params(12, 0)])
+
+        self.module._trigger_alarm({"hour": 12, "minute": 0}, "mon")
+        self.module._trigger_alarm({"hour": 12, "minute": 0}, "mon")
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 1)
+
+    @patch("backend.alarmclock.datetime")
+    def test_set_deadline_mode(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module.timer_wheel = Mock()
+        self.module.add_alarms([self.__make_alarm_params(12, 10)])
+
+        self.module.set_deadline_mode(True)
+
+        self.assertTrue(self.module.deadline_mode)
+        self.assertTrue(self.module._get_config_field("deadline_mode"))
+        self.module.timer_wheel.schedule.assert_called_once_with(
+            600.0, self.module._on_deadline, [datetime.datetime(2021, 12, 16, 12, 10)]
+        )
+
+        self.module.set_deadline_mode(False)
+
+        self.assertFalse(self.module.deadline_mode)
+        self.module.timer_wheel.schedule.return_value.cancel.assert_called()
+
+    def test_set_deadline_mode_invalid_parameters(self):
+        self.init()
+
+        with self.assertRaises(InvalidParameter):
+            self.module.set_deadline_mode(1)
+
+    @patch("backend.alarmclock.datetime")
+    def test__on_deadline(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module.timer_wheel = Mock()
+        self.module.deadline_mode = True
+        self.module.add_alarms([self.__make_alarm_params(12, 10)])
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 10, 1)
+
+        self.module._on_deadline(datetime.datetime(2021, 12, 16, 12, 10))
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 1)
+        self.module.timer_wheel.schedule.assert_any_call(
+            86399.0,
+            self.module._on_deadline,
+            [datetime.datetime(2021, 12, 17, 12, 10)],
+        )
+
+    @patch("backend.alarmclock.datetime")
+    def test__on_deadline_too_early(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module.timer_wheel = Mock()
+        self.module.deadline_mode = True
+        self.module.add_alarms([self.__make_alarm_params(12, 10)])
+        datetime_mock.now.return_value = datetime.datetime(
+            2021, 12, 16, 12, 9, 59, 500000
+        )
+
+        self.module._on_deadline(datetime.datetime(2021, 12, 16, 12, 10))
+
+        self.assertEqual(self.session.event_call_count("alarmclock.alarm.triggered"), 0)
+        self.module.timer_wheel.schedule.assert_called_with(
+            0.5, self.module._on_deadline, [datetime.datetime(2021, 12, 16, 12, 10)]
+        )
+
+    def test_add_alarms_holds_trigger_lock(self):
+        self.init()
+        lock = self.module._Alarmclock__trigger_lock
+        acquired = []
+
+        def arm_deadline():
+            # timer wheel thread must not be able to take lock while schedule changes
+            thread = Thread(target=lambda: acquired.append(lock.acquire(False)))
+            thread.start()
+            thread.join()
+
+        self.module._arm_deadline = Mock(side_effect=arm_deadline)
+
+        self.module.add_alarms([self.__make_alarm_params(12, 10)])
+
+        self.assertEqual(acquired, [False])
+
+    def test_set_deadline_mode_holds_trigger_lock(self):
+        self.init()
+        lock = self.module._Alarmclock__trigger_lock
+        acquired = []
+
+        def arm_deadline():
+            thread = Thread(target=lambda: acquired.append(lock.acquire(False)))
+            thread.start()
+            thread.join()
+
+        self.module._arm_deadline = Mock(side_effect=arm_deadline)
+
+        self.module.set_deadline_mode(True)
+
+        self.assertEqual(acquired, [False])
+
+    def test_set_media_read_ahead_holds_trigger_lock(self):
+        self.init()
+        lock = self.module._Alarmclock__trigger_lock
+        acquired = []
+
+        def arm_read_ahead():
+            thread = Thread(target=lambda: acquired.append(lock.acquire(False)))
+            thread.start()
+            thread.join()
+
+        self.module._arm_read_ahead = Mock(side_effect=arm_read_ahead)
+
+        self.module.set_media_read_ahead(["/tmp/alarm.mp3"], 60, 8)
+
+        self.assertEqual(acquired, [False])
+
+    @patch("backend.alarmclock.datetime")
+    def test__arm_prewarm(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module.timer_wheel = Mock()
+        self.module.has_audioplayer = True
+
+        self.module.add_alarms([self.__make_alarm_params(12, 10)])
+
+        self.module.timer_wheel.schedule.assert_called_once_with(
+            570.0, self.module._on_prewarm, [datetime.datetime(2021, 12, 16, 12, 10)]
+        )
+
+    @patch("backend.alarmclock.datetime")
+    def test__arm_prewarm_no_audioplayer(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module.timer_wheel = Mock()
+        self.module.has_audioplayer = False
+
+        self.module.add_alarms([self.__make_alarm_params(12, 10)])
+
+        self.module.timer_wheel.schedule.assert_not_called()
+
+    @patch("backend.alarmclock.Task")
+    def test__on_prewarm(self, task_mock):
+        self.init()
+        fire = datetime.datetime(2021, 12, 16, 12, 10)
+
+        self.module._on_prewarm(fire)
+
+        task_mock.assert_called_with(
+            None, self.module._prewarm_audio, self.module.logger, [fire]
+        )
+        task_mock.return_value.start.assert_called()
+
+    @patch("backend.alarmclock.datetime")
+    def test__prewarm_audio(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module.add_alarms(
+            [self.__make_alarm_params(12, 10), self.__make_alarm_params(13, 0)]
+        )
+        self.module.send_command = Mock(return_value=Mock(error=False))
+
+        self.module._prewarm_audio(datetime.datetime(2021, 12, 16, 12, 10))
+
+        self.module.send_command.assert_called_once_with(
+            "prepare_playback",
+            "audioplayer",
+            {"volume": 50, "repeat": False, "shuffle": False},
+        )
+
+    @patch("backend.alarmclock.datetime")
+    def test__prewarm_audio_failed(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module.add_alarms([self.__make_alarm_params(12, 10)])
+        self.module.send_command = Mock(return_value=Mock(error=True))
+
+        # should not raise
+        self.module._prewarm_audio(datetime.datetime(2021, 12, 16, 12, 10))
+
+        self.module.send_command.assert_called()
+
+    @patch("backend.alarmclock.datetime")
+    def test__prewarm_audio_requests_outside_trigger_lock(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module.add_alarms([self.__make_alarm_params(12, 10)])
+        lock = self.module._Alarmclock__trigger_lock
+        acquired = []
+
+        def send_command(*args):
+            def acquire():
+                acquired.append(lock.acquire(False))
+                if acquired[-1]:
+                    lock.release()
+
+            thread = Thread(target=acquire)
+            thread.start()
+            thread.join()
+            return Mock(error=False)
+
+        self.module.send_command = Mock(side_effect=send_command)
+
+        self.module._prewarm_audio(datetime.datetime(2021, 12, 16, 12, 10))
+
+        self.assertEqual(acquired, [True])
+
+    def test_set_audio_prewarm_delay_holds_trigger_lock(self):
+        self.init()
+        lock = self.module._Alarmclock__trigger_lock
+        acquired = []
+
+        def arm_prewarm():
+            thread = Thread(target=lambda: acquired.append(lock.acquire(False)))
+            thread.start()
+            thread.join()
+
+        self.module._arm_prewarm = Mock(side_effect=arm_prewarm)
+
+        self.module.set_audio_prewarm_delay(60)
+
+        self.assertEqual(acquired, [False])
+
+    def test_set_audio_prewarm_delay(self):
+        self.init()
+
+        self.module.set_audio_prewarm_delay(60)
+
+        self.assertEqual(self.module.audio_prewarm_delay, 60)
+        self.assertEqual(self.module._get_config_field("audio_prewarm_delay"), 60)
+
+    def test_set_audio_prewarm_delay_invalid_parameters(self):
+        self.init()
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_audio_prewarm_delay(-1)
+        self.assertEqual(str(cm.exception), "Delay must be between 0 and 600 seconds")
+
+    @patch("backend.alarmclock.datetime")
+    def test__arm_read_ahead(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module.timer_wheel = Mock()
+        self.module.media_files = ["/tmp/alarm.mp3"]
+
+        self.module.add_alarms([self.__make_alarm_params(12, 10)])
+
+        self.module.timer_wheel.schedule.assert_called_once_with(
+            420.0,
+            self.module._on_read_ahead,
+            [datetime.datetime(2021, 12, 16, 12, 10)],
+        )
+
+    @patch("backend.alarmclock.datetime")
+    def test__arm_read_ahead_no_media_files(self, datetime_mock):
+        datetime_mock.now.return_value = datetime.datetime(2021, 12, 16, 12, 0)
+        self.init()
+        self.module.timer_wheel = Mock()
+
+        self.module.add_alarms([self.__make_alarm_params(12, 10)])
+
+        self.module.timer_wheel.schedule.assert_not_called()
+
+    @patch("backend.alarmclock.Task")
+    def test__on_read_ahead(self, task_mock):
+        self.init()
+        self.module.media_files = ["/tmp/alarm.mp3"]
+
+        self.module._on_read_ahead(datetime.datetime(2021, 12, 16, 12, 10))
+
+        task_mock.assert_called_with(
+            None,
+            self.module._Alarmclock__media_read_ahead.prefetch,
+            self.module.logger,
+            [["/tmp/alarm.mp3"]],
+        )
+        task_mock.return_value.start.assert_called()
+
+    def test__stop_alarm_evicts_read_ahead(self):
+        self.init()
+        self.module.add_alarms([self.__make_alarm_params(12, 10)])
+        alarm_uuid = list(self.module.get_module_devices().keys())[0]
+        read_ahead = Mock()
+        self.module._Alarmclock__media_read_ahead = read_ahead
+        self.module.stop_timers[alarm_uuid] = Mock()
+        self.module.stop_timers["other"] = Mock()
+
+        self.module._stop_alarm(alarm_uuid)
+        read_ahead.evict.assert_not_called()
+
+        del self.module.stop_timers["other"]
+        self.module._stop_alarm(alarm_uuid)
+        read_ahead.evict.assert_called_once()
+
+    def test_set_media_read_ahead(self):
+        self.init()
+
+        self.module.set_media_read_ahead(["/tmp/alarm.mp3"], 60, 8)
+
+        self.assertEqual(self.module.media_files, ["/tmp/alarm.mp3"])
+        self.assertEqual(self.module.media_read_ahead_delay, 60)
+        self.assertEqual(self.module._Alarmclock__media_read_ahead.budget, 8388608)
+        self.assertEqual(self.module._get_config_field("media_read_ahead_budget"), 8)
+
+    def test_set_media_read_ahead_invalid_parameters(self):
+        self.init()
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_media_read_ahead([1], 60, 8)
+        self.assertEqual(str(cm.exception), "Media files must be a list of file paths")
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_media_read_ahead([], 3601, 8)
+        self.assertEqual(str(cm.exception), "Delay must be between 0 and 3600 seconds")
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_media_read_ahead([], 60, 0)
+        self.assertEqual(str(cm.exception), "Budget must be between 1 and 512 MB")
+
+    def test_get_metrics(self):
+        self.init()
+        self.module._schedule_alarm()
+
+        metrics = self.module.get_metrics()
+
+        self.assertCountEqual(
+            metrics.keys(),
+            ["tick_delay", "trigger_delay", "schedule_duration", "rpc_duration"],
+        )
+        self.assertEqual(metrics["schedule_duration"]["count"], 1)
+        self.assertEqual(metrics["trigger_delay"]["count"], 0)
+
+    def test_on_event_records_tick_delay(self):
+        self.init()
+        self.module._trigger_alarm = Mock()
+        now = time.localtime()
+        event = {
+            "event": "parameters.time.now",
+            "params": {
+                "hour": now.tm_hour,
+                "minute": now.tm_min,
+                "weekday_literal": "mon",
+                "weekday": 0,
+            },
+        }
+
+        self.module.on_event(event)
+
+        tick_delay = self.module.get_metrics()["tick_delay"]
+        self.assertEqual(tick_delay["count"], 1)
+        self.assertLess(tick_delay["max"], 120000)
+
+    def test__trigger_alarm_records_trigger_delay(self):
+        self.init()
+        self.module.timer_wheel = Mock()
+        self.module.add_alarms([self.__make_alarm_params(12, 0)])
+
+        self.module._trigger_alarm({"hour": 12, "minute": 0}, "mon")
+
+        self.assertEqual(self.module.get_metrics()["trigger_delay"]["count"], 1)
+
+    @patch("backend.alarmclock.CleepModule.send_command")
+    def test_send_command_records_rpc_duration(self, send_command_mock):
+        self.init()
+
+        resp = self.module.send_command("is_today_non_working_day", "parameters")
+
+        self.assertEqual(resp, send_command_mock.return_value)
+        send_command_mock.assert_called_with(
+            self.module, "is_today_non_working_day", "parameters", None, 3.0
+        )
+        self.assertEqual(self.module.get_metrics()["rpc_duration"]["count"], 1)
+
+    def test__get_tick_minute_start(self):
+        now = datetime.datetime(2021, 12, 16, 0, 1, 30).timestamp()
+
+        # tick received in time
+        self.assertEqual(
+            Alarmclock._get_tick_minute_start({"hour": 0, "minute": 1}, now),
+            now - 30,
+        )
+        # tick of previous day received late
+        self.assertEqual(
+            Alarmclock._get_tick_minute_start({"hour": 23, "minute": 59}, now),
+            now - 150,
+        )
+
+
+class TestAlarmclockAlarmTriggeredEvent(unittest.TestCase):
+    def setUp(self):
+        logging.basicConfig(
+            level=logging.FATAL,
+            format="%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+        )
+        self.session = session.TestSession(self)
+        self.event = self.session.setup_event(AlarmclockAlarmTriggeredEvent)
+
+    def test_event_params(self):
+        self.assertEqual(
+            self.event.EVENT_PARAMS,
+            [
+                "hour",
+                "minute",
+                "timeout",
+                "volume",
+                "repeat",
+                "shuffle",
+            ],
+        )
+
+
+class TestAlarmclockAlarmScheduledEvent(unittest.TestCase):
+    def setUp(self):
+        logging.basicConfig(
+            level=LOG_LEVEL,
+            format="%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+        )
+        self.session = session.TestSession(self)
+        self.event = self.session.setup_event(AlarmclockAlarmScheduledEvent)
+
+    def test_event_params(self):
+        self.assertEqual(
+            self.event.EVENT_PARAMS,
+            [
+                "hour",
+                "minute",
+                "timeout",
+                "volume",
+                "count",
+                "repeat",
+                "shuffle",
+            ],
+        )
+
+
+class TestAlarmclockAlarmUnscheduledEvent(unittest.TestCase):
+    def setUp(self):
+        logging.basicConfig(
+            level=LOG_LEVEL,
+            format="%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+        )
+        self.session = session.TestSession(self)
+        self.event = self.session.setup_event(AlarmclockAlarmUnscheduledEvent)
+
+    def test_event_params(self):
+        self.assertEqual(
+            self.event.EVENT_PARAMS,
+            [
+                "hour",
+                "minute",
+                "timeout",
+                "volume",
+                "count",
+                "repeat",
+                "shuffle",
+            ],
+        )
+
+
+class TestAlarmclockAlarmStoppedEvent(unittest.TestCase):
+    def setUp(self):
+        logging.basicConfig(
+            level=LOG_LEVEL,
+            format="%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+        )
+        self.session = session.TestSession(self)
+        self.event = self.session.setup_event(AlarmclockAlarmStoppedEvent)
+
+    def test_event_params(self):
+        self.assertEqual(
+            self.event.EVENT_PARAMS,
+            [
+                "hour",
+                "minute",
+                "timeout",
+                "snoozed",
+                "volume",
+            ],
+        )
+
+
+class TestAlarmclockAlarmCreatedEvent(unittest.TestCase):
+    def setUp(self):
+        logging.basicConfig(
+            level=logging.FATAL,
+            format="%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+        )
+        self.session = session.TestSession(self)
+        self.event = self.session.setup_event(AlarmclockAlarmCreatedEvent)
+
+    def test_event_params(self):
+        self.assertEqual(
+            self.event.EVENT_PARAMS,
+            [
+                "uuid",
+                "type",
+                "name",
+                "time",
+                "days",
+                "nonWorkingDays",
+                "enabled",
+                "timeout",
+                "volume",
+                "repeat",
+                "shuffle",
+            ],
+        )
+
+
+class TestAlarmclockAlarmUpdatedEvent(unittest.TestCase):
+    def setUp(self):
+        logging.basicConfig(
+            level=logging.FATAL,
+            format="%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+        )
+        self.session = session.TestSession(self)
+        self.event = self.session.setup_event(AlarmclockAlarmUpdatedEvent)
+
+    def test_event_params(self):
+        self.assertEqual(
+            self.event.EVENT_PARAMS,
+            [
+                "uuid",
+                "type",
+                "name",
+                "time",
+                "days",
+                "nonWorkingDays",
+                "enabled",
+                "timeout",
+                "volume",
+                "repeat",
+                "shuffle",
+            ],
+        )
+
+
+class TestAlarmclockAlarmDeletedEvent(unittest.TestCase):
+    def setUp(self):
+        logging.basicConfig(
+            level=logging.FATAL,
+            format="%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+        )
+        self.session = session.TestSession(self)
+        self.event = self.session.setup_event(AlarmclockAlarmDeletedEvent)
+
+    def test_event_params(self):
+        self.assertEqual(self.event.EVENT_PARAMS, ["uuid"])
+
+
+class TestsAlarmScheduledToAlarmFormatter(unittest.TestCase):
+    def setUp(self):
+        logging.basicConfig(
+            level=LOG_LEVEL,
+            format=u"%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+        )
+        events_broker = Mock()
+        self.formatter = AlarmScheduledToAlarmFormatter(
+            {"events_broker": events_broker}
+        )
+
+    def test_fill_profile(self):
+        event_params = {
+            "hour": 12,
+            "minute": 30,
+            "timeout": 10,
+            "volume": 50,
+            "count": 2,
+            "repeat": False,
+            "shuffle": True,
+        }
+        profile_mock = Mock()
+        profile = self.formatter._fill_profile(event_params, profile_mock)
+
+        self.assertEqual(profile.hour, 12)
+        self.assertEqual(profile.minute, 30)
+        self.assertEqual(profile.timeout, 10)
+        self.assertEqual(profile.volume, 50)
+        self.assertEqual(profile.count, 2)
+        self.assertEqual(profile.repeat, False)
+        self.assertEqual(profile.shuffle, True)
+
+
+class TestsAlarmUnscheduledToAlarmFormatter(unittest.TestCase):
+    def setUp(self):
+        logging.basicConfig(
+            level=LOG_LEVEL,
+            format=u"%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+        )
+        events_broker = Mock()
+        self.formatter = AlarmUnscheduledToAlarmFormatter(
+            {"events_broker": events_broker}
+        )
+
+    def test_fill_profile(self):
+        event_params = {
+            "hour": 12,
+            "minute": 30,
+            "timeout": 10,
+            "volume": 50,
+            "count": 2,
+            "repeat": False,
+            "shuffle": True,
+        }
+        profile_mock = Mock()
+        profile = self.formatter._fill_profile(event_params, profile_mock)
+
+        self.assertEqual(profile.hour, 12)
+        self.assertEqual(profile.minute, 30)
+        self.assertEqual(profile.timeout, 10)
+        self.assertEqual(profile.volume, 50)
+        self.assertEqual(profile.count, 2)
+        self.assertEqual(profile.repeat, False)
+        self.assertEqual(profile.shuffle, True)
+
+
+class TestsAlarmTriggeredToAlarmFormatter(unittest.TestCase):
+    def setUp(self):
+        logging.basicConfig(
+            level=LOG_LEVEL,
+            format=u"%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+        )
+        events_broker = Mock()
+        self.formatter = AlarmTriggeredToAlarmFormatter(
+            {"events_broker": events_broker}
+        )
+
+    def test_fill_profile(self):
+        event_params = {
+            "hour": 12,
+            "minute": 30,
+            "timeout": 10,
+            "volume": 50,
+            "repeat": False,
+            "shuffle": True,
+        }
+        profile_mock = Mock()
+        profile = self.formatter._fill_profile(event_params, profile_mock)
+
+        self.assertEqual(profile.hour, 12)
+        self.assertEqual(profile.minute, 30)
+        self.assertEqual(profile.timeout, 10)
+        self.assertEqual(profile.volume, 50)
+        self.assertEqual(profile.repeat, False)
+        self.assertEqual(profile.shuffle, True)
+
+
+class TestsAlarmStoppedToAlarmFormatter(unittest.TestCase):
+    def setUp(self):
+        logging.basicConfig(
+            level=LOG_LEVEL,
+            format=u"%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+        )
+        events_broker = Mock()
+        self.formatter = AlarmStoppedToAlarmFormatter({"events_broker": events_broker})
+
+    def test_fill_profile_snoozed(self):
+        event_params = {
+            "hour": 12,
+            "minute": 30,
+            "timeout": 10,
+            "volume": 50,
+            "snoozed": True,
+        }
+        profile_mock = Mock()
+        profile = self.formatter._fill_profile(event_params, profile_mock)
+
+        self.assertEqual(profile.hour, 12)
+        self.assertEqual(profile.minute, 30)
+        self.assertEqual(profile.timeout, 10)
+        self.assertEqual(profile.volume, 50)
+        self.assertEqual(profile.status, profile_mock.STATUS_SNOOZED)
+
+    def test_fill_profile_stopped(self):
+        event_params = {
+            "hour": 12,
+            "minute": 30,
+            "timeout": 10,
+            "volume": 50,
+            "snoozed": False,
+        }
+        profile_mock = Mock()
+        profile = self.formatter._fill_profile(event_params, profile_mock)
+
+        self.assertEqual(profile.hour, 12)
+        self.assertEqual(profile.minute, 30)
+        self.assertEqual(profile.timeout, 10)
+        self.assertEqual(profile.volume, 50)
+        self.assertEqual(profile.status, profile_mock.STATUS_STOPPED)
+
+
+class TestsAlarmTriggerIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = AlarmTriggerIndex()
+        self.alarm = {
+            "enabled": True,
+            "time": {"hour": 7, "minute": 30},
+            "days": {
+                "mon": True,
+                "tue": False,
+                "wed": True,
+                "thu": False,
+                "fri": False,
+                "sat": False,
+                "sun": False,
+            },
+        }
+
+    def test_add(self):
+        self.index.add("123", Alarm.from_device(self.alarm))
+
+        self.assertEqual(self.index.get("mon", 7, 30), ["123"])
+        self.assertEqual(self.index.get("wed", 7, 30), ["123"])
+        self.assertEqual(self.index.get("tue", 7, 30), [])
+        self.assertEqual(self.index.get("mon", 7, 31), [])
+        self.assertEqual(len(self.index), 1)
+
+    def test_add_disabled_alarm(self):
+        self.alarm["enabled"] = False
+
+        self.index.add("123", Alarm.from_device(self.alarm))
+
+        self.assertEqual(self.index.get("mon", 7, 30), [])
+        self.assertFalse("123" in self.index)
+
+    def test_add_reindex_alarm(self):
+        self.index.add("123", Alarm.from_device(self.alarm))
+        self.alarm["time"] = {"hour": 8, "minute": 0}
+
+        self.index.add("123", Alarm.from_device(self.alarm))
+
+        self.assertEqual(self.index.get("mon", 7, 30), [])
+        self.assertEqual(self.index.get("mon", 8, 0), ["123"])
+
+    def test_remove(self):
+        self.index.add("123", Alarm.from_device(self.alarm))
+        self.index.add("456", Alarm.from_device(self.alarm))
+
+        self.index.remove("123")
+        self.index.remove("789")
+
+        self.assertEqual(self.index.get("mon", 7, 30), ["456"])
+        self.assertEqual(len(self.index), 1)
+
+    def test_build(self):
+        self.index.add("456", Alarm.from_device(self.alarm))
+
+        self.index.build({"123": Alarm.from_device(self.alarm)})
+
+        self.assertEqual(self.index.get("mon", 7, 30), ["123"])
+
+
+class TestsAlarmScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = AlarmScheduler()
+        self.alarm = {
+            "enabled": True,
+            "nonWorkingDays": False,
+            "time": {"hour": 7, "minute": 30},
+            "days": {
+                "mon": True,
+                "tue": False,
+                "wed": False,
+                "thu": True,
+                "fri": False,
+                "sat": False,
+                "sun": False,
+            },
+        }
+
+    def test_compute_next_fire_today(self):
+        now = datetime.datetime(2021, 12, 16, 6, 0)
+
+        fire = AlarmScheduler.compute_next_fire(
+            Alarm.from_device(self.alarm), now, lambda d: False
+        )
+
+        self.assertEqual(fire, datetime.datetime(2021, 12, 16, 7, 30))
+
+    def test_compute_next_fire_next_days(self):
+        now = datetime.datetime(2021, 12, 16, 7, 30)
+
+        fire = AlarmScheduler.compute_next_fire(
+            Alarm.from_device(self.alarm), now, lambda d: False
+        )
+
+        self.assertEqual(fire, datetime.datetime(2021, 12, 20, 7, 30))
+
+    def test_compute_next_fire_skip_non_working_day(self):
+        now = datetime.datetime(2021, 12, 16, 6, 0)
+        non_working_day = datetime.date(2021, 12, 16)
+
+        fire = AlarmScheduler.compute_next_fire(
+            Alarm.from_device(self.alarm), now, lambda d: d == non_working_day
+        )
+
+        self.assertEqual(fire, datetime.datetime(2021, 12, 20, 7, 30))
+
+    def test_compute_next_fire_disabled(self):
+        self.alarm["enabled"] = False
+        now = datetime.datetime(2021, 12, 16, 6, 0)
+
+        self.assertIsNone(
+            AlarmScheduler.compute_next_fire(
+                Alarm.from_device(self.alarm), now, lambda d: False
+            )
+        )
+
+    def test_get_next(self):
+        base = datetime.datetime(2021, 12, 16, 6, 0)
+        for index in range(10):
+            self.scheduler.update(
+                str(index), base + datetime.timedelta(minutes=10 - index)
+            )
+
+        nexts = self.scheduler.get_next(3)
+
+        self.assertEqual([uuid for _, uuid in nexts], ["9", "8", "7"])
+
+    def test_update_and_remove(self):
+        base = datetime.datetime(2021, 12, 16, 6, 0)
+        self.scheduler.update("1", base)
+        self.scheduler.update("2", base + datetime.timedelta(minutes=1))
+
+        self.scheduler.update("1", base + datetime.timedelta(minutes=2))
+        self.scheduler.remove("2")
+
+        self.assertEqual(
+            self.scheduler.get_next(5),
+            [(base + datetime.timedelta(minutes=2), "1")],
+        )
+        self.assertEqual(len(self.scheduler), 1)
+        self.assertIsNone(self.scheduler.get_fire("2"))
+
+    def test_get_due(self):
+        base = datetime.datetime(2021, 12, 16, 6, 0)
+        for index in range(10):
+            self.scheduler.update(str(index), base + datetime.timedelta(minutes=index))
+        self.scheduler.remove("1")
+
+        due = self.scheduler.get_due(base + datetime.timedelta(minutes=3))
+
+        self.assertEqual([uuid for _, uuid in due], ["0", "2", "3"])
+        self.assertEqual(
+            self.scheduler.get_due(base - datetime.timedelta(minutes=1)), []
+        )
+
+
+class TestsTimerWheel(unittest.TestCase):
+    def setUp(self):
+        self.wheel = TimerWheel(tick=0.01, slots=8)
+
+    def tearDown(self):
+        self.wheel.stop()
+
+    def __wait(self, condition, timeout=2.0):
+        end = time.monotonic() + timeout
+        while not condition() and time.monotonic() < end:
+            time.sleep(0.01)
+
+    def test_schedule(self):
+        callback = Mock()
+
+        self.wheel.schedule(0.05, callback, ["uuid"])
+        self.__wait(lambda: callback.called)
+
+        callback.assert_called_once_with("uuid")
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_schedule_more_than_one_round(self):
+        callback = Mock()
+
+        self.wheel.schedule(0.2, callback)
+        time.sleep(0.1)
+        self.assertFalse(callback.called)
+        self.__wait(lambda: callback.called)
+
+        callback.assert_called_once_with()
+
+    def test_cancel(self):
+        callback = Mock()
+
+        timer = self.wheel.schedule(0.05, callback)
+        timer.cancel()
+        time.sleep(0.15)
+
+        self.assertFalse(callback.called)
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_callback_exception(self):
+        callback = Mock()
+        self.wheel.schedule(0.02, Mock(side_effect=Exception("Test")))
+
+        self.wheel.schedule(0.05, callback)
+        self.__wait(lambda: callback.called)
+
+        callback.assert_called_once_with()
+
+    def test_stop(self):
+        callback = Mock()
+        self.wheel.schedule(0.05, callback)
+
+        self.wheel.stop()
+        time.sleep(0.1)
+
+        self.assertFalse(self.wheel.is_running())
+        self.assertFalse(callback.called)
+
+
+class TestsNonWorkingDaysCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = NonWorkingDaysCache(horizon=3, ttl=100, refresh_ahead=0.5)
+        self.today = datetime.date(2021, 12, 15)
+
+    def test_get(self):
+        self.cache.set(self.today, True)
+
+        self.assertTrue(self.cache.get(self.today))
+        self.assertIsNone(self.cache.get(datetime.date(2021, 12, 16)))
+
+    def test_needs_refresh_empty(self):
+        self.assertTrue(self.cache.needs_refresh(self.today))
+
+    def test_needs_refresh_complete(self):
+        self.cache.update(
+            {day: False for day in self.cache.get_horizon_days(self.today)}
+        )
+
+        self.assertFalse(self.cache.needs_refresh(self.today))
+        self.assertTrue(self.cache.needs_refresh(datetime.date(2021, 12, 16)))
+
+    @patch("backend.nonworkingdayscache.time")
+    def test_needs_refresh_ahead(self, time_mock):
+        time_mock.time.return_value = 1000
+        self.cache.update(
+            {day: False for day in self.cache.get_horizon_days(self.today)}
+        )
+
+        time_mock.time.return_value = 1049
+        self.assertFalse(self.cache.needs_refresh(self.today))
+        time_mock.time.return_value = 1050
+        self.assertTrue(self.cache.needs_refresh(self.today))
+
+    def test_dump_and_load(self):
+        self.cache.update({self.today: True}, 1000)
+        other_cache = NonWorkingDaysCache()
+
+        loaded = other_cache.load(self.cache.dump())
+
+        self.assertTrue(loaded)
+        self.assertTrue(other_cache.get(self.today))
+        self.assertEqual(other_cache.dump()["updated_at"], 1000)
+
+    def test_load_invalid_data(self):
+        self.assertFalse(self.cache.load(None))
+        self.assertFalse(self.cache.load({"version": 0, "days": {}}))
+        self.assertFalse(
+            self.cache.load({"version": NonWorkingDaysCache.VERSION, "days": {"a": 1}})
+        )
+
+    def test_purge(self):
+        self.cache.update(
+            {day: False for day in self.cache.get_horizon_days(self.today)}
+        )
+
+        self.cache.purge(datetime.date(2021, 12, 16))
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get(self.today))
+
+
+class TestsAlarmPayloads(unittest.TestCase):
+    def setUp(self):
+        self.payloads = AlarmPayloads()
+        self.alarm = {
+            "time": {"hour": 7, "minute": 30},
+            "timeout": 10,
+            "volume": 40,
+            "repeat": True,
+        }
+
+    def test_triggered(self):
+        self.assertEqual(
+            self.payloads.triggered("123", self.alarm),
+            {
+                "hour": 7,
+                "minute": 30,
+                "timeout": 10,
+                "volume": 40,
+                "repeat": True,
+                "shuffle": False,
+            },
+        )
+
+    def test_scheduled(self):
+        self.assertEqual(
+            self.payloads.scheduled("123", self.alarm, 3),
+            {
+                "hour": 7,
+                "minute": 30,
+                "timeout": 10,
+                "volume": 40,
+                "repeat": True,
+                "shuffle": False,
+                "count": 3,
+            },
+        )
+
+    def test_stopped(self):
+        self.assertEqual(
+            self.payloads.stopped("123", self.alarm, True),
+            {
+                "hour": 7,
+                "minute": 30,
+                "timeout": 10,
+                "volume": 40,
+                "snoozed": True,
+            },
+        )
+
+    def test_default_values(self):
+        self.assertEqual(
+            self.payloads.triggered("123", {}),
+            {
+                "hour": 12,
+                "minute": 0,
+                "timeout": 500,
+                "volume": 50,
+                "repeat": False,
+                "shuffle": False,
+            },
+        )
+
+    def test_payload_is_cached(self):
+        payload = self.payloads.get("123", self.alarm)
+        self.alarm["volume"] = 80
+
+        self.assertIs(self.payloads.get("123", self.alarm), payload)
+        self.assertIs(self.payloads.triggered("123", self.alarm), payload[0])
+        self.assertIs(self.payloads.stopped("123", self.alarm, False), payload[1])
+        self.assertIs(self.payloads.stopped("123", self.alarm, True), payload[2])
+
+    def test_invalidate(self):
+        self.payloads.get("123", self.alarm)
+        self.alarm["volume"] = 80
+
+        self.payloads.invalidate("123")
+
+        self.assertEqual(self.payloads.triggered("123", self.alarm)["volume"], 80)
+
+
+class TestsAlarm(unittest.TestCase):
+    def setUp(self):
+        self.device = {
+            "uuid": "123",
+            "type": "alarmclock",
+            "name": "Alarm",
+            "time": {"hour": 7, "minute": 30},
+            "days": {
+                "mon": True,
+                "tue": False,
+                "wed": False,
+                "thu": False,
+                "fri": False,
+                "sat": False,
+                "sun": True,
+            },
+            "nonWorkingDays": True,
+            "enabled": True,
+            "timeout": 10,
+            "volume": 40,
+            "repeat": True,
+            "shuffle": False,
+        }
+
+    def test_from_device(self):
+        alarm = Alarm.from_device(self.device)
+
+        self.assertEqual(alarm.uuid, "123")
+        self.assertEqual(alarm.hour, 7)
+        self.assertEqual(alarm.minute, 30)
+        self.assertEqual(alarm.days, 0b1000001)
+        self.assertTrue(alarm.non_working_days)
+        self.assertEqual(alarm.timeout, 10)
+        self.assertEqual(alarm.volume, 40)
+
+    def test_to_device(self):
+        self.assertEqual(Alarm.from_device(self.device).to_device(), self.device)
+
+    def test_days_mask(self):
+        self.assertEqual(Alarm.days_to_mask({"tue": True, "wed": False}), 0b10)
+        self.assertEqual(Alarm.days_to_mask({}), 0)
+        self.assertEqual(Alarm.mask_to_days(0b10)["tue"], True)
+        self.assertEqual(Alarm.mask_to_days(0b10)["mon"], False)
+
+    def test_slots(self):
+        alarm = Alarm.from_device(self.device)
+
+        with self.assertRaises(AttributeError):
+            alarm.other = 1
+
+
+class TestsLatencyHistogram(unittest.TestCase):
+    def setUp(self):
+        self.histogram = LatencyHistogram(buckets=(10, 100))
+
+    def test_record(self):
+        for value in (5, 10, 50, 500):
+            self.histogram.record(value)
+
+        content = self.histogram.dump()
+
+        self.assertEqual(len(self.histogram), 4)
+        self.assertEqual(
+            content["buckets"],
+            [
+                {"le": 10, "count": 2},
+                {"le": 100, "count": 1},
+                {"le": None, "count": 1},
+            ],
+        )
+        self.assertEqual(content["min"], 5)
+        self.assertEqual(content["max"], 500)
+        self.assertEqual(content["sum"], 565)
+        self.assertEqual(content["mean"], 141.25)
+
+    def test_dump_empty(self):
+        content = self.histogram.dump()
+
+        self.assertEqual(content["count"], 0)
+        self.assertIsNone(content["mean"])
+        self.assertIsNone(content["min"])
+
+    def test_clear(self):
+        self.histogram.record(5)
+
+        self.histogram.clear()
+
+        self.assertEqual(len(self.histogram), 0)
+        self.assertEqual(self.histogram.dump()["buckets"][0]["count"], 0)
+
+    def test_default_buckets(self):
+        histogram = LatencyHistogram()
+
+        self.assertEqual(histogram.buckets, LatencyHistogram.BUCKETS)
+
+
+class TestsScheduleWindow(unittest.TestCase):
+    def setUp(self):
+        self.today = datetime.date(2021, 12, 16)
+        self.window = ScheduleWindow(days=2)
+        self.window.advance(self.today)
+
+    def test_set(self):
+        self.assertTrue(self.window.set("1", self.today))
+        self.assertTrue(self.window.set("2", self.today + datetime.timedelta(days=1)))
+        self.assertFalse(self.window.set("3", self.today + datetime.timedelta(days=2)))
+        self.assertFalse(self.window.set("4", None))
 
-        self.assertEqual(self.session.event_call_count("alarmclock.alarm.scheduled"), 0)
+        self.assertEqual(len(self.window), 2)
+        self.assertIn("1", self.window)
+        self.assertNotIn("3", self.window)
 
+    def test_set_moves_occurrence(self):
+        self.window.set("1", self.today)
 
-class TestAlarmclockAlarmTriggeredEvent(unittest.TestCase):
-    def setUp(self):
-        logging.basicConfig(
-            level=logging.FATAL,
-            format="%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
-        )
-        self.session = session.TestSession(self)
-        self.event = self.session.setup_event(AlarmclockAlarmTriggeredEvent)
+        self.window.set("1", self.today + datetime.timedelta(days=1))
+
+        self.assertEqual(len(self.window), 1)
+        # occurrence is not expired with its previous day
+        self.window.advance(self.today + datetime.timedelta(days=1))
+        self.assertIn("1", self.window)
+
+    def test_remove(self):
+        self.window.set("1", self.today)
+
+        self.assertTrue(self.window.remove("1"))
+        self.assertFalse(self.window.remove("1"))
+        self.assertEqual(len(self.window), 0)
+
+    def test_advance(self):
+        self.window.set("1", self.today)
+        self.window.set("2", self.today + datetime.timedelta(days=1))
+
+        expired = self.window.advance(self.today + datetime.timedelta(days=1))
+
+        self.assertEqual(expired, ["1"])
+        self.assertEqual(len(self.window), 1)
+        self.assertTrue(self.window.set("3", self.today + datetime.timedelta(days=2)))
+
+    def test_advance_far(self):
+        self.window.set("1", self.today)
+        self.window.set("2", self.today + datetime.timedelta(days=1))
+
+        expired = self.window.advance(self.today + datetime.timedelta(days=30))
+
+        self.assertCountEqual(expired, ["1", "2"])
+        self.assertEqual(len(self.window), 0)
+
+    def test_advance_backward(self):
+        self.window.set("1", self.today)
 
-    def test_event_params(self):
         self.assertEqual(
-            self.event.EVENT_PARAMS,
-            [
-                "hour",
-                "minute",
-                "timeout",
-                "volume",
-                "repeat",
-                "shuffle",
-            ],
+            self.window.advance(self.today - datetime.timedelta(days=1)), []
         )
+        self.assertEqual(len(self.window), 1)
 
 
-class TestAlarmclockAlarmScheduledEvent(unittest.TestCase):
+class TestsMediaReadAhead(unittest.TestCase):
     def setUp(self):
-        logging.basicConfig(
-            level=LOG_LEVEL,
-            format="%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
-        )
-        self.session = session.TestSession(self)
-        self.event = self.session.setup_event(AlarmclockAlarmScheduledEvent)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = []
+        for index, size in enumerate((1000, 300000)):
+            path = os.path.join(self.tmpdir.name, "media%d.mp3" % index)
+            with open(path, "wb") as fd:
+                fd.write(b"x" * size)
+            self.files.append(path)
+        self.read_ahead = MediaReadAhead(budget=1048576)
 
-    def test_event_params(self):
-        self.assertEqual(
-            self.event.EVENT_PARAMS,
-            [
-                "hour",
-                "minute",
-                "timeout",
-                "volume",
-                "count",
-                "repeat",
-                "shuffle",
-            ],
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_prefetch(self):
+        used = self.read_ahead.prefetch(self.files)
+
+        self.assertEqual(used, 301000)
+        self.assertEqual(len(self.read_ahead), 2)
+        self.assertEqual(self.read_ahead.get_used(), 301000)
+
+    def test_prefetch_already_read(self):
+        self.read_ahead.prefetch(self.files[:1])
+
+        used = self.read_ahead.prefetch(self.files)
+
+        self.assertEqual(used, 301000)
+        self.assertEqual(len(self.read_ahead), 2)
+
+    def test_prefetch_budget(self):
+        self.read_ahead.budget = 2000
+
+        used = self.read_ahead.prefetch(self.files + [self.files[0] + ".bak"])
+
+        self.assertEqual(used, 2000)
+        self.assertEqual(len(self.read_ahead), 2)
+
+    def test_prefetch_missing_file(self):
+        used = self.read_ahead.prefetch(
+            [os.path.join(self.tmpdir.name, "missing.mp3"), self.files[0]]
         )
 
+        self.assertEqual(used, 1000)
+        self.assertEqual(len(self.read_ahead), 1)
 
-class TestAlarmclockAlarmUnscheduledEvent(unittest.TestCase):
+    def test_evict(self):
+        self.read_ahead.prefetch(self.files)
+
+        self.read_ahead.evict()
+
+        self.assertEqual(len(self.read_ahead), 0)
+        self.assertEqual(self.read_ahead.get_used(), 0)
+
+
+class TestsAlarmJournal(unittest.TestCase):
     def setUp(self):
-        logging.basicConfig(
-            level=LOG_LEVEL,
-            format="%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filesystem = Mock(wraps=LocalFilesystem())
+        self.journal = AlarmJournal(
+            os.path.join(self.tmpdir.name, "alarms.journal"), self.filesystem
         )
-        self.session = session.TestSession(self)
-        self.event = self.session.setup_event(AlarmclockAlarmUnscheduledEvent)
 
-    def test_event_params(self):
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_append_replay(self):
+        self.journal.append([{"op": "add", "uuid": "1", "data": {"enabled": True}}])
+        self.journal.append([{"op": "delete", "uuid": "1", "data": None}])
+
         self.assertEqual(
-            self.event.EVENT_PARAMS,
+            self.journal.replay(),
             [
-                "hour",
-                "minute",
-                "timeout",
-                "volume",
-                "count",
-                "repeat",
-                "shuffle",
+                {"op": "add", "uuid": "1", "data": {"enabled": True}},
+                {"op": "delete", "uuid": "1", "data": None},
             ],
         )
+        self.assertGreater(self.journal.size(), 0)
 
+    def test_replay_no_journal(self):
+        self.assertEqual(self.journal.replay(), [])
+        self.assertEqual(self.journal.size(), 0)
 
-class TestAlarmclockAlarmStoppedEvent(unittest.TestCase):
-    def setUp(self):
-        logging.basicConfig(
-            level=LOG_LEVEL,
-            format="%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+    def test_replay_truncated_record(self):
+        self.journal.append([{"op": "add", "uuid": "1", "data": {"enabled": True}}])
+        with open(self.journal.path, "a") as fd:
+            fd.write('{"op": "upd')
+
+        self.assertEqual(len(self.journal.replay()), 1)
+
+    def test_rotate(self):
+        self.journal.append([{"op": "add", "uuid": "1", "data": {}}])
+
+        self.assertTrue(self.journal.rotate())
+        self.journal.append([{"op": "add", "uuid": "2", "data": {}}])
+
+        self.assertEqual([r["uuid"] for r in self.journal.replay()], ["1", "2"])
+        self.journal.discard_rotated()
+        self.assertEqual([r["uuid"] for r in self.journal.replay()], ["2"])
+
+    def test_rotate_after_failed_compaction(self):
+        self.journal.append([{"op": "add", "uuid": "1", "data": {}}])
+        self.journal.rotate()
+        self.journal.append([{"op": "add", "uuid": "2", "data": {}}])
+
+        self.assertTrue(self.journal.rotate())
+
+        self.assertFalse(os.path.exists(self.journal.path))
+        self.assertEqual([r["uuid"] for r in self.journal.replay()], ["1", "2"])
+
+    def test_rotate_empty(self):
+        self.assertFalse(self.journal.rotate())
+
+    def test_writes_use_cleep_filesystem(self):
+        self.journal.path = os.path.join(self.tmpdir.name, "dir", "alarms.journal")
+        self.journal.rotated_path = self.journal.path + ".old"
+
+        self.journal.append([{"op": "add", "uuid": "1", "data": {}}])
+        self.journal.rotate()
+        self.journal.discard_rotated()
+
+        self.filesystem.mkdirs.assert_called_with(os.path.dirname(self.journal.path))
+        self.filesystem.open.assert_called_with(
+            self.journal.path, "a", encoding="utf-8"
         )
-        self.session = session.TestSession(self)
-        self.event = self.session.setup_event(AlarmclockAlarmStoppedEvent)
+        self.assertEqual(self.filesystem.close.call_count, 1)
+        self.filesystem.move.assert_called_with(
+            self.journal.path, self.journal.rotated_path
+        )
+        self.filesystem.rm.assert_called_with(self.journal.rotated_path)
 
-    def test_event_params(self):
-        self.assertEqual(
-            self.event.EVENT_PARAMS,
+    def test_rotate_failed(self):
+        self.journal.append([{"op": "add", "uuid": "1", "data": {}}])
+        self.filesystem.move = Mock(return_value=False)
+
+        with self.assertRaises(OSError):
+            self.journal.rotate()
+
+    def test_apply(self):
+        devices = {"1": {"enabled": True}}
+
+        AlarmJournal.apply(
+            devices,
             [
-                "hour",
-                "minute",
-                "timeout",
-                "snoozed",
-                "volume",
+                {"op": "add", "uuid": "2", "data": {"enabled": True}},
+                {"op": "update", "uuid": "1", "data": {"enabled": False}},
+                {"op": "update", "uuid": "3", "data": {"enabled": False}},
+                {"op": "delete", "uuid": "2", "data": None},
             ],
         )
 
+        self.assertEqual(devices, {"1": {"enabled": False}})
 
-class TestsAlarmScheduledToAlarmFormatter(unittest.TestCase):
+
+class TestsCoalescingWriter(unittest.TestCase):
     def setUp(self):
-        logging.basicConfig(
-            level=LOG_LEVEL,
-            format=u"%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
-        )
-        events_broker = Mock()
-        self.formatter = AlarmScheduledToAlarmFormatter(
-            {"events_broker": events_broker}
-        )
+        self.write = Mock()
+        self.writer = CoalescingWriter(self.write, delay=0.05, max_delay=1.0)
 
-    def test_fill_profile(self):
-        event_params = {
-            "hour": 12,
-            "minute": 30,
-            "timeout": 10,
-            "volume": 50,
-            "count": 2,
-            "repeat": False,
-            "shuffle": True,
-        }
-        profile_mock = Mock()
-        profile = self.formatter._fill_profile(event_params, profile_mock)
+    def tearDown(self):
+        self.writer.stop()
 
-        self.assertEqual(profile.hour, 12)
-        self.assertEqual(profile.minute, 30)
-        self.assertEqual(profile.timeout, 10)
-        self.assertEqual(profile.volume, 50)
-        self.assertEqual(profile.count, 2)
-        self.assertEqual(profile.repeat, False)
-        self.assertEqual(profile.shuffle, True)
+    def test_add(self):
+        self.writer.add([1])
+        self.writer.add([2, 3])
 
+        self.assertEqual(len(self.writer), 3)
+        self.write.assert_not_called()
+        time.sleep(0.3)
+        self.write.assert_called_once_with([1, 2, 3])
+        self.assertEqual(len(self.writer), 0)
 
-class TestsAlarmUnscheduledToAlarmFormatter(unittest.TestCase):
+    def test_max_delay(self):
+        self.writer.max_delay = 0.1
+
+        for index in range(10):
+            self.writer.add([index])
+            time.sleep(0.03)
+
+        self.assertGreater(self.write.call_count, 1)
+
+    def test_flush(self):
+        self.writer.delay = 3600
+        self.writer.add([1])
+
+        self.assertTrue(self.writer.flush())
+
+        self.write.assert_called_once_with([1])
+        self.assertTrue(self.writer.flush())
+        self.assertEqual(self.write.call_count, 1)
+
+    def test_flush_failed(self):
+        self.writer.delay = 3600
+        self.write.side_effect = [OSError(), None]
+        self.writer.add([1])
+
+        self.assertFalse(self.writer.flush())
+        self.writer.add([2])
+        self.assertTrue(self.writer.flush())
+
+        self.write.assert_called_with([1, 2])
+
+    def test_stop(self):
+        self.writer.delay = 3600
+        self.writer.add([1])
+
+        self.assertTrue(self.writer.stop())
+
+        self.write.assert_called_once_with([1])
+
+    def test_touch(self):
+        self.writer.delay = 3600
+        self.write.side_effect = [OSError(), None]
+        for _ in range(10):
+            self.writer.touch()
+
+        self.assertEqual(len(self.writer), 0)
+        self.assertFalse(self.writer.flush())
+        self.writer.touch()
+        self.assertTrue(self.writer.flush())
+
+        self.write.assert_called_with([])
+        self.assertEqual(self.write.call_count, 2)
+        self.assertTrue(self.writer.flush())
+        self.assertEqual(self.write.call_count, 2)
+
+
+class TestsScheduleSnapshot(unittest.TestCase):
     def setUp(self):
-        logging.basicConfig(
-            level=LOG_LEVEL,
-            format=u"%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
-        )
-        events_broker = Mock()
-        self.formatter = AlarmUnscheduledToAlarmFormatter(
-            {"events_broker": events_broker}
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filesystem = Mock(wraps=LocalFilesystem())
+        self.snapshot = ScheduleSnapshot(
+            os.path.join(self.tmpdir.name, "schedule.snapshot"), self.filesystem
         )
+        self.uuid1 = "0a1b2c3d-0000-4000-8000-000000000001"
+        self.uuid2 = "0a1b2c3d-0000-4000-8000-000000000002"
 
-    def test_fill_profile(self):
-        event_params = {
-            "hour": 12,
-            "minute": 30,
-            "timeout": 10,
-            "volume": 50,
-            "count": 2,
-            "repeat": False,
-            "shuffle": True,
-        }
-        profile_mock = Mock()
-        profile = self.formatter._fill_profile(event_params, profile_mock)
+    def tearDown(self):
+        self.tmpdir.cleanup()
 
-        self.assertEqual(profile.hour, 12)
-        self.assertEqual(profile.minute, 30)
-        self.assertEqual(profile.timeout, 10)
-        self.assertEqual(profile.volume, 50)
-        self.assertEqual(profile.count, 2)
-        self.assertEqual(profile.repeat, False)
-        self.assertEqual(profile.shuffle, True)
+    def test_save_load(self):
+        fire = datetime.datetime(2021, 12, 16, 12, 10)
 
+        self.snapshot.save(
+            1234, {self.uuid1: fire, self.uuid2: None}, {self.uuid1}, {self.uuid1: 5.5}
+        )
+        snapshot = self.snapshot.load()
 
-class TestsAlarmTriggeredToAlarmFormatter(unittest.TestCase):
-    def setUp(self):
-        logging.basicConfig(
-            level=LOG_LEVEL,
-            format=u"%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
+        self.assertEqual(snapshot["hash"], 1234)
+        self.assertEqual(snapshot["fires"], {self.uuid1: fire, self.uuid2: None})
+        self.assertEqual(snapshot["scheduled"], {self.uuid1})
+        self.assertEqual(snapshot["stops"], {self.uuid1: 5.5})
+        self.assertEqual(
+            os.path.getsize(self.snapshot.path),
+            ScheduleSnapshot.HEADER.size
+            + 2 * ScheduleSnapshot.ALARM.size
+            + ScheduleSnapshot.STOP.size,
         )
-        events_broker = Mock()
-        self.formatter = AlarmTriggeredToAlarmFormatter(
-            {"events_broker": events_broker}
+        self.filesystem.open.assert_called_with(self.snapshot.path + ".tmp", "wb")
+        self.filesystem.move.assert_called_with(
+            self.snapshot.path + ".tmp", self.snapshot.path
         )
 
-    def test_fill_profile(self):
-        event_params = {
-            "hour": 12,
-            "minute": 30,
-            "timeout": 10,
-            "volume": 50,
-            "repeat": False,
-            "shuffle": True,
-        }
-        profile_mock = Mock()
-        profile = self.formatter._fill_profile(event_params, profile_mock)
+    def test_save_failed(self):
+        self.filesystem.move = Mock(return_value=False)
 
-        self.assertEqual(profile.hour, 12)
-        self.assertEqual(profile.minute, 30)
-        self.assertEqual(profile.timeout, 10)
-        self.assertEqual(profile.volume, 50)
-        self.assertEqual(profile.repeat, False)
-        self.assertEqual(profile.shuffle, True)
+        with self.assertRaises(OSError):
+            self.snapshot.save(1234, {self.uuid1: None}, set(), {})
 
+    def test_load_no_snapshot(self):
+        self.assertIsNone(self.snapshot.load())
 
-class TestsAlarmStoppedToAlarmFormatter(unittest.TestCase):
-    def setUp(self):
-        logging.basicConfig(
-            level=LOG_LEVEL,
-            format=u"%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s",
-        )
-        events_broker = Mock()
-        self.formatter = AlarmStoppedToAlarmFormatter({"events_broker": events_broker})
+    def test_load_invalid_snapshot(self):
+        self.snapshot.save(1234, {self.uuid1: None}, set(), {})
+        with open(self.snapshot.path, "r+b") as fd:
+            fd.truncate(ScheduleSnapshot.HEADER.size + 4)
 
-    def test_fill_profile_snoozed(self):
-        event_params = {
-            "hour": 12,
-            "minute": 30,
-            "timeout": 10,
-            "volume": 50,
-            "snoozed": True,
-        }
-        profile_mock = Mock()
-        profile = self.formatter._fill_profile(event_params, profile_mock)
+        self.assertIsNone(self.snapshot.load())
 
-        self.assertEqual(profile.hour, 12)
-        self.assertEqual(profile.minute, 30)
-        self.assertEqual(profile.timeout, 10)
-        self.assertEqual(profile.volume, 50)
-        self.assertEqual(profile.status, profile_mock.STATUS_SNOOZED)
+    def test_load_unsupported_version(self):
+        with open(self.snapshot.path, "wb") as fd:
+            fd.write(ScheduleSnapshot.HEADER.pack(b"ACSS", 99, 0, 0, 0))
 
-    def test_fill_profile_stopped(self):
-        event_params = {
-            "hour": 12,
-            "minute": 30,
-            "timeout": 10,
-            "volume": 50,
-            "snoozed": False,
-        }
-        profile_mock = Mock()
-        profile = self.formatter._fill_profile(event_params, profile_mock)
+        self.assertIsNone(self.snapshot.load())
 
-        self.assertEqual(profile.hour, 12)
-        self.assertEqual(profile.minute, 30)
-        self.assertEqual(profile.timeout, 10)
-        self.assertEqual(profile.volume, 50)
-        self.assertEqual(profile.status, profile_mock.STATUS_STOPPED)
+    def test_compute_hash(self):
+        self.assertEqual(
+            ScheduleSnapshot.compute_hash({"a": 1, "b": [1, 2]}),
+            ScheduleSnapshot.compute_hash({"b": [1, 2], "a": 1}),
+        )
+        self.assertNotEqual(
+            ScheduleSnapshot.compute_hash({"a": 1}),
+            ScheduleSnapshot.compute_hash({"a": 2}),
+        )
+
+
+class TestsClock(unittest.TestCase):
+    @patch("backend.clock.time")
+    def setUp(self, time_mock):
+        time_mock.time.return_value = 1639652400.0
+        time_mock.monotonic.return_value = 1000.0
+        self.clock = Clock(tolerance=5.0)
+
+    @patch("backend.clock.time")
+    def test_deadline(self, time_mock):
+        time_mock.monotonic.return_value = 1000.0
+        deadline = self.clock.deadline(60)
+
+        time_mock.monotonic.return_value = 1050.0
+        self.assertEqual(self.clock.remaining(deadline), 10.0)
+        time_mock.monotonic.return_value = 1070.0
+        self.assertEqual(self.clock.remaining(deadline), 0.0)
+
+    @patch("backend.clock.time")
+    def test_to_wall_from_wall(self, time_mock):
+        time_mock.time.return_value = 1639652400.0
+        time_mock.monotonic.return_value = 1000.0
+
+        self.assertEqual(self.clock.to_wall(1060.0), 1639652460.0)
+        self.assertEqual(self.clock.from_wall(1639652460.0), 1060.0)
+
+    @patch("backend.clock.time")
+    def test_check_jump(self, time_mock):
+        time_mock.time.return_value = 1639652460.0
+        time_mock.monotonic.return_value = 1060.0
+        self.assertEqual(self.clock.check_jump(), 0.0)
+
+        time_mock.time.return_value = 1639656120.0
+        time_mock.monotonic.return_value = 1120.0
+        self.assertEqual(self.clock.check_jump(), 3600.0)
+        self.assertEqual(self.clock.check_jump(), 0.0)
+
+        time_mock.time.return_value = 1639652580.0
+        time_mock.monotonic.return_value = 1180.0
+        self.assertEqual(self.clock.check_jump(), -3600.0)
+
+    @patch("backend.clock.time")
+    def test_check_jump_drift(self, time_mock):
+        for index in range(1, 10):
+            time_mock.time.return_value = 1639652400.0 + index * 60 + index
+            time_mock.monotonic.return_value = 1000.0 + index * 60
+            self.assertEqual(self.clock.check_jump(), 0.0)
 
 
 if __name__ == "__main__":